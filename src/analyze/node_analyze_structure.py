@@ -14,14 +14,11 @@
 from __future__ import annotations
 
 from typing import Any, Dict, List
-from src.utils.config import load_api_keys
+from src.utils.api_client import create_response
 
 
 
 def node_analyze_structure(state: Dict[str, Any]) -> Dict[str, Any]:
-    from openai import OpenAI
-    API_KEY = load_api_keys()
-    client = OpenAI(api_key=API_KEY)
     """
     문서 구조를 요약/정리하는 단일 노드.
 
@@ -111,7 +108,7 @@ def node_analyze_structure(state: Dict[str, Any]) -> Dict[str, Any]:
 """
 
     # 3. LLM 호출 
-    response = client.responses.create(
+    response = create_response(
         model="gpt-4o-mini",  # 프로젝트에서 사용하는 기본 모델로 교체 가능
         input=[
             {"role": "system", "content": system_msg.strip()},
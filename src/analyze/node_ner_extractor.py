@@ -20,16 +20,20 @@ from __future__ import annotations
 
 from typing import Any, Dict, List, Union
 import json
-from openai import OpenAI
-from src.utils.config import load_api_keys
+from src.utils.api_client import create_response
+from src.utils.rate_limiter import ModelUnavailableError
+from src.utils.progress import emit_progress
 
 def node_ner_extractor(state: Dict[str, Any]) -> Dict[str, Any]:
 
     print("[Node] Ner extractor start")
+    doc_id = state.get("doc_id")
 
+    emit_progress(doc_id, "classify", "문서 유형을 분류하고 있어요")
     state = Classify_doc_type(state)     #문서분류 함수 실행
     print("[Node] Ner extractor _ classify doc type finish")
 
+    emit_progress(doc_id, "ner", "행정정보를 추출하고 있어요", doc_type=state["doc_type"])
     state = Ner_extractor(state)         #행정정보 ner 추출 함수 실행
 
     if "ner_error" in state:             #ner추출과정에서 에러 발생했을 시 출력
@@ -95,11 +99,8 @@ def Classify_doc_type(state: Dict[str, Any]) -> Dict[str, Any]:
 - 코드 블록(````json` 등)도 사용하지 마세요.
 """.strip()
 
-    
-    API_KEY = load_api_keys()
-    client = OpenAI(api_key=API_KEY)
 
-    response = client.responses.create(
+    response = create_response(
         model="gpt-4o-mini",
         input=[
             {
@@ -156,10 +157,7 @@ def Classify_doc_type(state: Dict[str, Any]) -> Dict[str, Any]:
     return state
 
 def Ner_extractor(state: Dict[str, Any]) -> Dict[str, Any]:
-    
-    API_KEY = load_api_keys()
-    client = OpenAI(api_key=API_KEY)
-    
+
     NER_SYSTEM_PROMPT = """
     당신은 한국어 공공·행정 문서를 분석하는 NER(개체명 인식) 전문가입니다.
 
@@ -259,7 +257,7 @@ def Ner_extractor(state: Dict[str, Any]) -> Dict[str, Any]:
     """
 
     try:
-        resp = client.responses.create(
+        resp = create_response(
             model="gpt-4o-mini",
             input=[
                 {"role": "system", "content": NER_SYSTEM_PROMPT},
@@ -271,6 +269,9 @@ def Ner_extractor(state: Dict[str, Any]) -> Dict[str, Any]:
         raw = resp.output[0].content[0].text.strip()
         state["ner_result_raw"] = raw
 
+    except ModelUnavailableError:
+        # API 한도 초과/장애는 빈 결과로 넘기지 않고 작업 재시도
+        raise
     except Exception as e:
         state["ner_error"] = f"NER: LLM 호출 중 예외 발생 - {e!r}"
         return state
@@ -0,0 +1,166 @@
+# bulk_ingest.py
+# 과거 문서 일괄 적재(backfill)용 CLI
+# - 폴더를 재귀 탐색해 ingestion 단계가 처리하는 형식(PDF / 이미지) 파일마다
+#   ingestion → ner → summary → actions → index(RAG DB 저장) 실행 (pipeline_jobs.PIPELINE_STAGES와 동일)
+# - 파일 단위로 process pool에서 병렬 실행 (PDF 래스터화 등 CPU 작업이 GIL에 묶이지 않음)
+# - 결과는 파일 1개당 JSONL 1줄로 바로 기록 → 중단 후 다시 실행하면
+#   출력 파일에 status=done 으로 기록된 파일 해시(sha256)는 건너뜀 (실패한 파일만 재시도)
+# - rate limiter / admission 제한은 프로세스마다 따로 걸리므로 API 한도는 workers 수를 고려해 설정
+# - doc_id는 파일 해시 기반이라 같은 파일은 다시 실행해도 같은 doc_id (index 단계가 기존 항목을 지우고 다시 저장)
+#
+# 실행 예:
+#   python -m src.app.bulk_ingest ./archive --out storage/bulk_ingest.jsonl --workers 4
+#   python -m src.app.bulk_ingest ./archive --doc-id-prefix archive2023
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Set
+
+from src.ingestion.file_classifier import classify_file
+
+DEFAULT_OUTPUT = os.path.join("storage", "bulk_ingest.jsonl")
+
+# node_ingestion_pipeline 이 실제로 처리하는 classify_file 결과
+# (hwp / word / ppt / txt 는 SUPPORTED_TYPES 에 있어도 변환 단계가 아직 없어 refined_txt 없이 끝남
+#  → 적재하면 매번 failed 로 남아 이어하기 때마다 재시도되므로 수집 단계에서 제외)
+INGESTIBLE_TYPES = {"pdf", "image"}
+
+
+# 1) 대상 파일 수집 / 이어하기
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def collect_files(root: str) -> List[str]:
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            if classify_file(path) in INGESTIBLE_TYPES:
+                paths.append(path)
+    return sorted(paths)
+
+
+def load_done_hashes(output_path: str) -> Set[str]:
+    """이전 실행에서 성공한 파일 해시 (깨진 마지막 줄은 무시)"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "done":
+                done.add(record["sha256"])
+    return done
+
+
+# 2) 파일 1개 처리 (worker 프로세스에서 실행)
+def process_file(path: str, sha256: str, doc_id: str) -> Dict[str, Any]:
+    from src.app.pipeline_jobs import PIPELINE_STAGES, job_result
+    from src.utils.metrics import new_doc_metrics, doc_metrics_scope, track_stage
+    from src.utils.model_recorder import fixture_scope
+
+    record = {"path": path, "sha256": sha256, "doc_id": doc_id}
+    state = {"input_paths": [path], "doc_id": doc_id}
+    doc_metrics = new_doc_metrics()
+    t0 = time.perf_counter()
+
+    try:
+        with doc_metrics_scope(doc_metrics), fixture_scope(doc_id):
+            for name, node in PIPELINE_STAGES:
+                with track_stage(name):
+                    state = node(state)
+        state["metrics"] = doc_metrics
+        record.update(status="done", result=job_result(state))
+    except Exception as e:
+        record.update(status="failed", error=repr(e), traceback=traceback.format_exc(), metrics=doc_metrics)
+
+    record["seconds"] = round(time.perf_counter() - t0, 3)
+    record["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    return record
+
+
+# 3) 실행
+def run(root: str, output_path: str, workers: int, doc_id_prefix: str) -> Dict[str, Any]:
+    files = collect_files(root)
+    done_hashes = load_done_hashes(output_path)
+
+    todo = []
+    for path in files:
+        sha256 = file_sha256(path)
+        if sha256 in done_hashes:
+            continue
+        done_hashes.add(sha256)   # 같은 내용의 파일이 여러 개면 1번만 처리
+        todo.append((path, sha256, f"{doc_id_prefix}-{sha256[:16]}"))
+
+    print(f"[bulk] 대상 {len(files)}개 / 완료 {len(files) - len(todo)}개 건너뜀 / 처리 {len(todo)}개 (workers={workers})")
+    if not todo:
+        return {"total": len(files), "processed": 0, "done": 0, "failed": 0}
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    counts = {"done": 0, "failed": 0}
+    t0 = time.perf_counter()
+
+    # spawn: 부모 프로세스의 스레드/연결 상태를 물려받지 않음
+    ctx = multiprocessing.get_context("spawn")
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = {pool.submit(process_file, *item): item for item in todo}
+
+        for i, future in enumerate(as_completed(futures), start=1):
+            path, sha256, doc_id = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                # worker 프로세스 자체가 죽은 경우 (메모리 부족 등)
+                record = {"path": path, "sha256": sha256, "doc_id": doc_id, "status": "failed", "error": repr(e)}
+
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            counts[record["status"]] += 1
+
+            elapsed = time.perf_counter() - t0
+            rate = i / elapsed * 60
+            eta = (len(todo) - i) / (i / elapsed)
+            print(f"[bulk] {i}/{len(todo)} {record['status']:<6} {os.path.basename(path)} "
+                  f"({record.get('seconds', 0)}s) | {rate:.1f} docs/min, 남은 시간 {eta / 60:.1f}분")
+
+    elapsed = time.perf_counter() - t0
+    summary = {
+        "total": len(files),
+        "processed": len(todo),
+        **counts,
+        "elapsed_seconds": round(elapsed, 2),
+        "docs_per_minute": round(len(todo) / elapsed * 60, 2) if elapsed else 0,
+    }
+    print(f"[bulk] 완료: {json.dumps(summary, ensure_ascii=False)}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="문서 폴더 일괄 적재 (ingestion → ner → result → RAG DB)")
+    parser.add_argument("root", help="문서 폴더 (하위 폴더 포함)")
+    parser.add_argument("--out", default=DEFAULT_OUTPUT, help="결과 JSONL 경로 (이어하기 기준)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="process 수")
+    parser.add_argument("--doc-id-prefix", default="bulk", help="doc_id 접두어 (doc_id = 접두어-파일해시16자리)")
+    args = parser.parse_args()
+
+    summary = run(args.root, args.out, args.workers, args.doc_id_prefix)
+    raise SystemExit(1 if summary.get("failed") else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,50 @@
 # main.py : FastAPI 서버 파일(백엔드 파일) 
-from fastapi import FastAPI, UploadFile, File, Form
+from fastapi import FastAPI, UploadFile, File, Form, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.concurrency import run_in_threadpool   # heavy 작업을 스레드에서 실행시키기
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from pydantic import BaseModel
 from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import json
+import time
 import uuid
 import os
 
 # Import: 문서 파이프라인 노드
-from src.utils.config import load_api_keys
-from src.ingestion.node_ingestion_pipeline import node_ingestion_pipeline
-from src.analyze.node_ner_extractor import node_ner_extractor
-from src.result.node_result import node_result
+from src.utils.config import (
+    load_api_keys, CHAT_WORKERS, CHAT_INDEX_WAIT, JOB_QUEUE_MAX, ADMISSION_RETRY_AFTER, BATCH_QUEUE_MAX, BATCH_MAX_FILES,
+    PROCESS_WAIT_SECONDS,
+)
+from src.utils.api_client import close_openai_client
+from src.utils.rate_limiter import get_limiter_metrics
+from src.utils.metrics import render_prometheus, track_stage
+from src.utils.model_recorder import fixture_scope
+from src.utils.job_queue import enqueue_job, enqueue_batch, get_job, QueueFullError
+from src.utils.admission import queue_has_capacity, record_rejection, get_admission_metrics
+from src.utils.embedding_cache import get_embedding_cache_metrics
+from src.utils.index_status import set_index_status, get_index_status, wait_until_indexed, NOT_READY
+from src.app.pipeline_jobs import start_workers, stop_workers, batch_status
+from src.utils.progress import emit_progress, get_events, get_progress, clear_progress, TERMINAL_STAGES
 
 # Import: 챗봇 모듈
-from src.chatbot.rag_builder import insert_info
 from src.chatbot.rag_chat_engine import generate_response
+from src.chatbot.rag_builder import doc_matrix_cache, migrate_pickle_embeddings
+from src.chatbot.ann_index import search_corpus, get_ann_index
 
 
-# 진행상황 저장용
-progress_store = {}   # {doc_id: "ocr"|"refine"|"analysis"|"summary"}
-
-def set_progress(doc_id: str, step: str):
-    print(f"[PROGRESS SET] doc_id={doc_id}, step={step}")
-    progress_store[doc_id] = step
+# 진행상황 SSE 설정
+PROGRESS_POLL_INTERVAL = 0.25   # 새 이벤트 확인 주기(초)
+PROGRESS_KEEPALIVE = 15.0       # 이벤트가 없을 때 연결 유지용 주석 전송 주기(초)
+JOB_POLL_INTERVAL = 0.5         # 작업 완료 확인 주기(초)
 
-def get_progress(doc_id: str):
-    return progress_store.get(doc_id, "pending")
+# /chat 전용 executor
+# - generate_response는 임베딩 호출, SQLite 조회, LLM 호출이 모두 blocking이므로
+#   event loop에서 직접 실행하면 업로드 등 다른 요청까지 멈춘다.
+# - 기본 threadpool(run_in_threadpool)은 문서 처리와 공유하므로 채팅은 별도 스레드 풀 사용
+CHAT_EXECUTOR = ThreadPoolExecutor(max_workers=CHAT_WORKERS, thread_name_prefix="chat")
 
 
 # api설정
@@ -46,101 +64,416 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+# 작업 큐 워커 / 전체 문서 ANN 색인 실행 / 종료
+# - 이전 프로세스가 처리하다 죽은 작업은 lease 만료 후 마지막 checkpoint부터 재개됨
+# - ANN 색인은 시작할 때 스냅샷을 읽고 writer 스레드 시작, 종료할 때 스냅샷 저장
+#   (재시작 시 ann_log 전체가 아니라 스냅샷 이후 추가분만 다시 읽음)
+@app.on_event("startup")
+async def on_startup():
+    # 이전 pickle 형식 벡터 변환 → 워커 / 검색이 읽기 전에 끝나야 함
+    await run_in_threadpool(migrate_pickle_embeddings)
+    await run_in_threadpool(get_ann_index)
+    start_workers()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    stop_workers()
+    ann = get_ann_index()
+    ann.stop()
+    await run_in_threadpool(ann.save_snapshot)
+    CHAT_EXECUTOR.shutdown(wait=False)
+    close_openai_client()
+
+
 #  1. /process-document  (문서 결과물 처리 파이프라인)
 @app.post("/process-document")
 async def process_document(
+    request: Request,
     files: List[UploadFile] = File(...),
     doc_id: str = Form(...),
 ):
 
     """
     - 파일 업로드
-    - ingestion → ner → result
-    - RAG DB 저장
-    - 결과 반환
+    - 작업 큐 등록 (ingestion → ner → summary → actions → RAG DB 저장)
+    - actions 단계가 끝나면 결과 반환 (RAG 색인은 응답 후에도 워커에서 계속 진행,
+      준비 여부는 /documents/{doc_id}/index-status)
+    - 대기열이 가득 차면 기다리지 않고 503 + Retry-After
+    - PROCESS_WAIT_SECONDS 안에 결과가 없으면(재시도 대기, 앞 작업 처리 중 등) 202 + job_id
+      → 결과는 /jobs/{job_id} 로 조회
     """
 
-    # 1) 파일 저장
-    saved_paths = []
-    for f in files:
-        file_id = uuid.uuid4().hex
-        save_path = os.path.join(UPLOAD_DIR, f"{file_id}_{f.filename}")
-        with open(save_path, "wb") as buffer:
-            buffer.write(await f.read())
-        saved_paths.append(save_path)
-
-    # 2) ingestion 실행
-    # set_progress(doc_id, "ocr")    # 단계 1 시작
-
-    state = {"input_paths": saved_paths}
-
-    #  CPU-heavy 작업을 thread pool에서 실행
-    state = await run_in_threadpool(node_ingestion_pipeline, state)
-
-    refined_txt = state["refined_txt"]
-    state["refined_text"] = refined_txt
+    # 0) admission: 업로드를 읽기 전에 대기열 확인
+    if not await run_in_threadpool(queue_has_capacity):
+        record_rejection("queue_full")
+        raise _over_capacity()
 
-
-    # 3) NER 실행
-    # set_progress(doc_id, "refine")   # 단계 2 시작
-
-    state = await run_in_threadpool(node_ner_extractor, state)
+    # 1) 파일 저장
+    saved_paths = [await _save_upload(f) for f in files]
+
+    # 2) 작업 큐에 등록 (단계별 진행상황/중간결과는 /progress/{doc_id}/stream 으로 전달)
+    #    ingestion → ner → summary → actions → index, 노드마다 jobs.sqlite에 checkpoint
+    await run_in_threadpool(clear_progress, doc_id)
+    await run_in_threadpool(emit_progress, doc_id, "upload", "파일 업로드 완료", files=len(saved_paths))
+    await run_in_threadpool(set_index_status, doc_id, "pending")
+
+    try:
+        job_id = await run_in_threadpool(
+            enqueue_job, doc_id, {"input_paths": saved_paths, "doc_id": doc_id}, JOB_QUEUE_MAX,
+        )
+    except QueueFullError:
+        # 확인 후 저장하는 사이 다른 요청이 자리를 차지한 경우
+        record_rejection("queue_full")
+        for path in saved_paths:
+            os.remove(path)
+        await run_in_threadpool(emit_progress, doc_id, "error", "서버가 혼잡합니다. 잠시 후 다시 시도해 주세요.")
+        raise _over_capacity()
+
+    # 3) 결과(요약/행동) 준비 대기 - 색인 완료까지는 기다리지 않음
+    #    작업은 워커에서 계속되므로 대기 시간 초과 / 연결 끊김이면 대기만 멈춤
+    deadline = time.monotonic() + PROCESS_WAIT_SECONDS
+    while True:
+        job = await run_in_threadpool(get_job, job_id)
+        if job["result"] is not None:
+            break
+        if job["status"] == "failed":
+            raise HTTPException(status_code=500, detail=f"문서 처리 실패: {job['error']}")
+        if await request.is_disconnected():
+            return None
+        if time.monotonic() >= deadline:
+            return JSONResponse(
+                status_code=202,
+                content={"doc_id": doc_id, "job_id": job_id, "status": job["status"], "stage_done": job["stage_done"]},
+            )
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    # 4) 프론트 반환
+    index = await run_in_threadpool(get_index_status, doc_id)
+    return {**job["result"], "job_id": job_id, "index_status": index["status"]}
+
+
+async def _save_upload(f: UploadFile) -> str:
+    file_id = uuid.uuid4().hex
+    save_path = os.path.join(UPLOAD_DIR, f"{file_id}_{f.filename}")
+    with open(save_path, "wb") as buffer:
+        buffer.write(await f.read())
+    return save_path
+
+
+def _over_capacity() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="처리 중인 문서가 많습니다. 잠시 후 다시 시도해 주세요.",
+        headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+    )
 
 
-    # 4) result packager 실행
-    # set_progress(doc_id, "analysis")  # 단계 3 시작
+#  1-1. /jobs/{job_id}  (작업 상태 조회 - 연결이 끊겨도 결과를 다시 가져갈 수 있음)
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await run_in_threadpool(get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return {
+        "job_id": job_id,
+        "doc_id": job["doc_id"],
+        "status": job["status"],
+        "stage_done": job["stage_done"],
+        "attempts": job["attempts"],
+        "error": job["error"],
+        "result": job["result"],
+    }
 
-    state = await run_in_threadpool(node_result, state)
 
-    # 결과 unpack
-    action_info = state["action_info"]
-    web_package = state["web_package"]
-    summary = state["summary"]
+#  1-2. /documents/{doc_id}/index-status  (챗봇 질문 가능 여부: pending / indexing / ready / failed)
+@app.get("/documents/{doc_id}/index-status")
+async def index_status(doc_id: str):
+    return await run_in_threadpool(get_index_status, doc_id)
 
-    # 마지막 단계
-    # set_progress(doc_id, "summary")   # 단계 4
-    
-    # 5) RAG 벡터DB 저장 : DB 저장도 thread로 분리 (blocking 방지)
-    await run_in_threadpool(insert_info, doc_id, action_info, refined_txt)
-    print(f"RAG 저장 완료 (doc_id={doc_id})")
 
-    
+#  1-3. /process-batch  (여러 문서 일괄 처리)
+@app.post("/process-batch", status_code=202)
+async def process_batch(
+    files: List[UploadFile] = File(...),
+    doc_id_prefix: str | None = Form(None),
+):
+    """
+    - 파일마다 doc_id를 발급해 각각 작업으로 등록하고 바로 반환 (202)
+    - 작업 워커와 단계별 동시 실행 제한(admission)을 단건 업로드와 공유하므로
+      A 문서가 OCR 대기 중일 때 B 문서 래스터화가 진행되는 식으로 문서 간 파이프라이닝
+      (동시 처리 문서 수는 JOB_WORKERS)
+    - 문서별 결과/전체 처리량: /batches/{batch_id}, /batches/{batch_id}/stream
+    """
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"한 번에 최대 {BATCH_MAX_FILES}개 파일까지 처리할 수 있습니다.")
+
+    if not await run_in_threadpool(queue_has_capacity, len(files), True):
+        record_rejection("batch_queue_full")
+        raise _over_capacity()
+
+    batch_id = uuid.uuid4().hex[:12]
+    prefix = doc_id_prefix or f"batch-{batch_id}"
+
+    documents, items = [], []
+    for i, f in enumerate(files):
+        doc_id = f"{prefix}-{i:03d}"
+        path = await _save_upload(f)
+        documents.append({"doc_id": doc_id, "filename": f.filename, "path": path})
+        items.append((doc_id, {"input_paths": [path], "doc_id": doc_id}))
+
+        # 작업 등록 전에 이전 이벤트 정리 (등록 직후 워커가 남기는 이벤트가 지워지지 않도록)
+        await run_in_threadpool(clear_progress, doc_id)
+        await run_in_threadpool(emit_progress, doc_id, "upload", "파일 업로드 완료", files=1, batch_id=batch_id)
+        await run_in_threadpool(set_index_status, doc_id, "pending")
+
+    try:
+        job_ids = await run_in_threadpool(enqueue_batch, batch_id, items, BATCH_QUEUE_MAX)
+    except QueueFullError:
+        record_rejection("batch_queue_full")
+        for doc in documents:
+            os.remove(doc["path"])
+            await run_in_threadpool(emit_progress, doc["doc_id"], "error", "서버가 혼잡합니다. 잠시 후 다시 시도해 주세요.")
+        raise _over_capacity()
+
+    for doc, job_id in zip(documents, job_ids):
+        doc["job_id"] = job_id
+        del doc["path"]
+
+    return {"batch_id": batch_id, "documents": documents}
+
+
+#  1-4. /batches/{batch_id}  (일괄 처리 현황 - 완료된 문서 결과 + 처리량)
+@app.get("/batches/{batch_id}")
+async def batch(batch_id: str):
+    status = await run_in_threadpool(batch_status, batch_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="일괄 처리 작업을 찾을 수 없습니다.")
+    return status
+
+
+#  1-5. /batches/{batch_id}/stream  (문서가 끝나는 대로 결과 SSE)
+@app.get("/batches/{batch_id}/stream")
+async def batch_stream(batch_id: str, request: Request):
+    """
+    - document : 문서 1개 완료/실패 (doc_id, status, result 또는 error)
+    - progress : 전체 집계 (counts, docs_per_minute)
+    - done     : 모든 문서 종료 후 최종 집계, 스트림 종료
+    """
+    if await run_in_threadpool(batch_status, batch_id) is None:
+        raise HTTPException(status_code=404, detail="일괄 처리 작업을 찾을 수 없습니다.")
+
+    async def event_generator():
+        reported = set()
+        seq = 0
+        last_sent = time.monotonic()
+
+        while True:
+            if await request.is_disconnected():
+                break
+
+            status = await run_in_threadpool(batch_status, batch_id)
+            new_docs = [d for d in status["documents"]
+                        if d["status"] in ("done", "failed") and d["doc_id"] not in reported]
+
+            for doc in new_docs:
+                reported.add(doc["doc_id"])
+                yield _sse_format({"seq": seq, "stage": "document", **doc})
+                seq += 1
+
+            summary = {k: v for k, v in status.items() if k != "documents"}
+            if status["status"] == "done":
+                yield _sse_format({"seq": seq, "stage": "done", **summary})
+                return
+
+            if new_docs:
+                yield _sse_format({"seq": seq, "stage": "progress", **summary})
+                seq += 1
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent > PROGRESS_KEEPALIVE:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
-    # 6) 프론트 반환
-    return {
-        "doc_id": doc_id,
-        "summary": summary,
-        "action": web_package
-    }
+#  2. /chat  (문서 기반 챗봇)
+def _run_chat(doc_id: str, question: str, session_id: str) -> dict:
+    # 모델 호출 녹화/재생 시 문서 단위 fixture 사용
+    with fixture_scope(doc_id):
+        return generate_response(doc_id=doc_id, user_query=question, session_id=session_id)
 
 
-#  2. /chat  (문서 기반 챗봇)
 class ChatRequest(BaseModel):
     doc_id: str
     question: str
+    session_id: str | None = None   # 없으면 새 세션 발급 → 응답의 session_id로 이어서 대화
 
 class ChatResponse(BaseModel):
     answer: str
     source: str | None
+    session_id: str
+    status: str = "ok"   # ok | indexing(문서 색인 중, 잠시 후 다시 질문) | index_failed
+
+
+INDEXING_ANSWER = "문서를 챗봇용으로 준비하고 있어요. 잠시 후 다시 질문해 주세요."
+INDEX_FAILED_ANSWER = "문서를 챗봇용으로 준비하지 못했어요. 문서를 다시 업로드해 주세요."
 
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat(req: ChatRequest):
 
-    result = generate_response(
-        doc_id=req.doc_id,
-        user_query=req.question
-    )
+    session_id = req.session_id or uuid.uuid4().hex
+    loop = asyncio.get_running_loop()
+
+    # 색인이 아직 안 끝난 문서는 잠깐(CHAT_INDEX_WAIT) 기다린 뒤, 그래도 안 되면 indexing 응답
+    index = await run_in_threadpool(get_index_status, req.doc_id)
+    if index["status"] in NOT_READY:
+        index = await loop.run_in_executor(CHAT_EXECUTOR, wait_until_indexed, req.doc_id, CHAT_INDEX_WAIT)
+    if index["status"] in NOT_READY:
+        return ChatResponse(answer=INDEXING_ANSWER, source=None, session_id=session_id, status="indexing")
+    if index["status"] == "failed":
+        return ChatResponse(answer=INDEX_FAILED_ANSWER, source=None, session_id=session_id, status="index_failed")
+
+    with track_stage("chat"):
+        result = await loop.run_in_executor(
+            CHAT_EXECUTOR,
+            partial(_run_chat, req.doc_id, req.question, session_id),
+        )
 
     return ChatResponse(
         answer=result["answer"],
-        source=result["source"]
+        source=result["source"],
+        session_id=session_id,
+    )
+
+
+#  2-1. /search  (전체 문서 대상 검색 - "재산세 환급을 언급한 공고는?")
+class SearchHit(BaseModel):
+    doc_id: str
+    type: str | None
+    page_num: int | None
+    text: str
+    metadata: dict
+    score: float
+
+
+class SearchResponse(BaseModel):
+    results: List[SearchHit]
+    took_ms: float
+
+
+@app.get("/search", response_model=SearchResponse)
+async def search(q: str, top_k: int = 10):
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q가 비어 있습니다.")
+    top_k = max(1, min(top_k, 100))
+
+    t0 = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    with track_stage("search"):
+        results = await loop.run_in_executor(CHAT_EXECUTOR, search_corpus, q, top_k)
+
+    return SearchResponse(
+        results=[SearchHit(**r) for r in results],
+        took_ms=round((time.perf_counter() - t0) * 1000, 2),
     )
 
 
-# #  3. /progress/{doc_id}  (진행상황 조회)
-# @app.get("/progress/{doc_id}")
-# async def progress(doc_id: str):
-#     print(">>> PROGRESS GET:", doc_id, "stored:", progress_store.get(doc_id))
-#     return {"step": get_progress(doc_id)}
+#  3. /progress/{doc_id}  (진행상황 조회 - polling)
+@app.get("/progress/{doc_id}")
+async def progress(doc_id: str):
+    return {"step": await run_in_threadpool(get_progress, doc_id)}
+
+
+#  4. /progress/{doc_id}/stream  (진행상황 + 중간 결과 SSE)
+def _sse_format(event: dict) -> str:
+    data = json.dumps(event, ensure_ascii=False)
+    return f"id: {event['seq']}\nevent: {event['stage']}\ndata: {data}\n\n"
+
+
+@app.get("/progress/{doc_id}/stream")
+async def progress_stream(doc_id: str, request: Request, since: int = 0):
+    """
+    단계 전환(parse, ocr i/N, clean, classify, ner, summary, actions, result, indexed)과
+    중간 결과(summary, action)를 생성되는 즉시 Server-Sent Events로 전달.
+    - 재연결 시 Last-Event-ID 헤더(또는 since)부터 이어서 전송
+    - done / error 이벤트 후 스트림 종료
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id) + 1
+
+    async def event_generator():
+        nonlocal since
+        last_sent = time.monotonic()
+
+        while True:
+            if await request.is_disconnected():
+                break
+
+            # 이벤트는 공유 상태 저장소에 있으므로 작업을 실행 중인 워커와 달라도 됨
+            events = await run_in_threadpool(get_events, doc_id, since)
+            for event in events:
+                yield _sse_format(event)
+                since = event["seq"] + 1
+                last_sent = time.monotonic()
+
+                if event["stage"] in TERMINAL_STAGES:
+                    return
+
+            if time.monotonic() - last_sent > PROGRESS_KEEPALIVE:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+
+            await asyncio.sleep(PROGRESS_POLL_INTERVAL)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+#  5. /metrics/model-api  (모델 호출 rate limit / 재시도 / circuit breaker 지표)
+@app.get("/metrics/model-api")
+async def model_api_metrics():
+    return get_limiter_metrics()
+
+
+#  5-1. /metrics/admission  (단계별 동시 실행 슬롯 / 작업 대기열)
+@app.get("/metrics/admission")
+async def admission_metrics():
+    return await run_in_threadpool(get_admission_metrics)
+
+
+#  5-2. /metrics/rag-cache  (문서 임베딩 행렬 캐시 적중률)
+@app.get("/metrics/rag-cache")
+async def rag_cache_metrics():
+    return doc_matrix_cache.stats()
+
+
+#  5-3. /metrics/ann  (전체 문서 검색 색인 크기 / 학습 여부)
+@app.get("/metrics/ann")
+async def ann_metrics():
+    return await run_in_threadpool(lambda: get_ann_index().stats())
+
+
+#  5-4. /metrics/embedding-cache  (질문/색인 텍스트 임베딩 캐시 단계별 적중률)
+@app.get("/metrics/embedding-cache")
+async def embedding_cache_metrics():
+    return await run_in_threadpool(get_embedding_cache_metrics)
+
+
+#  6. /metrics  (Prometheus: 단계별 시간, 모델 호출 시간/토큰/비용, rate limiter 상태, admission)
+@app.get("/metrics")
+async def metrics():
+    # 대기열 깊이 조회(SQLite)가 포함되므로 threadpool에서 생성
+    return PlainTextResponse(await run_in_threadpool(render_prometheus), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,250 @@
+# pipeline_jobs.py
+# 문서 처리 파이프라인을 작업 큐(jobs.sqlite) 위에서 실행하는 워커
+# - 노드 순서: ingestion → ner → summary → actions → index
+# - 노드가 끝날 때마다 state checkpoint → 재시작 시 마지막 완료 노드 다음부터 실행
+#   (예: OCR이 끝난 문서는 OCR을 다시 하지 않고 요약부터 재실행)
+# - 요약/행동 결과는 RESULT_STAGE(actions) 직후 먼저 공개 → 사용자는 색인(임베딩)을 기다리지 않음
+#   색인 준비 상태는 index_status.py 플래그로 확인
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Callable, Dict, List, Tuple
+
+from src.ingestion.node_ingestion_pipeline import node_ingestion_pipeline
+from src.analyze.node_ner_extractor import node_ner_extractor
+from src.result.node_result import node_summary, node_actions
+from src.chatbot.rag_builder import insert_info, delete_doc
+from src.utils.config import JOB_WORKERS, JOB_LEASE_SECONDS, JOB_RETRY_DELAY
+from src.utils.job_queue import (
+    claim_job, renew_lease, checkpoint_job, publish_result, complete_job, fail_job, get_batch_jobs, LeaseLostError,
+)
+from src.utils.index_status import set_index_status
+from src.utils.logger import log
+from src.utils.metrics import new_doc_metrics, doc_metrics_scope, track_stage, record_queue_wait
+from src.utils.model_recorder import fixture_scope
+from src.utils.progress import emit_progress
+from src.utils.rate_limiter import ModelUnavailableError
+
+
+# 1) 노드 정의
+def node_ingestion(state: Dict[str, Any]) -> Dict[str, Any]:
+    state = node_ingestion_pipeline(state)
+    state["refined_text"] = state["refined_txt"]
+    return state
+
+
+def node_index(state: Dict[str, Any]) -> Dict[str, Any]:
+    """RAG 벡터DB 저장 (중간에 죽었다 재개될 수 있으므로 기존 항목을 지우고 다시 저장)"""
+    set_index_status(state["doc_id"], "indexing")
+    delete_doc(state["doc_id"])
+    insert_info(state["doc_id"], state["action_info"], state["refined_txt"])
+    set_index_status(state["doc_id"], "ready")
+    print(f"RAG 저장 완료 (doc_id={state['doc_id']})")
+    emit_progress(state["doc_id"], "indexed", "챗봇 질문 준비가 완료되었어요")
+    return state
+
+
+PIPELINE_STAGES: List[Tuple[str, Callable[[Dict[str, Any]], Dict[str, Any]]]] = [
+    ("ingestion", node_ingestion),
+    ("ner", node_ner_extractor),
+    ("summary", node_summary),
+    ("actions", node_actions),
+    ("index", node_index),
+]
+
+# 이 노드가 끝나면 결과를 먼저 반환 (이후 노드는 백그라운드로 계속)
+RESULT_STAGE = "actions"
+
+
+def job_result(state: Dict[str, Any]) -> Dict[str, Any]:
+    """프론트 반환용 결과 (+ 문서별 단계 시간 / 토큰 / 비용 지표)"""
+    return {
+        "doc_id": state["doc_id"],
+        "summary": state["summary"],
+        "action": state["web_package"],
+        "metrics": state.get("metrics"),
+    }
+
+
+# 2) lease 연장 (OCR 등 긴 노드 실행 중에도 작업을 빼앗기지 않도록)
+# - 연장에 실패하면(lease 만료 후 다른 워커가 가져감) lost 표시 → run_job이 다음 노드 전에 중단
+#   (계속 실행하면 두 워커가 같은 LLM 단계를 중복 실행하고, 이 워커의 checkpoint / 완료 처리는 반영되지 않음)
+class _LeaseHeartbeat:
+    def __init__(self, job_id: str, worker_id: str):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(JOB_LEASE_SECONDS / 3):
+            try:
+                renewed = renew_lease(self.job_id, self.worker_id)
+            except Exception as e:
+                # DB 잠금 등 일시 오류 → lease가 남아 있는 동안 다음 주기에 다시 시도
+                log(f"[Job] lease 연장 오류 (job_id={self.job_id}): {e!r}", level="warning")
+                continue
+            if not renewed:
+                log(f"[Job] lease 연장 실패 → 작업 중단 예정 (job_id={self.job_id})", level="warning")
+                self.lost.set()
+                return
+
+    def check(self):
+        """lease를 잃었으면 LeaseLostError"""
+        if self.lost.is_set():
+            raise LeaseLostError(f"job_id={self.job_id} lease 만료 (worker_id={self.worker_id})")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+# 3) 작업 1개 실행
+def run_job(job: Dict[str, Any], worker_id: str) -> None:
+    job_id = job["job_id"]
+    state = job["state"]
+    stage_names = [name for name, _ in PIPELINE_STAGES]
+    start = stage_names.index(job["stage_done"]) + 1 if job["stage_done"] else 0
+
+    if start > 0:
+        log(f"[Job] {job_id} 재개: '{job['stage_done']}' 이후 노드부터 실행")
+
+    # 문서별 지표는 state에 함께 checkpoint → 재개돼도 이전 단계 지표 유지
+    doc_metrics = state.setdefault("metrics", new_doc_metrics())
+
+    def lease_lost() -> LeaseLostError:
+        return LeaseLostError(f"job_id={job_id} 다른 워커에게 넘어감 (worker_id={worker_id})")
+
+    try:
+        with _LeaseHeartbeat(job_id, worker_id) as heartbeat, doc_metrics_scope(doc_metrics), fixture_scope(job["doc_id"]):
+            record_queue_wait(max(0.0, time.time() - job["updated_at"]))
+
+            for name, node in PIPELINE_STAGES[start:]:
+                heartbeat.check()
+                with track_stage(name):
+                    state = node(state)
+                state["metrics"] = doc_metrics
+                if not checkpoint_job(job_id, worker_id, name, state):
+                    raise lease_lost()
+
+                if name == RESULT_STAGE:
+                    result = job_result(state)
+                    if not publish_result(job_id, worker_id, result):
+                        raise lease_lost()
+                    emit_progress(state["doc_id"], "result", "요약과 행동 안내가 준비되었어요",
+                                  summary=result["summary"], action=result["action"])
+
+        result = job_result(state)
+        if not complete_job(job_id, worker_id, result):
+            raise lease_lost()
+        emit_progress(state["doc_id"], "done", "문서 처리 완료", summary=result["summary"], action=result["action"])
+
+    except LeaseLostError as e:
+        # 작업을 넘겨받은 워커가 마지막 checkpoint부터 이어서 실행 → 실패 처리 / 진행상황 기록 없이 중단
+        log(f"[Job] {job_id} 중단: {e}", level="warning")
+
+    except ModelUnavailableError as e:
+        # 모델 API 한도 초과/장애 → 잠시 후 마지막 checkpoint부터 재시도
+        log(f"[Job] {job_id} 모델 호출 불가, {JOB_RETRY_DELAY:.0f}초 후 재시도: {e}", level="warning")
+        fail_job(job_id, worker_id, repr(e), retry=True, retry_delay=JOB_RETRY_DELAY)
+        emit_progress(state.get("doc_id"), "retrying", "요청이 많아 잠시 후 이어서 처리합니다", retry_in=JOB_RETRY_DELAY)
+
+    except Exception as e:
+        log(f"[Job] {job_id} 실패: {e!r}\n{traceback.format_exc()}", level="error")
+        fail_job(job_id, worker_id, repr(e))
+        # 색인까지 가지 못하고 실패 → 챗봇이 계속 기다리지 않도록
+        set_index_status(state.get("doc_id"), "failed", repr(e))
+        emit_progress(state.get("doc_id"), "error", f"문서 처리 중 오류가 발생했습니다: {e}")
+
+
+# 4) 일괄 처리 현황
+def batch_status(batch_id: str) -> Dict[str, Any] | None:
+    """
+    일괄 처리 묶음의 문서별 상태/결과 + 전체 처리량
+    - 완료된 문서는 다른 문서를 기다리지 않고 바로 result 포함
+    - docs_per_minute: 첫 등록 시각 ~ 마지막 완료 시각(진행 중이면 현재) 기준
+    """
+    jobs = get_batch_jobs(batch_id)
+    if not jobs:
+        return None
+
+    counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+    for job in jobs:
+        counts[job["status"]] = counts.get(job["status"], 0) + 1
+
+    finished = [j for j in jobs if j["status"] in ("done", "failed")]
+    all_finished = len(finished) == len(jobs)
+    started_at = min(j["created_at"] for j in jobs)
+    end = max(j["updated_at"] for j in finished) if all_finished else time.time()
+    elapsed = max(end - started_at, 1e-6)
+
+    total_cost = sum(
+        (j["result"] or {}).get("metrics", {}).get("total_cost_usd", 0.0) for j in jobs if j["status"] == "done"
+    )
+
+    return {
+        "batch_id": batch_id,
+        "status": "done" if all_finished else "running",
+        "total": len(jobs),
+        "counts": counts,
+        "elapsed_seconds": round(elapsed, 2),
+        "docs_per_minute": round(counts["done"] / elapsed * 60, 2),
+        "total_cost_usd": round(total_cost, 6),
+        "documents": [
+            {
+                "doc_id": j["doc_id"],
+                "job_id": j["job_id"],
+                "status": j["status"],
+                "stage_done": j["stage_done"],
+                "error": j["error"] if j["status"] == "failed" else None,
+                "result": j["result"],
+            }
+            for j in jobs
+        ],
+    }
+
+
+# 5) 워커 스레드
+_workers: List[threading.Thread] = []
+_stop_event = threading.Event()
+
+
+def _worker_loop(worker_id: str, poll_interval: float = 0.5):
+    while not _stop_event.is_set():
+        try:
+            job = claim_job(worker_id)
+        except Exception as e:
+            log(f"[Job] 작업 점유 실패: {e!r}", level="error")
+            job = None
+
+        if job is None:
+            _stop_event.wait(poll_interval)
+            continue
+
+        run_job(job, worker_id)
+
+
+def start_workers(n: int = JOB_WORKERS) -> None:
+    """서버 시작 시 워커 스레드 실행 (lease 만료된 미완료 작업도 여기서 복구됨)"""
+    if _workers:
+        return
+    _stop_event.clear()
+    for i in range(n):
+        worker_id = f"{uuid.uuid4().hex[:8]}-{i}"
+        t = threading.Thread(target=_worker_loop, args=(worker_id,), daemon=True, name=f"job-worker-{i}")
+        t.start()
+        _workers.append(t)
+    log(f"[Job] 워커 {n}개 시작")
+
+
+def stop_workers(timeout: float = 5.0) -> None:
+    _stop_event.set()
+    for t in _workers:
+        t.join(timeout)
+    _workers.clear()
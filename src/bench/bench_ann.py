@@ -0,0 +1,95 @@
+# bench_ann.py
+# 전체 문서 ANN 색인(ann_index.IvfIndex) 벤치마크
+# - 군집 구조가 있는 합성 벡터(주제 중심 + 잡음)를 크기별로 추가하면서
+#   색인 생성 시간 / 검색 p50·p95 / 전수 비교 대비 recall@k 측정
+# - 임베딩 API / SQLite 없이 IvfIndex만 측정 (/search 전체 지연 = 질의 임베딩 + 이 값 + 결과 조회)
+#
+# 실행 예:
+#   python -m src.bench.bench_ann --sizes 100000 1000000 --dim 256
+#   python -m src.bench.bench_ann --sizes 1000000 --dim 1536 --nprobe 8 16 32
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src.chatbot.ann_index import IvfIndex, _normalize
+from src.chatbot.rag_builder import top_k_indices
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def synthetic(n: int, dim: int, topics: int, rng) -> np.ndarray:
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    vectors = centers[rng.integers(topics, size=n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return _normalize(vectors)
+
+
+def measure(index: IvfIndex, data: np.ndarray, queries: np.ndarray, top_k: int) -> dict:
+    latencies, recalls = [], []
+    data16 = data.astype(np.float16)
+    for q in queries:
+        t0 = time.perf_counter()
+        keys, _ = index.search(q, top_k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+        # 정답 = 같은 float16 벡터 전수 비교 (10만 개씩 나눠 계산)
+        chunks = np.array_split(data16, max(1, len(data16) // 100000))
+        exact = top_k_indices(np.concatenate([c.astype(np.float32) @ q for c in chunks]), top_k)
+        recalls.append(len(set(keys.tolist()) & set(exact.tolist())) / top_k)
+    return {
+        "p50_ms": round(_pct(latencies, 0.50), 3),
+        "p95_ms": round(_pct(latencies, 0.95), 3),
+        "recall": round(float(np.mean(recalls)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF 색인 크기별 검색 지연 / recall")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100000, 1000000])
+    parser.add_argument("--dim", type=int, default=256, help="벡터 차원 (1536은 100만 개에 float16 약 3GB)")
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--nprobe", nargs="+", type=int, default=[16])
+    parser.add_argument("--topics", type=int, default=2000, help="합성 데이터 주제(군집) 수")
+    parser.add_argument("--batch", type=int, default=500, help="insert_info 1회 분량 (add 호출 단위)")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--json", help="결과를 JSON 파일로 저장")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = synthetic(max(args.sizes), args.dim, args.topics, rng)
+    index = IvfIndex(args.dim, nlist=args.nlist)
+
+    results, size = [], 0
+    for target in sorted(args.sizes):
+        t0 = time.perf_counter()
+        for start in range(size, target, args.batch):
+            end = min(start + args.batch, target)
+            index.add(np.arange(start, end), data[start:end])
+            index.maintain()   # CorpusAnnIndex writer와 같이 추가할 때마다 학습 / 병합 확인
+        build_s = time.perf_counter() - t0
+        size = target
+
+        # 질의 = 저장된 벡터에 잡음을 더한 것 (비슷한 문장으로 묻는 상황)
+        picks = data[rng.integers(size, size=args.queries)]
+        queries = _normalize(picks + 0.3 * rng.standard_normal(picks.shape).astype(np.float32))
+
+        for nprobe in args.nprobe:
+            index.nprobe = nprobe
+            r = {"size": size, "nprobe": nprobe, "build_seconds": round(build_s, 1), "tail": index.tail_size(),
+                 **measure(index, data[:size], queries, args.top_k)}
+            results.append(r)
+            print(f"size={r['size']:>9}  nprobe={nprobe:>3}  p50={r['p50_ms']:>8} ms  p95={r['p95_ms']:>8} ms  "
+                  f"recall@{args.top_k}={r['recall']:.3f}  (추가 {r['build_seconds']}s)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"dim": args.dim, "nlist": args.nlist, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
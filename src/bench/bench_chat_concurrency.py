@@ -0,0 +1,62 @@
+# bench_chat_concurrency.py
+# /chat 동시 요청이 event loop를 막지 않는지 확인하는 동시성 테스트
+# - generate_response를 "1회 호출 = delay초 blocking"인 대체 함수로 바꾼 뒤
+#   N개의 /chat 요청을 동시에 보내 전체 소요시간이 1회 소요시간과 비슷한지 확인
+#   (event loop에서 직접 실행하면 N × delay 가 걸림)
+#
+# 실행 예:
+#   python -m src.bench.bench_chat_concurrency --n 8 --delay 1.0
+import argparse
+import asyncio
+import time
+
+import httpx
+
+import src.app.main as main_app
+
+
+def _blocking_generate_response(delay: float):
+    def _fake(doc_id: str, user_query: str) -> dict:
+        time.sleep(delay)   # 임베딩/DB/LLM 대기를 흉내낸 blocking 호출
+        return {"answer": f"[{doc_id}] {user_query}", "source": None, "state": {}}
+    return _fake
+
+
+async def _run(n: int, delay: float) -> dict:
+    main_app.generate_response = _blocking_generate_response(delay)
+    transport = httpx.ASGITransport(app=main_app.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i):
+            resp = await client.post("/chat", json={"doc_id": f"doc-{i}", "question": "납부 기한이 언제인가요?"})
+            resp.raise_for_status()
+
+        t0 = time.perf_counter()
+        await one(0)
+        single = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(n)])
+        concurrent = time.perf_counter() - t0
+
+    return {"single": single, "concurrent": concurrent}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/chat 동시 요청 처리 시간 측정")
+    parser.add_argument("--n", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    result = asyncio.run(_run(args.n, args.delay))
+    ratio = result["concurrent"] / result["single"]
+    print(f"1회: {result['single']:.2f}s / 동시 {args.n}회: {result['concurrent']:.2f}s (x{ratio:.2f})")
+
+    # N개가 1회 시간의 2배 안에 끝나야 통과 (직렬 실행이면 약 N배)
+    if ratio > 2.0:
+        raise SystemExit("FAIL: /chat 요청이 직렬로 처리되고 있습니다.")
+    print("OK: /chat 요청이 동시에 처리됩니다.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# bench_chat_load.py
+# /chat 부하 테스트
+# 1) 로컬 대체 모델 서버(fake_model_server) 실행
+# 2) storage/rag_db.sqlite 에 합성 문서 N개 저장 (insert_info)
+# 3) 여러 doc_id에 대해 목표 RPS로 /chat 요청을 동시에 발생 (open-loop: 응답을 기다리지 않고 일정 간격으로 발사)
+# 4) p50/p95/p99 지연, 오류율, 처리량, 요청당 모델 호출 수 출력
+#    → search_rag / find_best_sentence / 전역 chat state가 동시성에서 어디서 무너지는지 확인
+#
+# 실행 예:
+#   python -m src.bench.bench_chat_load --docs 50 --rps 20 --duration 30 --latency 0.05
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+import httpx
+
+from src.bench.fake_model_server import start_server, call_counts
+
+QUESTIONS = [
+    "납부 기한이 언제인가요?",
+    "환급 신청은 어디서 하나요?",
+    "환급 금액이 얼마인가요?",
+    "문의는 어디로 하면 되나요?",
+    "신청하지 않으면 어떻게 되나요?",
+]
+
+PAGE_TEXT = (
+    "OO구청 공고 제2025-{n}호.\n재산세 과오납 환급금 지급 안내.\n"
+    "환급 대상은 2025년 7월 정기분 재산세 이중 납부자입니다.\n"
+    "신청 기한은 2025. 12. 31.까지입니다.\n"
+    "위택스 온라인 신청 또는 구청 세무과 방문으로 신청할 수 있습니다.\n"
+    "문의처는 OO구청 세무과 02-120입니다.\n"
+    "기한 내 신청하지 않으면 환급금은 5년 후 소멸시효가 완성됩니다."
+)
+
+ACTIONS = [{"action": "재산세 환급 신청", "who": "납세자", "when": "2025-12-31까지",
+            "how": "위택스 온라인 신청", "where": "OO구청 세무과"}]
+
+
+def seed_documents(n_docs: int, pages: int) -> list[str]:
+    from src.chatbot.rag_builder import insert_info
+
+    doc_ids = []
+    for i in range(n_docs):
+        doc_id = f"load-{uuid.uuid4().hex[:8]}"
+        insert_info(doc_id, ACTIONS, [PAGE_TEXT.format(n=i * pages + p) for p in range(pages)])
+        doc_ids.append(doc_id)
+    return doc_ids
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))] if values else 0.0
+
+
+async def run_load(app, doc_ids: list[str], rps: float, duration: float, timeout: float) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    latencies, errors = [], []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as client:
+        async def one():
+            body = {"doc_id": random.choice(doc_ids), "question": random.choice(QUESTIONS)}
+            t0 = time.perf_counter()
+            try:
+                resp = await client.post("/chat", json=body)
+                if resp.status_code != 200:
+                    errors.append(f"HTTP {resp.status_code}")
+                    return
+                latencies.append(time.perf_counter() - t0)
+            except Exception as e:
+                errors.append(repr(e))
+
+        tasks = []
+        total = int(rps * duration)
+        t_start = time.perf_counter()
+        for i in range(total):
+            delay = t_start + i / rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one()))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - t_start
+
+    return {
+        "requests": total,
+        "ok": len(latencies),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / max(1, total), 4),
+        "error_samples": errors[:5],
+        "elapsed_seconds": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0,
+        "latency_seconds": {
+            "p50": round(_pct(latencies, 0.50), 3),
+            "p95": round(_pct(latencies, 0.95), 3),
+            "p99": round(_pct(latencies, 0.99), 3),
+            "max": round(max(latencies), 3) if latencies else 0.0,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/chat 부하 테스트")
+    parser.add_argument("--docs", type=int, default=20, help="seed 문서 수")
+    parser.add_argument("--pages", type=int, default=5, help="문서당 페이지 수")
+    parser.add_argument("--rps", type=float, default=10.0, help="목표 초당 요청 수")
+    parser.add_argument("--duration", type=float, default=20.0, help="부하 시간(초)")
+    parser.add_argument("--latency", type=float, default=0.05, help="대체 모델 서버 호출당 지연(초)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--keep", action="store_true", help="seed 문서를 DB에 남김")
+    parser.add_argument("--json", help="결과를 JSON 파일로 저장")
+    args = parser.parse_args()
+
+    # 모든 src 모듈이 config를 읽기 전에 대체 서버 주소 지정
+    server = start_server(latency=args.latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+    from src.app.main import app
+    from src.chatbot.rag_builder import delete_doc
+
+    doc_ids = seed_documents(args.docs, args.pages)
+    seed_calls = call_counts(server)
+    print(f"seed 문서 {len(doc_ids)}개 저장 완료")
+
+    report = asyncio.run(run_load(app, doc_ids, args.rps, args.duration, args.timeout))
+
+    calls = call_counts(server)
+    load_calls = {k: v - seed_calls.get(k, 0) for k, v in calls.items()}
+    report["model_calls"] = load_calls
+    report["model_calls_per_request"] = round(sum(load_calls.values()) / max(1, report["requests"]), 1)
+
+    if not args.keep:
+        for doc_id in doc_ids:
+            delete_doc(doc_id)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# bench_ingestion.py
+# 문서 처리 처리량(end-to-end) 벤치마크
+# 1) 합성 한국어 공공 안내문 PDF 생성: 텍스트 레이어 / 스캔(이미지) / 혼합, 1~100 페이지
+# 2) 로컬 대체 모델 서버(fake_model_server)를 띄우고
+#    node_ingestion_pipeline → node_ner_extractor → node_result → insert_info 실행
+# 3) docs/min, 단계별 p50/p95 지연, 최대 RSS, 모델 호출 수 출력 (배포 전 성능 회귀 확인용)
+#
+# 실행 예:
+#   python -m src.bench.bench_ingestion --pages 1 10 100 --kinds text scanned mixed --concurrency 2
+#   python -m src.bench.bench_ingestion --latency 0.3 --json bench_output.json
+import argparse
+import json
+import os
+import resource
+import statistics
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+
+from src.bench.fake_model_server import start_server, call_counts
+
+NOTICE_LINES = [
+    "OO구청 공고 제2025-{n}호",
+    "2025년 재산세 과오납 환급금 지급 안내",
+    "지방세기본법 제60조에 따라 과오납된 재산세 환급금을 아래와 같이 안내합니다.",
+    "1. 환급 대상: 2025년 7월 정기분 재산세 이중 납부자",
+    "2. 환급 금액: 152,300원",
+    "3. 신청 기한: 2025. 12. 31.까지",
+    "4. 신청 방법: 위택스(www.wetax.go.kr) 온라인 신청 또는 구청 세무과 방문",
+    "5. 입금 계좌: 신청서에 기재한 본인 명의 계좌 (예: 국민은행 123-45-678901)",
+    "6. 문의처: OO구청 세무과 02-120",
+    "※ 기한 내 신청하지 않으면 환급금은 5년 후 소멸시효가 완성됩니다.",
+]
+
+
+# 1) 합성 문서 생성
+def _notice_text(page_no: int) -> str:
+    return "\n".join(line.format(n=page_no) for line in NOTICE_LINES)
+
+
+def _add_text_page(doc: fitz.Document, page_no: int):
+    page = doc.new_page(width=595, height=842)
+    page.insert_textbox(fitz.Rect(50, 60, 545, 800), _notice_text(page_no), fontname="korea", fontsize=12)
+
+
+def _add_scanned_page(doc: fitz.Document, page_no: int, dpi: int = 150):
+    """텍스트 페이지를 이미지로 렌더링해 텍스트 레이어 없는 스캔 페이지로 삽입"""
+    tmp = fitz.open()
+    _add_text_page(tmp, page_no)
+    pix = tmp[0].get_pixmap(dpi=dpi)
+    tmp.close()
+
+    page = doc.new_page(width=595, height=842)
+    page.insert_image(page.rect, pixmap=pix)
+
+
+def make_pdf(path: str, kind: str, pages: int) -> str:
+    doc = fitz.open()
+    for i in range(pages):
+        if kind == "text" or (kind == "mixed" and i % 2 == 0):
+            _add_text_page(doc, i + 1)
+        else:
+            _add_scanned_page(doc, i + 1)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def make_corpus(out_dir: str, kinds, page_counts, copies: int = 1):
+    corpus = []
+    for kind in kinds:
+        for pages in page_counts:
+            for c in range(copies):
+                path = os.path.join(out_dir, f"{kind}_{pages:03d}p_{c}.pdf")
+                corpus.append({"path": make_pdf(path, kind, pages), "kind": kind, "pages": pages})
+    return corpus
+
+
+# 2) 문서 1개 실행
+def run_document(item):
+    from src.ingestion.node_ingestion_pipeline import node_ingestion_pipeline
+    from src.analyze.node_ner_extractor import node_ner_extractor
+    from src.result.node_result import node_result
+    from src.chatbot.rag_builder import insert_info
+    from src.utils.metrics import new_doc_metrics, doc_metrics_scope, track_stage
+
+    doc_id = f"bench-{uuid.uuid4().hex[:8]}"
+    state = {"input_paths": [item["path"]], "doc_id": doc_id}
+    doc_metrics = new_doc_metrics()
+
+    t0 = time.perf_counter()
+    with doc_metrics_scope(doc_metrics):
+        with track_stage("ingestion"):
+            state = node_ingestion_pipeline(state)
+        with track_stage("ner"):
+            state = node_ner_extractor(state)
+        with track_stage("result"):
+            state = node_result(state)
+        with track_stage("index"):
+            insert_info(doc_id, state["action_info"], state["refined_txt"])
+
+    return {**item, "doc_id": doc_id, "total": time.perf_counter() - t0, "metrics": doc_metrics}
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+# 3) 리포트
+def summarize(results, elapsed: float, model_calls: dict) -> dict:
+    stages = {}
+    for r in results:
+        for stage, seconds in r["metrics"]["stages"].items():
+            stages.setdefault(stage, []).append(seconds)
+    stages["total"] = [r["total"] for r in results]
+
+    return {
+        "documents": len(results),
+        "pages": sum(r["pages"] for r in results),
+        "elapsed_seconds": round(elapsed, 2),
+        "docs_per_minute": round(len(results) / elapsed * 60, 2) if elapsed else 0,
+        "stage_latency": {
+            stage: {"p50": round(_pct(v, 0.50), 3), "p95": round(_pct(v, 0.95), 3), "mean": round(statistics.mean(v), 3)}
+            for stage, v in stages.items()
+        },
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "model_calls": model_calls,
+        "model_calls_per_doc": round(sum(model_calls.values()) / max(1, len(results)), 1),
+    }
+
+
+def print_report(report: dict):
+    print(f"\n문서 {report['documents']}개 / {report['pages']}페이지 / {report['elapsed_seconds']}s "
+          f"→ {report['docs_per_minute']} docs/min")
+    print(f"{'stage':<12}{'p50(s)':>10}{'p95(s)':>10}{'mean(s)':>10}")
+    for stage, v in report["stage_latency"].items():
+        print(f"{stage:<12}{v['p50']:>10}{v['p95']:>10}{v['mean']:>10}")
+    print(f"peak RSS: {report['peak_rss_mb']} MB")
+    print(f"model calls: {report['model_calls']} (문서당 {report['model_calls_per_doc']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="문서 처리 처리량 벤치마크")
+    parser.add_argument("--kinds", nargs="+", default=["text", "scanned", "mixed"], choices=["text", "scanned", "mixed"])
+    parser.add_argument("--pages", nargs="+", type=int, default=[1, 10, 100])
+    parser.add_argument("--copies", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.05, help="대체 모델 서버 호출당 지연(초)")
+    parser.add_argument("--json", help="결과를 JSON 파일로 저장")
+    args = parser.parse_args()
+
+    # 모든 src 모듈이 config를 읽기 전에 대체 서버 주소 지정
+    server = start_server(latency=args.latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = make_corpus(tmp, args.kinds, args.pages, args.copies)
+        print(f"합성 문서 {len(corpus)}개 생성 완료")
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(run_document, corpus))
+        elapsed = time.perf_counter() - t0
+
+    report = summarize(results, elapsed, call_counts(server))
+
+    # 벤치마크 문서는 RAG DB에서 삭제
+    from src.chatbot.rag_builder import delete_doc
+    for r in results:
+        delete_doc(r["doc_id"])
+
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# bench_openai_client.py
+# 호출마다 OpenAI()를 새로 만드는 방식(기존) vs 공용 client(connection pool 재사용) 호출 지연 비교
+#
+# 실행 예:
+#   python -m src.bench.bench_openai_client --calls 30
+#   OPENAI_BASE_URL=http://127.0.0.1:8900/v1 python -m src.bench.bench_openai_client   (로컬 대체 서버)
+#
+# 출력: 방식별 호출당 mean / p50 / p95 / max (ms)
+import argparse
+import statistics
+import time
+
+from openai import OpenAI
+
+from src.utils.config import load_api_keys
+from src.utils.api_client import get_openai_client
+
+EMBED_MODEL = "text-embedding-3-small"
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(q * (len(values) - 1))))
+    return values[idx]
+
+
+def _one_call(client, text):
+    t0 = time.perf_counter()
+    client.embeddings.create(model=EMBED_MODEL, input=text)
+    return (time.perf_counter() - t0) * 1000
+
+
+def bench_fresh_client(calls: int):
+    """기존 방식: 호출마다 load_api_keys() + OpenAI() 생성"""
+    latencies = []
+    for i in range(calls):
+        t0 = time.perf_counter()
+        client = OpenAI(api_key=load_api_keys())
+        client.embeddings.create(model=EMBED_MODEL, input=f"납부 기한 안내 {i}")
+        latencies.append((time.perf_counter() - t0) * 1000)
+        client.close()
+    return latencies
+
+
+def bench_shared_client(calls: int):
+    """변경 방식: 공용 client 재사용 (첫 호출에서 연결 후 keep-alive)"""
+    client = get_openai_client()
+    _one_call(client, "warm-up")
+    return [_one_call(client, f"납부 기한 안내 {i}") for i in range(calls)]
+
+
+def report(name, latencies):
+    print(
+        f"{name:<16} calls={len(latencies):<4} "
+        f"mean={statistics.mean(latencies):8.1f}ms  "
+        f"p50={_percentile(latencies, 0.50):8.1f}ms  "
+        f"p95={_percentile(latencies, 0.95):8.1f}ms  "
+        f"max={max(latencies):8.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI client 재사용 전/후 호출 지연 비교")
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+
+    report("fresh client", bench_fresh_client(args.calls))
+    report("shared client", bench_shared_client(args.calls))
+
+
+if __name__ == "__main__":
+    main()
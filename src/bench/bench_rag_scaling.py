@@ -0,0 +1,111 @@
+# bench_rag_scaling.py
+# RAG DB 크기에 따른 search_rag 지연 측정 (doc_id 인덱스 효과 확인)
+# - 임시 rag_db.sqlite 에 문서당 rows_per_doc 행짜리 합성 문서를 계속 추가하면서
+#   단계별 전체 행 수(예: 1만 → 10만 → 100만)에서 임의 문서 search_rag p50/p95 측정
+# - 질의 임베딩은 API 대신 고정 벡터 사용 (DB 조회 + 디코딩 + 유사도 계산만 측정)
+# - --no-index 로 인덱스를 지워 전체 스캔과 비교
+#
+# 실행 예:
+#   python -m src.bench.bench_rag_scaling --sizes 10000 100000 1000000 --dim 256
+#   python -m src.bench.bench_rag_scaling --sizes 10000 100000 --no-index
+#   python -m src.bench.bench_rag_scaling --sizes 10000 100000 --mode lexical
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import src.chatbot.rag_builder as rag_builder
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def grow_to(target_rows: int, current_rows: int, rows_per_doc: int, dim: int, rng) -> list[str]:
+    """전체 행 수가 target_rows가 될 때까지 합성 문서 추가, 추가한 doc_id 목록 반환"""
+    doc_ids = []
+    conn = rag_builder.get_conn()
+    chunk = []
+    for i in range(current_rows // rows_per_doc, target_rows // rows_per_doc):
+        doc_id = f"scale-{i:07d}"
+        doc_ids.append(doc_id)
+        vecs = rng.standard_normal((rows_per_doc, dim)).astype(np.float32)
+        for p, vec in enumerate(vecs):
+            chunk.append((f"{doc_id}-{p}", doc_id, "page", p + 1, f"{doc_id} 페이지 {p + 1} 본문",
+                          rag_builder.encode_vector(vec), "{}", dim))
+        if len(chunk) >= 50000:
+            _insert(conn, chunk)
+            chunk = []
+    if chunk:
+        _insert(conn, chunk)
+    return doc_ids
+
+
+def _insert(conn, rows):
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO embeddings (id, doc_id, type, page_num, text, embedding, metadata, dim)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+
+
+def measure(doc_ids: list[str], queries: int, rng, mode: str) -> dict:
+    latencies = []
+    for _ in range(queries):
+        doc_id = doc_ids[rng.integers(len(doc_ids))]
+        t0 = time.perf_counter()
+        rag_builder.search_rag(doc_id, "페이지 본문", mode=mode)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return {"p50_ms": round(_pct(latencies, 0.50), 3), "p95_ms": round(_pct(latencies, 0.95), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG DB 크기별 search_rag 지연")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10000, 100000, 1000000])
+    parser.add_argument("--rows-per-doc", type=int, default=40)
+    parser.add_argument("--dim", type=int, default=256, help="벡터 차원 (1536은 100만 행에 약 6GB)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--no-index", action="store_true", help="doc_id 인덱스 삭제 후 측정")
+    parser.add_argument("--mode", default="vector", choices=["vector", "lexical", "hybrid"], help="search_rag 검색 방식")
+    parser.add_argument("--json", help="결과를 JSON 파일로 저장")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    query_vec = rng.standard_normal(args.dim).astype(np.float32)
+    rag_builder.embed_text = lambda text: query_vec
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        rag_builder.DB_PATH = os.path.join(tmp, "rag_db.sqlite")
+        rag_builder.init_db()
+        if args.no_index:
+            rag_builder.get_conn().execute("DROP INDEX IF EXISTS idx_embeddings_doc_type")
+
+        doc_ids, rows = [], 0
+        for size in sorted(args.sizes):
+            t0 = time.perf_counter()
+            doc_ids += grow_to(size, rows, args.rows_per_doc, args.dim, rng)
+            rows = size
+            load_s = time.perf_counter() - t0
+
+            r = {"rows": rows, "docs": len(doc_ids), "load_seconds": round(load_s, 1),
+                 **measure(doc_ids, args.queries, rng, args.mode)}
+            results.append(r)
+            print(f"rows={r['rows']:>9}  docs={r['docs']:>7}  search p50={r['p50_ms']:>8} ms  p95={r['p95_ms']:>8} ms")
+
+        rag_builder.close_conn()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"index": not args.no_index, "mode": args.mode, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# bench_vector_decode.py
+# 임베딩 BLOB 디코딩 벤치마크: pickle.dumps(np.ndarray) vs little-endian float32 bytes (np.frombuffer)
+# 1) 메모리: 10k행 디코딩 시간만 비교
+# 2) SQLite: 임시 DB에 두 형식으로 저장 후 SELECT + 디코딩 + 유사도 계산까지 비교
+# 3) 행당 저장 크기 비교
+#
+# 실행 예:
+#   python -m src.bench.bench_vector_decode --rows 10000 --repeat 5
+import argparse
+import os
+import pickle
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from src.chatbot.rag_builder import encode_vector, decode_vector
+from src.utils.config import EMBEDDING_DIM
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_memory(vectors: np.ndarray, repeat: int) -> dict:
+    pickled = [pickle.dumps(v) for v in vectors]
+    raw = [encode_vector(v) for v in vectors]
+
+    return {
+        "pickle_seconds": _best_of(lambda: [pickle.loads(b) for b in pickled], repeat),
+        "float32_seconds": _best_of(lambda: [decode_vector(b, EMBEDDING_DIM) for b in raw], repeat),
+        "pickle_bytes_per_row": len(pickled[0]),
+        "float32_bytes_per_row": len(raw[0]),
+    }
+
+
+def bench_sqlite(vectors: np.ndarray, repeat: int) -> dict:
+    query = vectors[0]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.sqlite"))
+        conn.execute("CREATE TABLE pickled (id INTEGER PRIMARY KEY, embedding BLOB)")
+        conn.execute("CREATE TABLE raw (id INTEGER PRIMARY KEY, embedding BLOB, dim INTEGER)")
+        conn.executemany("INSERT INTO pickled (embedding) VALUES (?)", [(pickle.dumps(v),) for v in vectors])
+        conn.executemany("INSERT INTO raw (embedding, dim) VALUES (?, ?)",
+                         [(encode_vector(v), v.shape[0]) for v in vectors])
+        conn.commit()
+
+        def scan_pickle():
+            rows = conn.execute("SELECT embedding FROM pickled").fetchall()
+            return [float(np.dot(query, pickle.loads(r[0]))) for r in rows]
+
+        def scan_raw():
+            rows = conn.execute("SELECT embedding, dim FROM raw").fetchall()
+            return [float(np.dot(query, decode_vector(r[0], r[1]))) for r in rows]
+
+        result = {
+            "pickle_seconds": _best_of(scan_pickle, repeat),
+            "float32_seconds": _best_of(scan_raw, repeat),
+        }
+        conn.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="임베딩 BLOB 디코딩 벤치마크")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    vectors = np.random.default_rng(0).standard_normal((args.rows, args.dim)).astype(np.float32)
+
+    mem = bench_memory(vectors, args.repeat)
+    db = bench_sqlite(vectors, args.repeat)
+    per_10k = 10000 / args.rows
+
+    print(f"rows={args.rows}, dim={args.dim} (best of {args.repeat}, 10k행 기준 환산)")
+    print(f"{'':<22}{'pickle':>12}{'float32':>12}{'speedup':>10}")
+    for name, r in (("decode only (ms)", mem), ("sqlite scan+cos (ms)", db)):
+        p, f = r["pickle_seconds"] * per_10k * 1000, r["float32_seconds"] * per_10k * 1000
+        print(f"{name:<22}{p:>12.1f}{f:>12.1f}{p / f:>9.1f}x")
+    print(f"{'bytes per row':<22}{mem['pickle_bytes_per_row']:>12}{mem['float32_bytes_per_row']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# fake_model_server.py
+# 벤치마크/부하테스트용 로컬 OpenAI 대체 서버 (표준 라이브러리만 사용)
+# - POST /v1/chat/completions, /v1/responses, /v1/embeddings 를 OpenAI 응답 형식으로 흉내냄
+# - --latency 로 호출당 지연(초)을, 임베딩은 입력 텍스트 해시 기반 결정적 벡터를 반환
+# - 행동 추출/문서 분류 프롬프트에는 파싱 가능한 JSON을 돌려줘 파이프라인 전체가 돌아가게 함
+#
+# 실행 예:
+#   python -m src.bench.fake_model_server --port 8900 --latency 0.2
+#   OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=fake uvicorn src.app.main:app
+import argparse
+import hashlib
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+EMBED_DIM = 1536
+
+DOC_TYPE_JSON = {"문서유형": "공고문서", "행동지시": True}
+NER_JSON = {
+    "doc_type": "지방세 환급 안내문",
+    "entities": {"organization": ["OO구청 세무과"], "due_date": ["2025-12-31"]},
+    "meta": {"doc_language": "ko"},
+}
+ACTION_JSON = {
+    "needs_action": True,
+    "action_info": [
+        {"action": "재산세 환급 신청", "who": "납세자", "when": "2025-12-31까지",
+         "how": "위택스 온라인 신청", "where": "OO구청 세무과"},
+    ],
+}
+
+
+def fake_embedding(text: str) -> list:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(EMBED_DIM).astype(np.float32)
+    vec /= np.linalg.norm(vec)
+    return vec.tolist()
+
+
+def _prompt_text(body: dict) -> str:
+    return json.dumps(body.get("messages") or body.get("input") or "", ensure_ascii=False)
+
+
+def fake_text(body: dict) -> str:
+    """프롬프트 내용에 맞춰 각 노드가 파싱할 수 있는 응답 생성"""
+    prompt = _prompt_text(body)
+    if "needs_action" in prompt:
+        return json.dumps(ACTION_JSON, ensure_ascii=False)
+    if "문서유형" in prompt and "행동지시" in prompt:
+        return json.dumps(DOC_TYPE_JSON, ensure_ascii=False)
+    if "NER" in prompt:
+        return json.dumps(NER_JSON, ensure_ascii=False)
+    if "image_url" in prompt:
+        return "OO구청 공고 제2025-1호\n재산세 환급 안내\n환급 신청 기한: 2025. 12. 31.까지"
+    return "이 문서는 재산세 환급에 대한 안내 문서입니다.\n- 신청 기한은 2025년 12월 31일까지입니다."
+
+
+def _usage(prompt_tokens: int, completion_tokens: int) -> dict:
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+class FakeModelHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    counts: dict = {}
+    counts_lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            with self.counts_lock:
+                self._send(dict(self.counts))
+            return
+        self.send_error(404)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        path = self.path.split("?")[0].rstrip("/")
+        kind = path.rsplit("/", 1)[-1]
+
+        with self.counts_lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        model = body.get("model", "fake")
+        prompt_tokens = len(_prompt_text(body)) // 2
+
+        if path.endswith("/embeddings"):
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            self._send({
+                "object": "list",
+                "model": model,
+                "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(t)}
+                         for i, t in enumerate(inputs)],
+                "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+            })
+        elif path.endswith("/chat/completions"):
+            text = fake_text(body)
+            self._send({
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": _usage(prompt_tokens, len(text) // 2),
+            })
+        elif path.endswith("/responses"):
+            text = fake_text(body)
+            self._send({
+                "id": f"resp_{uuid.uuid4().hex}",
+                "object": "response",
+                "created_at": int(time.time()),
+                "model": model,
+                "status": "completed",
+                "output": [{"id": f"msg_{uuid.uuid4().hex}", "type": "message", "role": "assistant",
+                            "status": "completed",
+                            "content": [{"type": "output_text", "text": text, "annotations": []}]}],
+                "parallel_tool_calls": True,
+                "tool_choice": "auto",
+                "tools": [],
+                "usage": {"input_tokens": prompt_tokens, "output_tokens": len(text) // 2,
+                          "total_tokens": prompt_tokens + len(text) // 2,
+                          "input_tokens_details": {"cached_tokens": 0},
+                          "output_tokens_details": {"reasoning_tokens": 0}},
+            })
+        else:
+            self.send_error(404)
+
+
+def start_server(port: int = 0, latency: float = 0.0) -> ThreadingHTTPServer:
+    """백그라운드 스레드로 서버 시작 (port=0 이면 빈 포트 자동 선택)"""
+    handler = type("Handler", (FakeModelHandler,), {"latency": latency, "counts": {}})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def call_counts(server: ThreadingHTTPServer) -> dict:
+    with server.RequestHandlerClass.counts_lock:
+        return dict(server.RequestHandlerClass.counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 OpenAI 대체 서버")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.latency)
+    print(f"fake model server: http://127.0.0.1:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
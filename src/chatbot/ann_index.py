@@ -0,0 +1,488 @@
+# ann_index.py
+# 전체 문서 대상 근사 최근접 검색 (IVF - inverted file, numpy만 사용)
+# - search_rag는 doc_id 1개 안에서만 전수 비교 → 여러 문서에 걸친 질문("재산세 환급을 언급한 공고는?")용 (/search)
+# - 구조 (IvfIndex)
+#     centroids : 군집 중심 ANN_NLIST개 (spherical k-means, 벡터가 ANN_NLIST * TRAIN_POINTS_PER_LIST개 모이면 학습)
+#     base      : 군집 순서로 정렬한 float16 정규화 벡터 + 군집별 시작 위치(offsets) → 군집 1개 = 연속 구간
+#     tail      : 아직 base에 합치지 않은 신규 벡터 (float32, 검색 시 전수 비교, ANN_TAIL_MAX 넘으면 base에 병합)
+#   검색 = 질의와 가까운 군집 ANN_NPROBE개 구간 + tail 만 비교
+# - 키는 rag_db.sqlite ann_log.seq (rag_builder.init_ann_log, sentence 행 제외)
+#     증분 반영: 마지막으로 반영한 seq 이후 행만 읽음 (insert_info 직후 + ANN_SYNC_INTERVAL 마다)
+#     삭제: 결과를 embeddings와 JOIN 할 때 빠짐, 삭제 비율이 ANN_COMPACT_RATIO를 넘으면 색인에서도 제거
+# - 저장: rag_db.sqlite 옆 rag_ann/ 에 스냅샷 (base 벡터는 mmap으로 읽음)
+#   ANN_SAVE_EVERY개 추가마다 + 서버 종료 시(main.py shutdown → stop() 후 save_snapshot())
+#   → 재시작하면 스냅샷 이후 ann_log만 다시 읽음
+#   여러 워커 프로세스는 각자 색인을 메모리에 두고 SQLite(ann_log) 기준으로 따라잡음
+# - 쓰기(증분 반영 / 학습 / 병합 / 정리 / 저장)는 프로세스당 백그라운드 스레드 1개에서만
+#   → 검색은 잠금 없이 현재 상태(_IvfState)를 읽고, 요청 처리 중에 k-means 학습이 돌지 않음
+# - 메모리: 1536차원 100만 청크 ≈ base 3GB(float16) + tail 최대 ANN_TAIL_MAX * 6KB
+#
+# 미리 만들기 / 군집 다시 학습:
+#   python -m src.chatbot.ann_index
+#   python -m src.chatbot.ann_index --retrain
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from collections import namedtuple
+from typing import Any, Dict, List
+
+import numpy as np
+
+import src.chatbot.rag_builder as rag_builder
+from src.chatbot.rag_builder import top_k_indices
+from src.utils.config import (
+    ANN_NLIST, ANN_NPROBE, ANN_TAIL_MAX, ANN_SAVE_EVERY, ANN_COMPACT_RATIO, ANN_SYNC_INTERVAL,
+)
+
+TRAIN_POINTS_PER_LIST = 32      # 군집당 이만큼 모이면 첫 학습
+TRAIN_SAMPLE_PER_LIST = 64      # 학습 표본 수 = 군집 수 * 이 값
+KMEANS_ITERATIONS = 10
+RETRAIN_GROWTH = 8              # 학습 당시보다 이 배수만큼 커지면 다시 학습
+SYNC_BATCH = 5000               # ann_log 증분 반영 1회 조회 행 수
+COMPACT_CHECK_INTERVAL = 60     # 삭제 비율 확인 주기(초)
+
+# 검색은 잠금 없이 이 묶음 하나를 읽음 → 병합/학습 중에도 일관된 상태
+#   tail: ((vectors, keys), ...) 추가 단위 목록
+_IvfState = namedtuple("_IvfState", "centroids vectors keys offsets tail")
+
+
+def _normalize(x) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    return x / (np.linalg.norm(x, axis=-1, keepdims=True) + 1e-9)
+
+
+# 1) IVF 색인 (메모리 구조, 단일 writer)
+class IvfIndex:
+    def __init__(self, dim: int, nlist: int = ANN_NLIST, nprobe: int = ANN_NPROBE, tail_max: int = ANN_TAIL_MAX):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.tail_max = tail_max
+        self.trained_on = 0   # 학습 당시 벡터 수
+        self.state = _IvfState(
+            None, np.zeros((0, dim), dtype=np.float16), np.zeros(0, dtype=np.int64), np.zeros(2, dtype=np.int64), (),
+        )
+
+    def __len__(self):
+        s = self.state
+        return len(s.keys) + sum(len(k) for _, k in s.tail)
+
+    def tail_size(self) -> int:
+        return sum(len(k) for _, k in self.state.tail)
+
+    def add(self, keys: np.ndarray, vectors: np.ndarray) -> None:
+        """tail에 추가만 함 (학습 / 병합은 maintain)"""
+        s = self.state
+        part = (_normalize(vectors), np.asarray(keys, dtype=np.int64))
+        self.state = s._replace(tail=s.tail + (part,))
+
+    def maintain(self) -> None:
+        """필요하면 첫 학습 / 재학습 / tail 병합 (writer에서만 호출, 오래 걸릴 수 있음)"""
+        if self.state.centroids is None:
+            if len(self) >= self.nlist * TRAIN_POINTS_PER_LIST:
+                self.train()
+        elif len(self) >= self.trained_on * RETRAIN_GROWTH:
+            self.train()
+        elif self.tail_size() > self.tail_max:
+            self.merge()
+
+    def _all(self):
+        """base + tail 전체 (float16 벡터, 키)"""
+        s = self.state
+        vectors = np.concatenate([s.vectors] + [v.astype(np.float16) for v, _ in s.tail])
+        keys = np.concatenate([s.keys] + [k for _, k in s.tail])
+        return vectors, keys
+
+    def _assign(self, centroids: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        """벡터별 가장 가까운 군집 번호 (메모리 제한을 위해 나눠서 계산)"""
+        out = np.empty(len(vectors), dtype=np.int64)
+        for i in range(0, len(vectors), 8192):
+            out[i:i + 8192] = np.argmax(np.asarray(vectors[i:i + 8192], dtype=np.float32) @ centroids.T, axis=1)
+        return out
+
+    def _build(self, centroids, vectors, keys, list_ids) -> _IvfState:
+        order = np.argsort(list_ids, kind="stable")
+        counts = np.bincount(list_ids, minlength=len(centroids))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return _IvfState(centroids, vectors[order], keys[order], offsets, ())
+
+    def _list_ids(self, s: _IvfState) -> np.ndarray:
+        """base 각 행의 군집 번호 (offsets에서 복원)"""
+        return np.repeat(np.arange(len(s.offsets) - 1), np.diff(s.offsets))
+
+    def merge(self) -> None:
+        """tail을 base에 합침 (tail만 군집 배정, base는 이미 군집 순서)"""
+        s = self.state
+        if not s.tail:
+            return
+        tail_vectors = np.concatenate([v for v, _ in s.tail])
+        tail_keys = np.concatenate([k for _, k in s.tail])
+
+        if s.centroids is None:
+            vectors = np.concatenate([s.vectors, tail_vectors.astype(np.float16)])
+            keys = np.concatenate([s.keys, tail_keys])
+            self.state = _IvfState(None, vectors, keys, np.array([0, len(keys)], dtype=np.int64), ())
+            return
+
+        list_ids = np.concatenate([self._list_ids(s), self._assign(s.centroids, tail_vectors)])
+        vectors = np.concatenate([s.vectors, tail_vectors.astype(np.float16)])
+        keys = np.concatenate([s.keys, tail_keys])
+        self.state = self._build(s.centroids, vectors, keys, list_ids)
+
+    def train(self, seed: int = 0) -> None:
+        """전체 벡터 표본으로 spherical k-means → 전체를 다시 군집 배정"""
+        vectors, keys = self._all()
+        n = len(keys)
+        if n < self.nlist:
+            return
+
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(n, min(n, self.nlist * TRAIN_SAMPLE_PER_LIST), replace=False)].astype(np.float32)
+        centroids = sample[rng.choice(len(sample), self.nlist, replace=False)].copy()
+
+        for _ in range(KMEANS_ITERATIONS):
+            assign = self._assign(centroids, sample)
+            counts = np.bincount(assign, minlength=self.nlist)
+            nonempty = np.flatnonzero(counts)
+            starts = np.concatenate([[0], np.cumsum(counts)])[nonempty]
+            sums = np.add.reduceat(sample[np.argsort(assign, kind="stable")], starts, axis=0)
+            centroids[nonempty] = _normalize(sums)
+            # 빈 군집은 임의 표본에서 다시 시작
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+
+        self.trained_on = n
+        self.state = self._build(centroids, vectors, keys, self._assign(centroids, vectors))
+
+    def keep(self, alive: np.ndarray) -> int:
+        """alive 키만 남김 (삭제된 청크 제거), 제거한 수 반환"""
+        s = self.state
+        before = len(self)
+        mask = np.isin(s.keys, alive)
+        list_ids = self._list_ids(s)[mask]
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(list_ids, minlength=len(s.offsets) - 1))])
+        tail = tuple((v[m], k[m]) for v, k in s.tail for m in [np.isin(k, alive)])
+        self.state = _IvfState(s.centroids, s.vectors[mask], s.keys[mask], offsets.astype(np.int64), tail)
+        return before - len(self)
+
+    def search(self, query_vec: np.ndarray, top_k: int):
+        """→ (키 배열, 코사인 점수 배열), 점수 내림차순"""
+        s = self.state
+        q = _normalize(query_vec)
+
+        if s.centroids is None:
+            lists = range(len(s.offsets) - 1)
+        else:
+            lists = top_k_indices(s.centroids @ q, self.nprobe)
+
+        scores, keys = [], []
+        for l in lists:
+            start, end = s.offsets[l], s.offsets[l + 1]
+            if end > start:
+                scores.append(np.asarray(s.vectors[start:end], dtype=np.float32) @ q)
+                keys.append(s.keys[start:end])
+        for vectors, tail_keys in s.tail:
+            scores.append(vectors @ q)
+            keys.append(tail_keys)
+
+        if not keys:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        scores = np.concatenate(scores)
+        keys = np.concatenate(keys)
+        idx = top_k_indices(scores, top_k)
+        return keys[idx], scores[idx]
+
+    # 2) 스냅샷 저장 / 읽기
+    def save(self, root: str, meta: Dict[str, Any]) -> None:
+        """
+        root/snap-<시각>/ 에 저장 후 root/CURRENT 를 원자적으로 교체
+        (여러 프로세스가 저장해도 CURRENT는 항상 완성된 스냅샷을 가리킴)
+        """
+        s = self.state
+        os.makedirs(root, exist_ok=True)
+        name = f"snap-{time.time_ns()}-{os.getpid()}"
+        path = os.path.join(root, name)
+        os.makedirs(path)
+
+        np.save(os.path.join(path, "vectors.npy"), s.vectors)
+        np.save(os.path.join(path, "keys.npy"), s.keys)
+        np.save(os.path.join(path, "offsets.npy"), s.offsets)
+        if s.centroids is not None:
+            np.save(os.path.join(path, "centroids.npy"), s.centroids)
+        tail_vectors = np.concatenate([v for v, _ in s.tail]) if s.tail else np.zeros((0, self.dim), np.float32)
+        tail_keys = np.concatenate([k for _, k in s.tail]) if s.tail else np.zeros(0, np.int64)
+        np.save(os.path.join(path, "tail_vectors.npy"), tail_vectors)
+        np.save(os.path.join(path, "tail_keys.npy"), tail_keys)
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({**meta, "dim": self.dim, "nlist": self.nlist, "trained_on": self.trained_on}, f)
+
+        tmp = os.path.join(root, f"CURRENT.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(name)
+        os.replace(tmp, os.path.join(root, "CURRENT"))
+
+        # 이전 스냅샷 삭제 (다른 프로세스가 mmap 중이라 못 지우면 다음 저장 때 다시 시도)
+        for old in os.listdir(root):
+            if old.startswith("snap-") and old != name:
+                shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+    @classmethod
+    def load(cls, root: str):
+        """→ (IvfIndex, meta) 또는 스냅샷이 없으면 None"""
+        try:
+            with open(os.path.join(root, "CURRENT"), encoding="utf-8") as f:
+                path = os.path.join(root, f.read().strip())
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        index = cls(meta["dim"], nlist=meta["nlist"])
+        index.trained_on = meta.get("trained_on", 0)
+        centroids_path = os.path.join(path, "centroids.npy")
+        tail_keys = np.load(os.path.join(path, "tail_keys.npy"))
+        index.state = _IvfState(
+            np.load(centroids_path) if os.path.exists(centroids_path) else None,
+            np.load(os.path.join(path, "vectors.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "keys.npy")),
+            np.load(os.path.join(path, "offsets.npy")),
+            ((np.load(os.path.join(path, "tail_vectors.npy")), tail_keys),) if len(tail_keys) else (),
+        )
+        return index, meta
+
+
+# 3) rag_db.sqlite 와 동기화되는 전체 문서 색인
+class CorpusAnnIndex:
+    """
+    - sync / retrain / save_snapshot: writer (start()의 백그라운드 스레드, 서버 종료 단계 또는 색인 생성 CLI)
+    - search / stats: 잠금 없이 현재 상태만 읽음 (반영 전 청크는 다음 sync 이후 검색됨)
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.lock = threading.Lock()     # writer는 한 번에 하나 (검색은 잠금 없음)
+        self.ivf: IvfIndex | None = None  # 첫 벡터를 읽을 때 차원 확정
+        self.watermark = 0                # 반영한 마지막 ann_log.seq
+        self.unsaved = 0
+        self.last_compact_check = 0.0
+        self.wake = threading.Event()     # notify_insert → writer 스레드 깨움
+        self.stopped = False
+        self.thread: threading.Thread | None = None
+
+        loaded = IvfIndex.load(root)
+        if loaded:
+            ivf, meta = loaded
+            # rag_db.sqlite를 새로 만든 경우(seq가 다시 1부터) 이전 스냅샷은 버림
+            row = rag_builder.get_conn().execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'ann_log'"
+            ).fetchone()
+            if (row[0] if row else 0) >= meta["watermark"]:
+                self.ivf, self.watermark = ivf, meta["watermark"]
+
+    def sync(self) -> int:
+        """ann_log 에서 watermark 이후 추가된 청크를 색인에 반영(+ 학습 / 병합 / 정리 / 저장), 반영한 행 수 반환"""
+        with self.lock:
+            added = 0
+            conn = rag_builder.get_conn()
+            while True:
+                rows = conn.execute(
+                    """
+                    SELECT l.seq, e.embedding, e.dim
+                    FROM ann_log l JOIN embeddings e ON e.rowid = l.emb_rowid
+                    WHERE l.seq > ?
+                    ORDER BY l.seq
+                    LIMIT ?
+                    """,
+                    (self.watermark, SYNC_BATCH),
+                ).fetchall()
+                if not rows:
+                    break
+                self.watermark = rows[-1]["seq"]
+
+                if self.ivf is None:
+                    self.ivf = IvfIndex(rows[0]["dim"])
+                rows = [row for row in rows if row["dim"] == self.ivf.dim]
+                if not rows:
+                    continue
+                vectors = np.frombuffer(b"".join(row["embedding"] for row in rows), dtype=rag_builder.VECTOR_DTYPE)
+                self.ivf.add(
+                    np.array([row["seq"] for row in rows], dtype=np.int64),
+                    vectors.reshape(len(rows), self.ivf.dim),
+                )
+                self.ivf.maintain()
+                added += len(rows)
+
+            self.unsaved += added
+            self._maybe_compact(conn)
+            if self.unsaved >= ANN_SAVE_EVERY:
+                self._save()
+            return added
+
+    def _maybe_compact(self, conn) -> None:
+        """삭제된 청크 비율이 ANN_COMPACT_RATIO를 넘으면 색인에서 제거"""
+        now = time.monotonic()
+        if self.ivf is None or now - self.last_compact_check < COMPACT_CHECK_INTERVAL:
+            return
+        self.last_compact_check = now
+
+        alive = conn.execute("SELECT COUNT(*) FROM ann_log WHERE seq <= ?", (self.watermark,)).fetchone()[0]
+        if len(self.ivf) - alive <= ANN_COMPACT_RATIO * len(self.ivf):
+            return
+        keys = conn.execute("SELECT seq FROM ann_log WHERE seq <= ?", (self.watermark,)).fetchall()
+        self.unsaved += self.ivf.keep(np.array([row[0] for row in keys], dtype=np.int64))
+
+    def _save(self) -> None:
+        try:
+            self.ivf.save(self.root, {"watermark": self.watermark})
+            self.unsaved = 0
+        except OSError as e:
+            print(f"!! ANN 색인 저장 실패: {e}")
+
+    def save_snapshot(self) -> None:
+        """마지막 저장 이후 바뀐 내용이 있으면 스냅샷 저장 (writer 스레드가 반영 중이면 끝날 때까지 기다림)"""
+        with self.lock:
+            if self.ivf is not None and self.unsaved:
+                self._save()
+
+    def retrain(self) -> None:
+        with self.lock:
+            if self.ivf is not None:
+                self.ivf.train()
+                self.unsaved += 1
+
+    def stats(self) -> Dict[str, Any]:
+        ivf = self.ivf
+        return {
+            "size": len(ivf) if ivf else 0,
+            "dim": ivf.dim if ivf else None,
+            "trained": bool(ivf and ivf.state.centroids is not None),
+            "nlist": ivf.nlist if ivf else ANN_NLIST,
+            "nprobe": ivf.nprobe if ivf else ANN_NPROBE,
+            "tail": ivf.tail_size() if ivf else 0,
+            "watermark": self.watermark,
+        }
+
+    # writer 스레드
+    def start(self) -> None:
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="ann-index", daemon=True)
+            self.thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self.stopped = True
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def _run(self) -> None:
+        while not self.stopped:
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"!! ANN 색인 반영 실패: {e!r}")
+            self.wake.wait(ANN_SYNC_INTERVAL)
+            self.wake.clear()
+        rag_builder.close_conn()
+
+    def search(self, query_vec: np.ndarray, top_k: int = 10) -> List[Dict[str, Any]]:
+        """
+        전체 문서에서 질의 벡터와 가까운 청크 top_k (action / chunk / page 행)
+        - 삭제된 청크가 섞여 있을 수 있으므로 여유 있게 뽑은 뒤 embeddings에 남아 있는 것만 반환
+        """
+        ivf = self.ivf
+        if ivf is None or not len(ivf):
+            return []
+
+        keys, scores = ivf.search(query_vec, top_k * 2 + 10)
+        if not len(keys):
+            return []
+
+        marks = ",".join("?" * len(keys))
+        with rag_builder.get_conn() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT l.seq, e.id, e.doc_id, e.type, e.page_num, e.text, e.metadata
+                FROM ann_log l JOIN embeddings e ON e.rowid = l.emb_rowid
+                WHERE l.seq IN ({marks})
+                """,
+                [int(k) for k in keys],
+            ).fetchall()
+        by_seq = {row["seq"]: row for row in rows}
+
+        results = []
+        for key, score in zip(keys, scores):
+            row = by_seq.get(int(key))
+            if row is None:
+                continue
+            results.append({
+                "id": row["id"],
+                "doc_id": row["doc_id"],
+                "type": row["type"],
+                "page_num": row["page_num"],
+                "text": row["text"],
+                "metadata": json.loads(row["metadata"]) if row["metadata"] else {},
+                "score": float(score),
+            })
+            if len(results) == top_k:
+                break
+        return results
+
+
+# 4) 공용 색인
+_index: CorpusAnnIndex | None = None
+_index_lock = threading.Lock()
+
+
+def ann_dir() -> str:
+    """rag_db.sqlite 옆 rag_ann/"""
+    return os.path.join(os.path.dirname(rag_builder.DB_PATH), "rag_ann")
+
+
+def get_ann_index() -> CorpusAnnIndex:
+    """프로세스 공용 색인 (최초 호출 시 스냅샷을 읽고, 이후 추가분은 writer 스레드가 반영)
+    - API 서버는 시작 단계에서 호출 → 첫 /search 전에 따라잡기 시작"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = CorpusAnnIndex(ann_dir())
+                index.start()
+                _index = index
+    return _index
+
+
+def notify_insert() -> None:
+    """
+    insert_info 직후 호출 - 이 프로세스에 색인이 올라와 있을 때만 writer 스레드를 깨움 (일괄 적재 프로세스는 건너뜀)
+    - 반영은 기다리지 않음 (색인 저장 요청이 학습 / 저장 시간만큼 늦어지지 않도록)
+    """
+    if _index is not None:
+        _index.wake.set()
+
+
+def search_corpus(query: str, top_k: int = 10) -> List[Dict[str, Any]]:
+    """전체 문서 검색 (질의 임베딩 1회 + IVF 검색)"""
+    return get_ann_index().search(rag_builder.embed_text(query), top_k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="전체 문서 ANN 색인 생성 / 갱신")
+    parser.add_argument("--retrain", action="store_true", help="군집 중심을 전체 벡터로 다시 학습")
+    args = parser.parse_args()
+
+    index = CorpusAnnIndex(ann_dir())   # writer 스레드 없이 이 프로세스에서 바로 반영
+    t0 = time.perf_counter()
+    added = index.sync()
+    if args.retrain:
+        index.retrain()
+    index.save_snapshot()
+    print(f"[ann] {added}개 반영, {time.perf_counter() - t0:.1f}s → {json.dumps(index.stats(), ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,32 +8,73 @@ import os
 import uuid
 import json
 import pickle
+import re
 import sqlite3
+import threading
+import time
 import numpy as np
+from collections import OrderedDict
 from typing import List, Dict, Any
  
-from openai import OpenAI
-from src.utils.config import load_api_keys
-API_KEY = load_api_keys()
-client = OpenAI(api_key=API_KEY)   
+from src.utils.api_client import create_embedding, estimate_tokens
+from src.utils.config import (
+    EMBEDDING_MODEL, EMBEDDING_DIM, EMBED_BATCH_SIZE, EMBED_BATCH_MAX_TOKENS,
+    DOC_MATRIX_CACHE_BYTES, DOC_MATRIX_CACHE_TTL, RAG_CHUNK_TOKENS, RAG_CHUNK_OVERLAP,
+    RAG_SEARCH_MODE, RAG_RRF_K, RAG_DB_PATH,
+)
+from src.utils.embedding_cache import get_embedding_cache, normalize_text
+from src.utils.metrics import metric_family, register_collector
+from src.utils.text_utils import split_sentences_with_offsets, chunk_text
  
 # 0) 경로 설정 및 DB 초기화
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-STORAGE_DIR = os.path.join(BASE_DIR, "storage")
-os.makedirs(STORAGE_DIR, exist_ok=True)
- 
-DB_PATH = os.path.join(STORAGE_DIR, "rag_db.sqlite")
- 
- 
+DB_PATH = RAG_DB_PATH
+os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+ 
+ 
+# 연결 설정
+# - WAL: 색인(쓰기)과 챗봇 검색(읽기)이 서로를 막지 않음
+# - synchronous=NORMAL: WAL에서는 커밋마다 fsync 하지 않아도 DB가 깨지지 않음 (전원 장애 시 마지막 커밋만 유실 가능)
+# - cache / mmap: 자주 읽는 페이지를 메모리에 유지
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=30000",
+    "PRAGMA cache_size=-65536",        # 64MB (음수 = KiB 단위)
+    "PRAGMA mmap_size=268435456",      # 256MB
+    "PRAGMA temp_store=MEMORY",
+)
+
+_local = threading.local()
+
+
 def get_conn():
-    """SQLite Connection"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """
+    SQLite Connection (스레드별로 1개를 만들어 재사용)
+    - 호출마다 connect 하지 않으므로 pragma 설정/파일 open 비용이 한 번만 듬
+    - `with get_conn() as conn:` 은 트랜잭션 commit/rollback만 하고 연결은 닫지 않음
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != DB_PATH:
+        conn = sqlite3.connect(DB_PATH, timeout=30)
+        conn.row_factory = sqlite3.Row
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        _local.conn = conn
+        _local.path = DB_PATH
     return conn
+
+
+def close_conn():
+    """현재 스레드의 연결 닫기 (워커 종료 / 테스트용)"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
  
  
 def init_db():
-    """embeddings 테이블 생성"""
+    """embeddings 테이블 생성 (+ FTS5 색인)
+    - 이전 pickle 저장 형식 변환(migrate_pickle_embeddings)은 import 시점이 아니라 서버 시작 단계에서 실행"""
     with get_conn() as conn:
         cur = conn.cursor()
         cur.execute(
@@ -44,35 +85,277 @@ def init_db():
                 type TEXT,
                 page_num INTEGER,
                 text TEXT,
-                embedding BLOB NOT NULL,
-                metadata TEXT
+                embedding BLOB NOT NULL,   -- little-endian float32 연속 bytes (dim * 4 bytes)
+                metadata TEXT,
+                dim INTEGER                -- 벡터 차원 (NULL = 이전 pickle 형식)
+            )
+            """
+        )
+        columns = {row["name"] for row in cur.execute("PRAGMA table_info(embeddings)")}
+        if "dim" not in columns:
+            cur.execute("ALTER TABLE embeddings ADD COLUMN dim INTEGER")
+        # 검색/삭제는 항상 doc_id(+type) 조건 → 전체 테이블 스캔 대신 해당 문서 행만 읽음
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_doc_type ON embeddings(doc_id, type)")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings_quarantine (
+                id TEXT PRIMARY KEY,
+                doc_id TEXT,
+                type TEXT,
+                page_num INTEGER,
+                text TEXT,
+                embedding BLOB,
+                metadata TEXT,
+                error TEXT,
+                quarantined_at REAL
+            )
+            """
+        )
+        conn.commit()
+
+    init_fts()
+    init_ann_log()
+
+
+# 키워드 검색용 FTS5 색인 (embeddings_fts)
+# - tokenize=trigram: 글자 3개 단위 색인 → 띄어쓰기/조사와 무관하게 세목명, 계좌번호, 조례 조항 번호 등 부분 일치
+#   (SQLite 3.34 이상 필요, 없으면 FTS_AVAILABLE=False 로 벡터 검색만 사용)
+# - external content(content='embeddings'): 본문은 embeddings에만 저장, rowid = embeddings.rowid
+#   → 문서 범위는 rowid 조건으로 걸러 FTS5가 범위 밖 doclist를 건너뜀 (search_lexical)
+# - embeddings 의 INSERT / DELETE 트리거로 자동 동기화 (sentence 행은 제외)
+#   VACUUM 으로 embeddings rowid가 바뀌면 rebuild_fts() 실행
+FTS_AVAILABLE = False
+FTS_MAX_TERMS = 64   # 질의 1개당 trigram 최대 개수
+
+
+def init_fts():
+    global FTS_AVAILABLE
+    with get_conn() as conn:
+        row = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type='table' AND name='embeddings_fts'"
+        ).fetchone()
+        if row is not None and "content='embeddings'" not in row["sql"]:
+            # 이전 형식(본문 복사 + doc_id UNINDEXED 로 거르던 색인) → 다시 생성
+            conn.execute("DROP TRIGGER IF EXISTS embeddings_fts_ai")
+            conn.execute("DROP TRIGGER IF EXISTS embeddings_fts_ad")
+            conn.execute("DROP TABLE embeddings_fts")
+            row = None
+        try:
+            conn.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS embeddings_fts USING fts5(
+                    text, content='embeddings', content_rowid='rowid', tokenize='trigram'
+                )
+                """
             )
+        except sqlite3.OperationalError as e:
+            print(f" [SQLite] FTS5 trigram 사용 불가 → 벡터 검색만 사용 ({e})")
+            return
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS embeddings_fts_ai AFTER INSERT ON embeddings
+            WHEN new.type IS NOT 'sentence' BEGIN
+                INSERT INTO embeddings_fts (rowid, text) VALUES (new.rowid, new.text);
+            END
+            """
+        )
+        # external content 색인은 지울 때 색인했던 본문을 그대로 넘겨야 함
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS embeddings_fts_ad AFTER DELETE ON embeddings
+            WHEN old.type IS NOT 'sentence' BEGIN
+                INSERT INTO embeddings_fts (embeddings_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+            END
             """
         )
         conn.commit()
+    FTS_AVAILABLE = True
+
+    if row is None:
+        rebuild_fts()
+
+
+def init_ann_log():
+    """
+    전체 문서 근사 검색(ann_index.py)용 추가 기록 ann_log
+    - seq(AUTOINCREMENT)는 재사용되지 않음 → 색인은 마지막으로 반영한 seq 이후만 읽어 증분 반영
+    - embeddings 삭제 시 트리거로 같이 삭제 → 삭제된 청크는 검색 결과 조회(JOIN) 단계에서 빠짐
+    """
+    with get_conn() as conn:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='ann_log'"
+        ).fetchone()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ann_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                emb_rowid INTEGER NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_ann_log_emb ON ann_log(emb_rowid)")
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS embeddings_ann_ai AFTER INSERT ON embeddings
+            WHEN new.type IS NOT 'sentence' BEGIN
+                INSERT INTO ann_log (emb_rowid) VALUES (new.rowid);
+            END
+            """
+        )
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS embeddings_ann_ad AFTER DELETE ON embeddings BEGIN
+                DELETE FROM ann_log WHERE emb_rowid = old.rowid;
+            END
+            """
+        )
+        if not exists:
+            conn.execute(
+                "INSERT INTO ann_log (emb_rowid) SELECT rowid FROM embeddings WHERE type IS NOT 'sentence' ORDER BY rowid"
+            )
+        conn.commit()
+
+
+def rebuild_fts():
+    """embeddings 기준으로 FTS 색인 전체 재생성 (FTS5 'rebuild'는 sentence 행까지 넣으므로 직접 채움)"""
+    with get_conn() as conn:
+        conn.execute("INSERT INTO embeddings_fts (embeddings_fts) VALUES ('delete-all')")
+        conn.execute(
+            """
+            INSERT INTO embeddings_fts (rowid, text)
+            SELECT rowid, text FROM embeddings WHERE type IS NOT 'sentence'
+            """
+        )
+        conn.commit()
+
+
+# 벡터 저장 형식: pickle 대신 little-endian float32 bytes
+VECTOR_DTYPE = np.dtype("<f4")
+
+
+def encode_vector(vec: np.ndarray) -> bytes:
+    return np.ascontiguousarray(vec, dtype=VECTOR_DTYPE).tobytes()
+
+
+def decode_vector(blob: bytes, dim: int | None = None) -> np.ndarray:
+    """BLOB → float32 벡터 (복사 없이 bytes 위에 바로 view, 읽기 전용)"""
+    vec = np.frombuffer(blob, dtype=VECTOR_DTYPE)
+    if dim is not None and vec.shape[0] != dim:
+        raise ValueError(f"벡터 차원 불일치: 저장={dim}, 실제={vec.shape[0]}")
+    return vec
+
+
+def migrate_pickle_embeddings(batch_size: int = 1000) -> int:
+    """
+    이전 형식(pickle.dumps(np.ndarray)) 행을 float32 bytes로 1회 변환, 변환한 행 수 반환
+    - dim IS NULL 인 행만 대상이므로 여러 번 실행해도 안전 (main.py 시작 단계에서 워커 / ANN 색인보다 먼저 실행)
+    - 풀 수 없는 행(깨진 pickle, 숫자 배열이 아님)은 embeddings_quarantine 으로 옮기고 계속 진행
+      → 행 1개 때문에 서버 시작이 막히지 않고, 같은 배치를 다시 읽으며 멈추지도 않음
+    - batch_size 행마다 commit
+    - pickle.loads는 이 마이그레이션에서만 사용 (직접 만든 기존 DB만 대상)
+    """
+    migrated = quarantined = 0
+    with get_conn() as conn:
+        while True:
+            rows = conn.execute(
+                "SELECT id, embedding FROM embeddings WHERE dim IS NULL LIMIT ?", (batch_size,)
+            ).fetchall()
+            if not rows:
+                break
+
+            updates, bad = [], []
+            for row in rows:
+                try:
+                    vec = np.asarray(pickle.loads(row["embedding"]), dtype=np.float32).ravel()
+                    if vec.size == 0:
+                        raise ValueError("빈 벡터")
+                except Exception as e:
+                    print(f" [SQLite] embeddings id={row['id']} 변환 실패 → 격리: {e!r}")
+                    bad.append((repr(e), time.time(), row["id"]))
+                    continue
+                updates.append((encode_vector(vec), vec.shape[0], row["id"]))
+
+            conn.executemany("UPDATE embeddings SET embedding=?, dim=? WHERE id=?", updates)
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO embeddings_quarantine
+                    (id, doc_id, type, page_num, text, embedding, metadata, error, quarantined_at)
+                SELECT id, doc_id, type, page_num, text, embedding, metadata, ?, ?
+                FROM embeddings WHERE id = ?
+                """,
+                bad,
+            )
+            conn.executemany("DELETE FROM embeddings WHERE id=?", [(row_id,) for _, _, row_id in bad])
+            conn.commit()
+            migrated += len(updates)
+            quarantined += len(bad)
+
+    if migrated or quarantined:
+        print(f" [SQLite] embeddings {migrated}개 pickle → float32 변환 완료 (격리 {quarantined}개)")
+    return migrated
  
  
-# 모듈 로드 시 실행
+# 모듈 로드 시 테이블만 생성 (데이터 변환은 migrate_pickle_embeddings)
 init_db()
  
 # 1) OpenAI Embedding 함수
+def _embedding_batches(texts: List[str]):
+    """(원래 위치 목록, 입력 목록) 단위로 분할 - 요청당 입력 수 / 추정 토큰 합 상한 준수"""
+    idxs, batch, tokens = [], [], 0
+    for i, text in enumerate(texts):
+        if not text:
+            continue
+        t = estimate_tokens({"input": text})
+        if batch and (len(batch) >= EMBED_BATCH_SIZE or tokens + t > EMBED_BATCH_MAX_TOKENS):
+            yield idxs, batch
+            idxs, batch, tokens = [], [], 0
+        idxs.append(i)
+        batch.append(text)
+        tokens += t
+    if batch:
+        yield idxs, batch
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """
+    여러 문장을 한 번에 임베딩 → (len(texts), EMBEDDING_DIM) float32 배열 (입력 순서 유지)
+    - 입력은 normalize_text로 정규화 후 임베딩 캐시(embedding_cache.py)부터 조회,
+      캐시에 없는 텍스트만 (중복 제거 후) API 호출하고 결과를 캐시에 저장
+    - 요청 1회에 최대 EMBED_BATCH_SIZE개 / EMBED_BATCH_MAX_TOKENS 토큰씩 묶어서 호출
+    - 빈 문자열은 API 호출 없이 zero vector
+    - 호출 실패(재시도 소진, circuit open)는 zero vector로 숨기지 않고 예외를 올린다
+      (zero vector가 DB에 저장되면 검색 품질이 조용히 망가지므로)
+    """
+    vectors = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    normalized = [normalize_text(text) for text in texts]
+
+    cache = get_embedding_cache()
+    known = cache.get_many(EMBEDDING_MODEL, normalized) if cache else {}
+    missing = [text for text in dict.fromkeys(normalized) if text and text not in known]
+
+    fresh = {}
+    for idxs, batch in _embedding_batches(missing):
+        response = create_embedding(model=EMBEDDING_MODEL, input=batch)
+        # 응답 순서는 index 필드 기준으로 맞춤
+        for item in response.data:
+            fresh[missing[idxs[item.index]]] = np.asarray(item.embedding, dtype=np.float32)
+    if cache:
+        cache.put_many(EMBEDDING_MODEL, fresh)
+    known.update(fresh)
+
+    for i, text in enumerate(normalized):
+        if text:
+            vectors[i] = known[text]
+
+    return vectors
+
+
 def embed_text(text: str) -> np.ndarray:
     """
     OpenAI text-embedding-3-small 사용
-    SentenceTransformer 대체
+    SentenceTransformer 대체 (문장 1개, embed_texts 참고)
     """
-    if not text:
-        text = ""
-    try:
-        response = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
-        )
-        return np.array(response.data[0].embedding, dtype=np.float32)
-    except Exception as e:
-        print(" Embedding Error:", e)
-        # fallback: zero vector
-        return np.zeros(1536, dtype=np.float32)
+    return embed_texts([text])[0]
  
  
 # 2) dict → 문장 변환
@@ -115,69 +398,68 @@ def insert_actions(action_list):
 # 4) 본 기능: doc_id 단위로 SQLite에 저장
 def insert_info(doc_id: str, action_info: list, refined_txt: List[str]):
     """
-    RAG 저장 함수: 행동(action) + 페이지 텍스트(refined_txt)
+    RAG 저장 함수: 행동(action) + 페이지 텍스트 청크(chunk) + 페이지별 문장(sentence)
+    - 페이지 전체를 한 항목으로 넣지 않고 chunk_text로 RAG_CHUNK_TOKENS 크기(겹침 RAG_CHUNK_OVERLAP)씩 나눔
+      → 긴 페이지도 임베딩 입력 한도 안, 검색 결과 / 챗봇 프롬프트에는 관련 부분만 들어감
+      chunk 행 metadata: page / chunk(페이지 내 순번) / start / end (페이지 원문 글자 위치)
+    - 저장할 항목을 먼저 모은 뒤 임베딩은 embed_texts 로 묶어서 호출 (항목마다 1회 → 요청 1~2회)
+    - sentence 행: 챗봇 출처 문장 선택용 (page_num + 페이지 내 글자 위치 start/end)
+      → 질문마다 문장을 다시 임베딩하지 않음, 일반 검색(search_rag) 대상에서는 제외
+    - DB 저장은 executemany 로 한 트랜잭션에
     """
-    with get_conn() as conn:
-        cur = conn.cursor()
-        inserted = 0
+    # (type, page_num, text, metadata)
+    entries = []
  
-        # 1) 행동(action_info)
-        if action_info:
-            for item in action_info:
-                sentence = dict_to_sentence(item)
-                if not sentence.strip():
-                    continue
+    # 1) 행동(action_info)
+    for item in action_info or []:
+        sentence = dict_to_sentence(item)
+        if not sentence.strip():
+            continue
+        entries.append(("action", None, sentence, json.dumps(item, ensure_ascii=False)))
  
-                embedding_vec = embed_text(sentence)
-                emb_blob = pickle.dumps(embedding_vec)
- 
-                cur.execute(
-                    """
-                    INSERT INTO embeddings (id, doc_id, type, page_num, text, embedding, metadata)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        uuid.uuid4().hex,
-                        doc_id,
-                        "action",
-                        None,
-                        sentence,
-                        emb_blob,
-                        json.dumps(item, ensure_ascii=False),
-                    ),
-                )
-                inserted += 1
+    # 2) refined_txt (페이지 텍스트 → 청크, 위치는 원문 page_text 기준)
+    for idx, page_text in enumerate(refined_txt or []):
+        page_text = page_text or ""
+        for n, (chunk, start, end) in enumerate(chunk_text(page_text, RAG_CHUNK_TOKENS, RAG_CHUNK_OVERLAP)):
+            metadata = {"page": idx + 1, "chunk": n, "start": start, "end": end}
+            entries.append(("chunk", idx + 1, chunk, json.dumps(metadata, ensure_ascii=False)))
  
-        # 2) refined_txt (페이지 텍스트)
-        if refined_txt:
-            for idx, page_text in enumerate(refined_txt):
-                clean_text = (page_text or "").strip()
-                if not clean_text:
-                    continue
+        # 3) 페이지 문장
+        for sentence, start, end in split_sentences_with_offsets(page_text):
+            metadata = {"page": idx + 1, "start": start, "end": end}
+            entries.append(("sentence", idx + 1, sentence, json.dumps(metadata, ensure_ascii=False)))
  
-                embedding_vec = embed_text(clean_text)
-                emb_blob = pickle.dumps(embedding_vec)
- 
-                cur.execute(
-                    """
-                    INSERT INTO embeddings (id, doc_id, type, page_num, text, embedding, metadata)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        uuid.uuid4().hex,
-                        doc_id,
-                        "page",
-                        idx + 1,
-                        clean_text,
-                        emb_blob,
-                        json.dumps({"page": idx + 1}, ensure_ascii=False),
-                    ),
-                )
-                inserted += 1
+    vectors = embed_texts([text for _, _, text, _ in entries])
  
+    rows = [
+        (uuid.uuid4().hex, doc_id, type_, page_num, text, encode_vector(vec), metadata, vec.shape[0])
+        for (type_, page_num, text, metadata), vec in zip(entries, vectors)
+    ]
+ 
+    with get_conn() as conn:
+        conn.executemany(
+            """
+            INSERT INTO embeddings (id, doc_id, type, page_num, text, embedding, metadata, dim)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
         conn.commit()
+    doc_matrix_cache.invalidate(doc_id)
+ 
+    # 전체 문서 검색 색인: 이 프로세스에 색인이 올라와 있으면 바로 증분 반영 (없으면 다음 검색 때 반영)
+    from src.chatbot.ann_index import notify_insert
+    notify_insert()
  
-    print(f" [SQLite] doc_id={doc_id} → {inserted}개 항목 저장 완료")
+    print(f" [SQLite] doc_id={doc_id} → {len(rows)}개 항목 저장 완료")
+ 
+ 
+def delete_doc(doc_id: str):
+    """doc_id 문서의 저장 항목 삭제 (재처리/작업 재개 시 중복 저장 방지)"""
+    with get_conn() as conn:
+        conn.execute("DELETE FROM embeddings WHERE doc_id = ?", (doc_id,))
+        conn.commit()
+    doc_matrix_cache.invalidate(doc_id)
  
  
 # 5) (레거시) in-memory 검색
@@ -198,53 +480,325 @@ def search_actions(query: str, top_k: int = 3):
  
  
 # 6) SQLite 기반 RAG 검색
-def search_rag(doc_id: str, query: str, top_k: int = 5):
+# 문서 행은 용도별로 나눠서 행렬을 만든다
+#   search   : action / chunk (이전 색인 문서는 page) → search_rag 검색 대상
+#   sentence : 페이지별 문장 → 출처 문장 선택(best_sentences) 전용
+SENTENCE_TYPE = "sentence"
+
+
+class DocMatrixCache:
     """
-    문서 단위 RAG 검색
-    action_info + refined_txt 전체 검색
+    doc_id → {용도: (항목 정보 목록, 정규화 행렬)} 프로세스 내 LRU 캐시
+    - 총 크기(행렬 bytes + 텍스트 길이 추정)가 max_bytes를 넘으면 가장 오래 안 쓴 문서부터 제거
+    - insert_info / delete_doc 에서 해당 doc_id 무효화
+    - 다른 워커 프로세스가 같은 doc_id를 재색인한 경우는 ttl 경과 후 다시 읽어 반영
     """
-    query_vec = embed_text(query)
- 
-    # DB에서 doc_id 해당하는 embedding 모두 가져오기
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT id, doc_id, type, page_num, text, embedding, metadata
-            FROM embeddings
-            WHERE doc_id = ?
-            """,
-            (doc_id,),
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()   # doc_id → (groups, size, loaded_at)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.version = 0   # 무효화할 때마다 증가 → 읽는 도중 무효화된 결과는 캐시에 넣지 않음
+        self.lock = threading.Lock()
+
+    def get(self, doc_id: str):
+        with self.lock:
+            entry = self.entries.get(doc_id)
+            if entry is not None and time.monotonic() - entry[2] > self.ttl:
+                self._remove(doc_id)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(doc_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, doc_id: str, groups: Dict[str, tuple], version: int):
+        size = sum(
+            matrix.nbytes + sum(len(item["text"] or "") * 3 + 200 for item in items)
+            for items, matrix in groups.values()
         )
-        rows = cur.fetchall()
- 
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if version != self.version:
+                return
+            if doc_id in self.entries:
+                self._remove(doc_id)
+            self.entries[doc_id] = (groups, size, time.monotonic())
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, doc_id: str):
+        with self.lock:
+            self.version += 1
+            if doc_id in self.entries:
+                self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        self.bytes -= self.entries.pop(doc_id)[1]
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "docs": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+doc_matrix_cache = DocMatrixCache(DOC_MATRIX_CACHE_BYTES, DOC_MATRIX_CACHE_TTL)
+
+
+def _cache_prometheus_lines():
+    """/metrics 에 붙일 문서 행렬 캐시 지표"""
+    s = doc_matrix_cache.stats()
+    return [
+        *metric_family("rag_doc_cache_hits_total", "counter", "Document matrix cache hits", [((), s["hits"])]),
+        *metric_family("rag_doc_cache_misses_total", "counter", "Document matrix cache misses", [((), s["misses"])]),
+        *metric_family("rag_doc_cache_evictions_total", "counter", "Documents evicted from the matrix cache",
+                       [((), s["evictions"])]),
+        *metric_family("rag_doc_cache_bytes", "gauge", "Estimated size of the document matrix cache",
+                       [((), s["bytes"])]),
+        *metric_family("rag_doc_cache_docs", "gauge", "Documents in the matrix cache", [((), s["docs"])]),
+    ]
+
+
+register_collector(_cache_prometheus_lines)
+
+
+def _build_matrix(doc_id: str, rows) -> tuple:
+    """행 목록 → (항목 정보 목록, 행 단위 L2 정규화 행렬)"""
     if not rows:
-        print(f"!! doc_id={doc_id} 데이터 없음")
-        return []
- 
-    def cosine(a, b):
-        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-9))
- 
-    scored_items = []
-    for row in rows:
-        emb_vec = pickle.loads(row["embedding"])  # np.array(float32)
-        score = cosine(query_vec, emb_vec)
- 
-        item = {
+        return [], np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+
+    dims = {row["dim"] for row in rows}
+    if len(dims) != 1:
+        raise ValueError(f"doc_id={doc_id} 벡터 차원이 섞여 있음: {sorted(dims)}")
+
+    matrix = np.frombuffer(b"".join(row["embedding"] for row in rows), dtype=VECTOR_DTYPE)
+    matrix = matrix.reshape(len(rows), dims.pop()).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-9
+    matrix.setflags(write=False)
+
+    items = [
+        {
             "id": row["id"],
             "doc_id": row["doc_id"],
             "type": row["type"],
             "page_num": row["page_num"],
             "text": row["text"],
-            "embedding": emb_vec.tolist(),
             "metadata": json.loads(row["metadata"]) if row["metadata"] else {},
-            "score": score,
         }
-        scored_items.append((score, item))
- 
-    scored_items.sort(key=lambda x: x[0], reverse=True)
- 
-    return [item for score, item in scored_items[:top_k]]
+        for row in rows
+    ]
+    return items, matrix
+
+
+def _load_doc_groups(doc_id: str) -> Dict[str, tuple]:
+    cached = doc_matrix_cache.get(doc_id)
+    if cached is not None:
+        return cached
+    version = doc_matrix_cache.version
+
+    with get_conn() as conn:
+        rows = conn.execute(
+            """
+            SELECT id, doc_id, type, page_num, text, embedding, metadata, dim
+            FROM embeddings
+            WHERE doc_id = ?
+            """,
+            (doc_id,),
+        ).fetchall()
+
+    groups = {
+        "search": _build_matrix(doc_id, [row for row in rows if row["type"] != SENTENCE_TYPE]),
+        "sentence": _build_matrix(doc_id, [row for row in rows if row["type"] == SENTENCE_TYPE]),
+    }
+    doc_matrix_cache.put(doc_id, groups, version)
+    return groups
+
+
+def load_doc_matrix(doc_id: str, group: str = "search"):
+    """
+    doc_id 문서의 항목 정보 목록 + 정규화된 임베딩 행렬(float32, [행 수, dim]) 반환
+    - group="search": action / chunk / page 행 (검색 대상), group="sentence": 문장 행
+    - 같은 문서에 이어서 질문하면 캐시(doc_matrix_cache)에서 바로 반환 (DB 조회 없음)
+    - BLOB들을 이어 붙여 np.frombuffer 한 번으로 행렬 생성 (행마다 디코딩하지 않음)
+    - 행 단위 L2 정규화 → 검색 시 내적 = 코사인 유사도
+    - 캐시와 공유되므로 반환값은 수정하지 말 것 (행렬은 읽기 전용)
+    """
+    return _load_doc_groups(doc_id)[group]
+
+
+def normalize_query(query_vec: np.ndarray) -> np.ndarray:
+    query_vec = np.asarray(query_vec, dtype=np.float32)
+    return query_vec / (np.linalg.norm(query_vec) + 1e-9)
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """점수 상위 top_k 위치 (argpartition으로 고른 뒤 그 k개만 정렬)"""
+    k = min(top_k, scores.shape[0])
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def fts_terms(query: str) -> List[str]:
+    """
+    질의 → trigram 목록 (질의 어절의 trigram, 소문자, 중복 제거 후 최대 FTS_MAX_TERMS개)
+    - 3글자 미만 어절은 trigram 색인으로 찾을 수 없어 제외
+    """
+    grams = []
+    for word in re.findall(r"[\w\-./]+", query.lower()):   # 어절 (숫자 사이 - . / 는 유지)
+        word = word.strip("-./")
+        grams += [word[i:i + 3] for i in range(len(word) - 2)]
+    return list(dict.fromkeys(grams))[:FTS_MAX_TERMS]
+
+
+def fts_query(terms: List[str]) -> str:
+    """trigram 목록 → FTS5 MATCH 식 (OR 연결)"""
+    return " OR ".join('"' + g.replace('"', '""') + '"' for g in terms)
+
+
+def search_lexical(doc_id: str, query: str, items: List[Dict[str, Any]], limit: int) -> List[tuple]:
+    """
+    FTS5 trigram 검색 → [(items 안 위치, BM25 점수)] 점수 높은 순
+    - items: 이 문서의 search 항목 (문서 행렬 캐시)
+    - 후보: MATCH를 이 문서 행의 rowid 범위로 제한 + doc_id 확인
+      (insert_info는 문서 행을 한 트랜잭션에 넣어 rowid가 연속 → 범위 밖 doclist는 FTS5가 건너뜀, DB 크기와 무관)
+    - 점수: 이 문서 항목 기준 BM25 (N / 평균 길이 / df 모두 문서 안에서 계산)
+      bm25()는 질의 trigram마다 전체 색인의 통계를 읽어 DB가 커질수록 느려지므로 사용하지 않음
+      tf = 항목 본문의 trigram 출현 수, 길이 = 본문 trigram 수
+    """
+    terms = fts_terms(query)
+    if not FTS_AVAILABLE or not terms or not items:
+        return []
+
+    with get_conn() as conn:
+        lo, hi = conn.execute(
+            "SELECT MIN(rowid), MAX(rowid) FROM embeddings WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        if lo is None:
+            return []
+        rows = conn.execute(
+            """
+            SELECT e.id
+            FROM embeddings_fts f JOIN embeddings e ON e.rowid = f.rowid
+            WHERE embeddings_fts MATCH ? AND f.rowid BETWEEN ? AND ? AND e.doc_id = ?
+            """,
+            (fts_query(terms), lo, hi, doc_id),
+        ).fetchall()
+
+    position = {item["id"]: i for i, item in enumerate(items)}
+    hits = [position[row["id"]] for row in rows if row["id"] in position]
+    if not hits:
+        return []
+
+    lengths = np.array([max(len(item["text"] or "") - 2, 0) for item in items], dtype=np.float32)
+    avg = float(lengths.mean()) or 1.0
+    tf = np.array([[(items[i]["text"] or "").lower().count(g) for g in terms] for i in hits], dtype=np.float32)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(items) - df + 0.5) / (df + 0.5))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[hits] / avg)
+    scores = (idf * tf * (BM25_K1 + 1) / (tf + norm[:, None])).sum(axis=1)
+
+    return [(hits[i], float(scores[i])) for i in top_k_indices(scores, limit) if scores[i] > 0]
+
+
+def search_rag(
+    doc_id: str,
+    query: str,
+    top_k: int = 5,
+    query_vec: np.ndarray | None = None,
+    mode: str = RAG_SEARCH_MODE,
+):
+    """
+    문서 단위 RAG 검색
+    action_info + refined_txt 전체 검색 (sentence 행 제외)
+    - mode="vector": 문서 임베딩 행렬 × 질의 벡터 한 번으로 전체 점수 계산 후 top-k 선택
+    - mode="lexical": FTS5 trigram 검색 + 문서 단위 BM25 순위만 사용 (임베딩 호출 없음)
+    - mode="hybrid": 벡터 / BM25 상위 후보 순위를 RRF(Σ 1/(RAG_RRF_K + 순위))로 합쳐 top-k
+      (키워드가 정확히 일치하는 항목과 의미가 가까운 항목을 함께 올림)
+    - query_vec를 넘기면 질의 임베딩을 다시 호출하지 않음 (챗봇에서 출처 문장 선택과 공유)
+    - 반환 항목에는 임베딩 벡터를 넣지 않음, score는 mode별 점수 (vector: 코사인, lexical: BM25, hybrid: RRF)
+    """
+    items, matrix = load_doc_matrix(doc_id)
+    if not items:
+        print(f"!! doc_id={doc_id} 데이터 없음")
+        return []
+
+    candidates = max(top_k * 4, 20)
+    ranked: List[List[int]] = []
+
+    if mode != "lexical":
+        if query_vec is None:
+            query_vec = embed_text(query)
+        scores = matrix @ normalize_query(query_vec)
+        if mode == "vector":
+            return [{**items[i], "score": float(scores[i])} for i in top_k_indices(scores, top_k)]
+        ranked.append(list(top_k_indices(scores, candidates)))
+
+    lexical = search_lexical(doc_id, query, items, candidates)
+    if mode == "lexical":
+        return [{**items[i], "score": score} for i, score in lexical[:top_k]]
+    ranked.append([i for i, _ in lexical])
+
+    fused: Dict[int, float] = {}
+    for ranking in ranked:
+        for rank, i in enumerate(ranking, start=1):
+            fused[int(i)] = fused.get(int(i), 0.0) + 1.0 / (RAG_RRF_K + rank)
+    best = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    return [{**items[i], "score": fused[i]} for i in best]
+
+
+def best_sentences(doc_id: str, query_vec: np.ndarray, spans: List[tuple]) -> List[Dict[str, Any] | None]:
+    """
+    검색된 범위마다 질의와 가장 가까운 문장 → spans와 같은 순서의 문장 항목(+score) 목록
+    - spans: (page_num, start, end) - chunk 행은 페이지 내 글자 위치, page 행은 (page_num, None, None) = 페이지 전체
+    - 색인 시 저장한 sentence 행만 사용 (임베딩 API 호출 없음)
+    - 문서 전체 문장 점수를 행렬곱 한 번으로 계산한 뒤 범위별 최댓값 선택 (범위와 겹치는 문장)
+    - 해당 범위에 sentence 행이 없으면(이 기능 이전에 색인된 문서) None
+    """
+    items, matrix = load_doc_matrix(doc_id, "sentence")
+    if not items:
+        return [None] * len(spans)
+
+    scores = matrix @ normalize_query(query_vec)
+    pages = np.array([item["page_num"] for item in items])
+    starts = np.array([item["metadata"].get("start", 0) for item in items])
+    ends = np.array([item["metadata"].get("end", 0) for item in items])
+
+    result = []
+    for page_num, start, end in spans:
+        mask = pages == page_num
+        if start is not None and end is not None:
+            mask &= (starts < end) & (ends > start)
+        idx = np.flatnonzero(mask)
+        if idx.size:
+            best = idx[np.argmax(scores[idx])]
+            result.append({**items[best], "score": float(scores[best])})
+        else:
+            result.append(None)
+    return result
  
  
 # 7) 간단 답변 생성 예시
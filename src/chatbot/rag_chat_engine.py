@@ -1,12 +1,21 @@
 #RAG 기반 안전 챗봇 엔진
 #- 사용자의 질문을 받아 벡터DB 검색 수행
 #- 검색된 근거 기반으로 LLM 답변 생성
-#- 답변 기록(state) 관리 (최대 3개 슬롯)
-#- 초과 시 자동 요약 저장
+#- 답변 기록(state) 관리: (session_id, doc_id) 세션 단위, 최근 기록은 개수/토큰 상한 안에서만 유지
+#- 초과 시 자동 요약 저장 (요약도 토큰 상한으로 자름)
+#- 오래 안 쓴 세션은 자동 삭제 (유휴 시간 / 최대 세션 수 기준 LRU)
 
-from src.chatbot.rag_builder import search_rag, embed_text 
-from openai import OpenAI
-from src.utils.config import load_api_keys
+import threading
+import time
+
+from src.chatbot.rag_builder import search_rag, embed_text, best_sentences
+from src.utils.api_client import create_chat_completion, estimate_tokens
+from src.utils.rate_limiter import ModelUnavailableError
+from src.utils.state_store import get_state_store
+from src.utils.config import (
+    CHAT_HISTORY_TURNS, CHAT_HISTORY_TOKEN_CAP, CHAT_SUMMARY_TOKEN_CAP,
+    CHAT_SESSION_IDLE_SECONDS, CHAT_MAX_SESSIONS, RAG_SEARCH_MODE,
+)
 
 
 # call_llm_chat 구현 (문서 기반 챗봇)
@@ -16,10 +25,7 @@ def call_llm_chat(prompt: str) -> str:
     - JSON 출력 강제 없음
     - 자연어 답변 + bullet 가능
     """
-    API_KEY = load_api_keys()
-    client = OpenAI(api_key=API_KEY)   
-
-    resp = client.chat.completions.create(
+    resp = create_chat_completion(
         model="gpt-5.1-chat-latest" ,
         messages=[
             {
@@ -40,12 +46,80 @@ def call_llm_chat(prompt: str) -> str:
     return resp.choices[0].message.content.strip()
 
 # 1) state 구조 정의
-state = {
+# - 공유 상태 저장소(state_store.py)의 "chat" 네임스페이스에 (session_id, doc_id) 세션별로 저장
+#   → 다른 사용자/문서의 대화가 섞이지 않고, 어느 워커 프로세스로 가도 같은 기록을 사용
+# - 읽기는 get, 쓰기는 update(원자적 read-modify-write)로 처리
+CHAT_NAMESPACE = "chat"
+DEFAULT_SESSION = "default"
+
+DEFAULT_STATE = {
     "history": [],       # [{"question": str, "answer": str}]
     "summary": "",        # 오래된 기록 요약 저장
     "present_answer": ""    # 진아님 요청사항(2025-11-27)
 }
 
+# 유휴 세션 정리 주기(초)
+SESSION_PRUNE_INTERVAL = 600
+
+_last_prune = 0.0
+_prune_lock = threading.Lock()
+
+
+def session_key(session_id: str | None, doc_id: str) -> str:
+    return f"{session_id or DEFAULT_SESSION}:{doc_id}"
+
+
+def load_state(session_id: str | None, doc_id: str) -> dict:
+    return get_state_store().get(CHAT_NAMESPACE, session_key(session_id, doc_id), DEFAULT_STATE)
+
+
+def _turn_tokens(turns: list) -> int:
+    return sum(estimate_tokens({"input": f"Q: {h['question']}\nA: {h['answer']}"}) for h in turns)
+
+
+def _record_answer(key: str, user_query: str, answer: str):
+    """
+    답변 기록 추가 후 최근 기록을 CHAT_HISTORY_TURNS개 / CHAT_HISTORY_TOKEN_CAP 토큰 안으로 줄임
+    (방금 답변 1개는 항상 유지) → (새 state, 잘려나간 기록) 반환
+    """
+    trimmed = []
+
+    def apply(state):
+        state["present_answer"] = answer
+        state["history"].append({"question": user_query, "answer": answer})
+        history = state["history"]
+        while len(history) > 1 and (
+            len(history) > CHAT_HISTORY_TURNS or _turn_tokens(history) > CHAT_HISTORY_TOKEN_CAP
+        ):
+            trimmed.append(history.pop(0))
+        return state
+
+    state = get_state_store().update(CHAT_NAMESPACE, key, apply, DEFAULT_STATE)
+    return state, trimmed
+
+
+def _save_summary(key: str, summary: str) -> dict:
+    # 요약도 상한을 넘지 않도록 뒤쪽(최근 내용)을 남기고 자름 (1글자 ≈ 1토큰 기준)
+    if estimate_tokens({"input": summary}) > CHAT_SUMMARY_TOKEN_CAP:
+        summary = summary[-CHAT_SUMMARY_TOKEN_CAP:]
+
+    def apply(state):
+        state["summary"] = summary
+        return state
+
+    return get_state_store().update(CHAT_NAMESPACE, key, apply, DEFAULT_STATE)
+
+
+def _maybe_prune_sessions() -> None:
+    """CHAT_SESSION_IDLE_SECONDS 동안 안 쓴 세션 + CHAT_MAX_SESSIONS 초과분(LRU) 삭제"""
+    global _last_prune
+    now = time.monotonic()
+    with _prune_lock:
+        if now - _last_prune < SESSION_PRUNE_INTERVAL:
+            return
+        _last_prune = now
+    get_state_store().prune_keys(CHAT_NAMESPACE, CHAT_SESSION_IDLE_SECONDS, CHAT_MAX_SESSIONS)
+
 
 # 2) 오래된 기록 요약하는 함수
 def summarize_history(history_list, existing_summary=""):
@@ -69,66 +143,49 @@ def summarize_history(history_list, existing_summary=""):
     return call_llm_chat(prompt).strip()
 
 
-import re
-import numpy as np
-
-# 문장 분리
-def split_sentences(text: str):
-    # 날짜 패턴 보호 (마침표로 쪼개지지 않게)
-    safe_text = re.sub(r'(\d{4})\.\s*(\d{1,2})\.\s*(\d{1,2})', r'\1-\2-\3', text)
-
-    # 문장 단위 분리
-    sentences = re.split(r'(?<=[.!?…\n])\s+', safe_text)
-
-    # 공백 제거 + 너무 짧은 문장 제거
-    sentences = [s.strip() for s in sentences if len(s.strip()) > 5]
-
-    # 출력 시 날짜 표기 복원
-    sentences = [re.sub(r'(\d{4})-(\d{1,2})-(\d{1,2})', r'\1.\2.\3', s) for s in sentences]
-
-    return sentences
-
-
-
-# 코사인 유사도
-def cosine_sim(a, b):
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
-
-
 # 질문 vs 문서 문장 유사도 기반 최적 문장 찾기
-def find_best_sentence(query: str, chunk_text: str):
-    sentences = split_sentences(chunk_text)
-    if not sentences:
-        return None
+# - 문장 분리/임베딩은 색인 시 insert_info 에서 1회 (text_utils.split_sentences_with_offsets)
+# - 여기서는 이미 계산한 질의 벡터로 저장된 문장 행렬만 조회 → 임베딩 API 호출 없음
+# - chunk 항목은 청크 범위 안의 문장, page 항목(이전 색인 문서)은 페이지 전체 문장 중에서 선택
+def find_best_sentences(doc_id: str, query_vec, page_items: list) -> list:
+    spans = [
+        (item.get("page_num"), item["metadata"].get("start"), item["metadata"].get("end"))
+        if item.get("type") == "chunk" else (item.get("page_num"), None, None)
+        for item in page_items
+    ]
+    found = best_sentences(doc_id, query_vec, spans)
+    # 겹치는 청크에서 같은 문장이 나오면 1번만
+    return list(dict.fromkeys(s["text"] for s in found if s))
 
-    q_vec = embed_text(query)  # 기존 RAG embedding 함수 그대로 사용
-    best_sent = None
-    best_score = -1
 
-    for sent in sentences:
-        s_vec = embed_text(sent)
-        sim = cosine_sim(q_vec, s_vec)
-        if sim > best_score:
-            best_score = sim
-            best_sent = sent
+# 출처 문장을 뽑을 검색 결과 유형
+SOURCE_TYPES = ("chunk", "page")
 
-    return best_sent
 
 # 3) RAG 기반 답변 생성 함수 (문장 기반 근거추출 완전통합 버전)
-def generate_response(doc_id: str, user_query: str) -> dict:
+def generate_response(doc_id: str, user_query: str, session_id: str | None = None) -> dict:
     """
     문서 단위(doc_id) 기반 RAG 검색 → 답변 생성 → state 업데이트
+    - 대화 기록은 (session_id, doc_id) 세션 단위 (session_id가 없으면 문서별 기본 세션)
+    - 임베딩 호출은 질문당 1회 (질의 벡터를 검색과 출처 문장 선택에 같이 사용)
+    - 임베딩 API를 쓸 수 없으면(재시도 소진 / circuit open) 키워드 검색(lexical)만으로 답변
     """
+    key = session_key(session_id, doc_id)
+    _maybe_prune_sessions()
 
     # 1) RAG 검색 실행
-    retrieved_items = search_rag(doc_id=doc_id, query=user_query)
+    try:
+        query_vec = embed_text(user_query) if RAG_SEARCH_MODE != "lexical" else None
+        retrieved_items = search_rag(doc_id=doc_id, query=user_query, query_vec=query_vec)
+    except ModelUnavailableError:
+        query_vec = None
+        retrieved_items = search_rag(doc_id=doc_id, query=user_query, mode="lexical")
 
     # 검색 결과 없으면
     if not retrieved_items:
         answer = "문서에 해당 내용이 없습니다.\n더 많은 정보는 문서 출처에 문의해주세요."
 
-        state["present_answer"] = answer
-        state["history"].append({"question": user_query, "answer": answer})
+        state, _ = _record_answer(key, user_query, answer)
 
         return {
             "answer": answer,
@@ -136,8 +193,8 @@ def generate_response(doc_id: str, user_query: str) -> dict:
             "state": state
         }
 
-    #  1-1) 출처용 후보 = page 텍스트만 필터링 (action 제외)
-    page_items = [item for item in retrieved_items if item.get("type") == "page"]
+    #  1-1) 출처용 후보 = 페이지 텍스트 청크만 필터링 (action 제외, page는 청크 도입 이전 색인 문서)
+    page_items = [item for item in retrieved_items if item.get("type") in SOURCE_TYPES]
 
     # 만약 page가 검색 안 됐다면 fallback (현실적으로 거의 없음)
     if not page_items:
@@ -151,10 +208,12 @@ def generate_response(doc_id: str, user_query: str) -> dict:
     ])
 
     # 3) 이전 대화 history 반영
+    state = load_state(session_id, doc_id)
     history_text = "\n".join([
         f"Q: {h['question']}\nA: {h['answer']}"
         for h in state["history"]
     ])
+    history_summary = state["summary"]
 
     # 4) LLM Prompt 구성
     prompt = f"""
@@ -166,7 +225,7 @@ def generate_response(doc_id: str, user_query: str) -> dict:
     {doc_id}
 
     [이전 대화 요약]
-    {state["summary"]}
+    {history_summary}
 
     [최근 대화 기록]
     {history_text}
@@ -193,32 +252,26 @@ def generate_response(doc_id: str, user_query: str) -> dict:
 
 
     # 6)  문서 출처 문장 기반 추출 (action 제외)
-    best_sentences = []
-
-    for item in page_items:     #  refined_txt에서만 뽑는다
-        page_text = item.get("text", "")
-        best_sentence = find_best_sentence(user_query, page_text)
-
-        if best_sentence:
-            best_sentences.append(f"- {best_sentence}")
+    #    refined_txt 페이지에서만 뽑는다
+    source_lines = []
+    if query_vec is not None:
+        source_lines = [f"- {sentence}" for sentence in find_best_sentences(doc_id, query_vec, page_items)]
 
     # fallback: 검색된 page 중 첫 번째
-    if not best_sentences:
+    if not source_lines:
         fallback = page_items[0].get("text", "")
-        best_sentences.append(f"- {fallback}")
+        source_lines.append(f"- {fallback}")
 
-    real_source = "\n".join(best_sentences)
+    real_source = "\n".join(source_lines)
 
 
     # 7) state 업데이트
-    state["present_answer"] = answer
-    state["history"].append({"question": user_query, "answer": answer})
-
-    # 8) state history 크기 제한
-    if len(state["history"]) > 3:
-        old_data = state["history"][:-3]
-        state["history"] = state["history"][-3:]
-        state["summary"] = summarize_history(old_data, state["summary"])
+    # 8) state history 크기 제한 (요약 LLM 호출은 저장소 잠금 밖에서)
+    state, old_data = _record_answer(key, user_query, answer)
+
+    if old_data:
+        new_summary = summarize_history(old_data, state["summary"])
+        state = _save_summary(key, new_summary)
 
     return {
         "answer": answer,
@@ -1,8 +1,10 @@
-from openai import OpenAI
 import base64
 from src.utils.logger import log
+from src.utils.progress import emit_progress
 from src.utils.config import LLM_MODEL
-from src.utils.config import load_api_keys
+from src.utils.api_client import create_chat_completion
+from src.utils.rate_limiter import ModelUnavailableError
+from src.utils.admission import stage_slot
 import os
 # os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE" # 위치변경 절대 금지
 import fitz
@@ -13,29 +15,31 @@ def pdf_to_images(pdf_path: str, dpi: int = 350) -> list[str]:
     """
     PDF -> 이미지 변환
     디스크에 파일 저장 없이 base64 PNG 문자열 리스트로 반환
+    (래스터화는 CPU/메모리를 많이 쓰므로 admission "cpu" 슬롯 안에서 실행)
     """
     import base64
     import os
     import fitz
 
-    doc = fitz.open(pdf_path)
     image_b64_list = []
 
     # DPI → zoom matrix 변환
     zoom = dpi / 72
     mat = fitz.Matrix(zoom, zoom)
 
-    try:
-        for page in doc:
-            pix = page.get_pixmap(matrix=mat)
+    with stage_slot("cpu"):
+        doc = fitz.open(pdf_path)
+        try:
+            for page in doc:
+                pix = page.get_pixmap(matrix=mat)
 
-            img_bytes = pix.tobytes("png")  # 메모리에서 PNG bytes 생성
-            img_b64 = base64.b64encode(img_bytes).decode("utf-8")  # 문자열로 변환
+                img_bytes = pix.tobytes("png")  # 메모리에서 PNG bytes 생성
+                img_b64 = base64.b64encode(img_bytes).decode("utf-8")  # 문자열로 변환
 
-            image_b64_list.append(img_b64)
+                image_b64_list.append(img_b64)
 
-    finally:
-        doc.close()
+        finally:
+            doc.close()
 
     return image_b64_list
 
@@ -56,8 +60,6 @@ def pdf_to_images(pdf_path: str, dpi: int = 350) -> list[str]:
 #     return image_paths
 
 # 텍스트 llm 정제
-API_KEY = load_api_keys()
-client = OpenAI(api_key=API_KEY)
 
 PROMPT ="""
 너는 공공문서 전문 정제 및 개인정보 보호 전문가다.
@@ -111,7 +113,7 @@ def llm_clean_pii(text: str) -> str:
 
     prompt = PROMPT + "\n\n[원문]\n" + text
 
-    resp = client.chat.completions.create(
+    resp = create_chat_completion(
         model="gpt-4.1-mini",
         messages=[
             {"role": "system",
@@ -139,7 +141,7 @@ def extract_page_text(image_b64: str) -> str:
     """
     vision_prompt = PROMPT
 
-    response = client.chat.completions.create(
+    response = create_chat_completion(
         model="gpt-4.1-mini",
         messages=[
             {
@@ -167,18 +169,25 @@ def extract_page_text(image_b64: str) -> str:
 
 
 # 전체 페이지 Vision 처리
-def llm_text_from_images(image_b64_list: list[str]) -> list[str]:
+def llm_text_from_images(image_b64_list: list[str], doc_id: str | None = None) -> list[str]:
     """
     base64 PNG 문자열 리스트를 받아 Vision OCR 수행 후 텍스트 정제
+    - doc_id가 있으면 페이지마다 ocr 진행 이벤트(i/N) 기록
     """
     final_pages = []
-    log(f"[Vision] 총 {len(image_b64_list)} 페이지 인식 시작")
+    total = len(image_b64_list)
+    log(f"[Vision] 총 {total} 페이지 인식 시작")
 
     for idx, img_b64 in enumerate(image_b64_list):
-        log(f"[Vision] 페이지 {idx+1}/{len(image_b64_list)} 처리 중")
+        log(f"[Vision] 페이지 {idx+1}/{total} 처리 중")
+        emit_progress(doc_id, "ocr", f"{idx+1}/{total} 페이지 인식 중", page=idx + 1, total=total)
 
         try:
             refined = extract_page_text(img_b64)
+        except ModelUnavailableError:
+            # API 한도 초과/장애는 빈 페이지로 넘기지 않고 작업을 실패시켜 재시도하게 함
+            log(f"[Vision ERROR] {idx+1}페이지: 모델 호출 불가 → 작업 재시도 필요", level="error")
+            raise
         except Exception as e:
             log(f"[Vision ERROR] {idx+1}페이지 오류: {e}", level="error")
             refined = ""
@@ -18,6 +18,7 @@ from src.ingestion.doc_parser import extract_pdf_text #, extract_ppt_text
 from src.utils.text_utils import preprocess_text
 from src.utils.file_utils import create_output_folder
 from src.utils.logger import log, user_log 
+from src.utils.progress import emit_progress
 from src.ingestion.llm_clean_data_pll import llm_text_from_images ,pdf_to_images,encode_image
 
 
@@ -40,6 +41,8 @@ def check_do_ocr(pdf_path: str, state: dict):
     PDF 텍스트 레이어 없는 것 확인 후 OCR (클렌징+LLM 하기 전)
     """
     log(f"[OCR PDF] 텍스트 레이어 추출 시도: {pdf_path}")
+    doc_id = state.get("doc_id")
+    emit_progress(doc_id, "parse", "PDF 텍스트 레이어를 확인하고 있어요")
     parsed_pages = extract_pdf_text(pdf_path)  # list[str]
 
     # PDF 텍스트 레이어가 있는 경우(list 중 하나라도 text 존재)
@@ -59,7 +62,7 @@ def check_do_ocr(pdf_path: str, state: dict):
     # 2) OCR 실행(GPT Vision 사용)
     
     #(이진아) 주석하기(한 줄)
-    ocr_pages = llm_text_from_images(images)
+    ocr_pages = llm_text_from_images(images, doc_id=doc_id)
 
     log("[텍스트 없는 PDF OCR] Vision OCR 완료")
     #(이진아) 주석해제
@@ -102,7 +105,7 @@ def node_ingestion_pipeline(state: dict) -> State:
     if file_type == "image":
         input_paths = [encode_image(p) for p in input_paths]
         #(이진아) 아래 두문장 주석처리
-        txt_pages = llm_text_from_images(input_paths)
+        txt_pages = llm_text_from_images(input_paths, doc_id=state.get("doc_id"))
         state["raw_txt"] = txt_pages
         #(이진아) 주석해제( 여러 장 PDF 통합 후 OCR 진행)
         # pdf_path = images_to_pdf(
@@ -151,6 +154,7 @@ def node_ingestion_pipeline(state: dict) -> State:
 
     # 7) 클렌징 + LLM 정제
     user_log("문서 내용을 정리하고 있어요. 잠시만 기다려 주세요 ✨", step="clean_llm")
+    emit_progress(state.get("doc_id"), "clean", "문서 내용을 정리하고 있어요")
     log("[클렌징] preprocess_text + llm_cleaner 시작")
     #(이진아) 두줄 주석필요
     clean_txt_pages: List[str] = [
@@ -3,15 +3,11 @@ from __future__ import annotations
 import json
 import re
 from typing import Dict, Any
-from openai import OpenAI
-from src.utils.config import load_api_keys
+from src.utils.api_client import create_response
 
 
 # 1) call_llm 강제 JSON-only 버전
 def call_llm_json(prompt: str) -> str:
-    API_KEY = load_api_keys()
-    client = OpenAI(api_key=API_KEY)
-
     system_prompt = """
     당신은 공공문서에서 행동 정보를 JSON으로 추출하는 전문가입니다. 
     ⚠ 절대 JSON 외의 어떤 텍스트도 출력하지 마십시오.
@@ -19,7 +15,7 @@ def call_llm_json(prompt: str) -> str:
     ⚠ 오직 JSON 하나만 출력하세요.
     """
 
-    resp = client.responses.create(
+    resp = create_response(
         model="gpt-4o-mini",
         input=[
             {"role": "system", "content": system_prompt},
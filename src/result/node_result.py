@@ -1,22 +1,36 @@
-
 from __future__ import annotations
 
 import json
 from typing import Dict, Any
 
-from openai import OpenAI
-
 from src.result.node_action_extractor import node_action_extractor
-from src.result.node_result_packager import node_result_packager, format_action_instructions
-    
-# act_title_text을 state로 저장하는 버전
-def node_result(state: Dict[str, Any]) -> Dict[str, Any]:
+from src.result.node_result_packager import _summarizer, format_action_instructions
+from src.utils.progress import emit_progress
+
+
+# 요약 노드 : 행동 추출과 무관하므로 먼저 실행해 바로 사용자에게 전달
+def node_summary(state: Dict[str, Any]) -> Dict[str, Any]:
+    print("\n[Node] node_summary 실행")
+    summary = _summarizer(state.get("refined_txt", ""))
+    state["summary"] = summary
+
+    emit_progress(state.get("doc_id"), "summary", "문서 요약이 완성되었어요", summary=summary)
+    return state
+
+
+# 행동 추출 + 자연어 행동안내 노드 (act_title_text을 state로 저장하는 버전)
+def node_actions(state: Dict[str, Any]) -> Dict[str, Any]:
+    emit_progress(state.get("doc_id"), "actions", "해야 할 일을 정리하고 있어요")
+
     # 1) 행동 추출
     state = node_action_extractor(state)
 
-    # 2) summary / needs_action / action_info 생성
-    state = node_result_packager(state)
-
+    # 2) db 패키지 (summary / needs_action / action_info)
+    state["db_package"] = {
+        "summary": state.get("summary", ""),
+        "needs_action": state["needs_action"],
+        "action_info": state["action_info"],
+    }
 
     web_result_list = []
 
@@ -43,6 +57,17 @@ def node_result(state: Dict[str, Any]) -> Dict[str, Any]:
     # 4) state에 저장
     state["web_package"] = web_result_list
 
+    emit_progress(state.get("doc_id"), "actions", "행동 안내가 완성되었어요", action=web_result_list)
+    return state
+
+
+# 요약 → 행동 안내 순서로 실행하는 호환용 wrapper
+# - 파이프라인(pipeline_jobs.py)은 node_summary / node_actions 를 단계별로 직접 호출하고,
+#   이 함수는 한 번에 실행하는 bench_ingestion.py 등에서만 사용
+# (기존에는 node_action_extractor 후 node_result_packager 내부에서 행동 추출을 한 번 더 호출했음)
+def node_result(state: Dict[str, Any]) -> Dict[str, Any]:
+    state = node_summary(state)
+    state = node_actions(state)
     return state
 
 
@@ -3,20 +3,17 @@ from __future__ import annotations
 
 import copy
 from typing import Dict, Any
-from src.utils.config import load_api_keys
-from openai import OpenAI
+from src.utils.api_client import create_response
 from src.result.node_action_extractor import node_action_extractor
 
 # 요약용 LLM
 def call_llm(prompt: str) -> str:
-    API_KEY = load_api_keys()
-    client = OpenAI(api_key=API_KEY)  
     """
     OpenAI API(Responses)를 이용해 prompt를 처리하고 결과 반환.
     - prompt: 한국어 지시가 포함된 문자열
     - 반환: 모델이 생성한 문자열
     """
-    resp = client.responses.create(
+    resp = create_response(
         model="gpt-4o-mini",
         input=[
             {
@@ -0,0 +1,118 @@
+# admission.py
+# 문서 처리 admission control / backpressure
+# - 단계 유형(stage class)별 동시 실행 수 제한
+#     cpu       : PDF 래스터화 (pdf_to_images)
+#     llm       : chat / responses / vision 호출
+#     embedding : 임베딩 호출
+#   → 업로드가 몰려도 OCR fan-out, 메모리, API 호출량이 설정값 이상으로 늘지 않음
+# - 작업 대기열 상한(JOB_QUEUE_MAX): 넘으면 /process-document 가 기다리지 않고 503 + Retry-After
+#   (일괄 처리는 BATCH_QUEUE_MAX로 따로 제한 → 대량 업로드가 단건 업로드 자리를 차지하지 않음)
+# - 슬롯 사용/대기 수, 대기열 깊이, 거절 횟수는 /metrics 로 노출
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+from src.utils.config import STAGE_CONCURRENCY, JOB_QUEUE_MAX, BATCH_QUEUE_MAX
+from src.utils.job_queue import count_jobs, count_active_jobs
+from src.utils.metrics import STAGE_SLOT_WAIT_SECONDS, ADMISSION_REJECTIONS, metric_family, register_collector
+
+
+# 1) 단계 유형별 동시 실행 제한
+class StageGate:
+    """limit개까지 동시에 통과시키는 semaphore + 사용/대기 수 집계"""
+
+    def __init__(self, stage_class: str, limit: int):
+        self.stage_class = stage_class
+        self.limit = limit
+        self.semaphore = threading.BoundedSemaphore(limit)
+        self.in_use = 0
+        self.waiting = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        with self.lock:
+            self.waiting += 1
+        t0 = time.perf_counter()
+        self.semaphore.acquire()
+        STAGE_SLOT_WAIT_SECONDS.observe(time.perf_counter() - t0, stage_class=self.stage_class)
+        with self.lock:
+            self.waiting -= 1
+            self.in_use += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.in_use -= 1
+            self.semaphore.release()
+
+
+_GATES: Dict[str, StageGate] = {name: StageGate(name, limit) for name, limit in STAGE_CONCURRENCY.items()}
+
+
+@contextmanager
+def stage_slot(stage_class: str):
+    """이 블록을 stage_class 동시 실행 제한 안에서 실행 (설정에 없는 유형은 제한 없음)"""
+    gate = _GATES.get(stage_class)
+    if gate is None:
+        yield
+        return
+    with gate.slot():
+        yield
+
+
+# 2) 작업 대기열 상한
+def queue_has_capacity(n: int = 1, batch: bool = False) -> bool:
+    """파일 저장 전 빠른 확인용 (최종 확인은 enqueue_job / enqueue_batch 의 max_active 트랜잭션에서)"""
+    if batch:
+        return count_active_jobs(batch=True) + n <= BATCH_QUEUE_MAX
+    return count_active_jobs(batch=False) + n <= JOB_QUEUE_MAX
+
+
+def record_rejection(reason: str) -> None:
+    ADMISSION_REJECTIONS.inc(reason=reason)
+
+
+# 3) 지표
+def get_admission_metrics() -> Dict[str, Dict[str, int]]:
+    stages = {}
+    for name, gate in _GATES.items():
+        with gate.lock:
+            stages[name] = {"limit": gate.limit, "in_use": gate.in_use, "waiting": gate.waiting}
+    counts = count_jobs()
+    return {
+        "stages": stages,
+        "queue": {
+            "queued": counts["queued"],
+            "running": counts["running"],
+            "max_active": JOB_QUEUE_MAX,
+            "batch_active": count_active_jobs(batch=True),
+            "batch_max_active": BATCH_QUEUE_MAX,
+        },
+    }
+
+
+def _prometheus_lines() -> List[str]:
+    m = get_admission_metrics()
+    stages, queue = m["stages"], m["queue"]
+    stage = ("stage_class",)
+    return [
+        *metric_family("stage_slots_limit", "gauge", "Concurrency limit per stage class",
+                       [((name,), s["limit"]) for name, s in stages.items()], stage),
+        *metric_family("stage_slots_in_use", "gauge", "Stage concurrency slots in use",
+                       [((name,), s["in_use"]) for name, s in stages.items()], stage),
+        *metric_family("stage_slots_waiting", "gauge", "Callers waiting for a stage concurrency slot",
+                       [((name,), s["waiting"]) for name, s in stages.items()], stage),
+        *metric_family("job_queue_depth", "gauge", "Jobs by status",
+                       [(("queued",), queue["queued"]), (("running",), queue["running"])], ("status",)),
+        *metric_family("job_queue_max_active", "gauge", "Active job limit for single uploads",
+                       [((), queue["max_active"])]),
+        *metric_family("job_queue_batch_active", "gauge", "Active batch jobs (queued + running)",
+                       [((), queue["batch_active"])]),
+        *metric_family("job_queue_batch_max_active", "gauge", "Active job limit for batch uploads",
+                       [((), queue["batch_max_active"])]),
+    ]
+
+
+register_collector(_prometheus_lines)
@@ -1,15 +1,177 @@
-import os
+# api_client.py
+# 프로세스 전체에서 공유하는 OpenAI client
+# - 호출마다 OpenAI()를 새로 만들면 TCP/TLS 연결을 매번 새로 맺게 되므로
+#   connection pool(keep-alive)을 가진 client 하나를 모든 모듈이 재사용한다.
+# - OPENAI_BASE_URL 환경변수를 지정하면 로컬 대체 서버로도 연결 가능(OpenAI SDK 기본 동작)
+import threading
+import time
+from typing import Any, Callable, Dict
+
+import httpx
 from openai import OpenAI
 
+from src.utils.config import (
+    load_api_keys,
+    OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE, OPENAI_KEEPALIVE_EXPIRY,
+    OPENAI_CONNECT_TIMEOUT, OPENAI_READ_TIMEOUT, OPENAI_MAX_RETRIES,
+    MODEL_CALL_MODE,
+)
+from src.utils.rate_limiter import call_with_limits
+from src.utils.metrics import record_model_call
+from src.utils.model_recorder import record_call, replay_call
+from src.utils.admission import stage_slot
+
 client = None
+_client_lock = threading.Lock()
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
+
 
-def get_openai_client():
+def _http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+
+
+def create_openai_client() -> OpenAI:
+    """connection pool / keep-alive / timeout 설정이 적용된 새 client 생성"""
+    return OpenAI(
+        api_key=load_api_keys(),
+        http_client=httpx.Client(limits=_http_limits(), timeout=_http_timeout()),
+        timeout=_http_timeout(),
+        max_retries=OPENAI_MAX_RETRIES,
+    )
+
+
+def get_openai_client() -> OpenAI:
+    """프로세스 공용 client 반환 (최초 호출 시 1회 생성, 스레드 안전)"""
     global client
     if client is None:
-        OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-        if not OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY is not set. Check your .env file.")
-
-        client = OpenAI(api_key=OPENAI_API_KEY)
+        with _client_lock:
+            if client is None:
+                client = create_openai_client()
 
     return client
+
+
+def close_openai_client() -> None:
+    """서버 종료 시 connection pool 정리"""
+    global client
+    with _client_lock:
+        if client is not None:
+            client.close()
+            client = None
+
+
+# 모델 호출 진입점
+# - 모든 모듈은 client.xxx.create 대신 아래 함수를 사용해
+#   rate limit / retry / circuit breaker(rate_limiter.py)와 계측(metrics.py)을 공유한다.
+
+IMAGE_TOKEN_ESTIMATE = 1500   # Vision 입력 이미지 1장당 추정 토큰
+
+# 호출 종류 → admission 단계 유형 (동시 실행 제한)
+STAGE_CLASS = {"chat": "llm", "responses": "llm", "embeddings": "embedding"}
+
+
+def _estimate_text_tokens(text: str) -> int:
+    # 한국어는 대략 1글자 ≈ 1토큰, 영문/공백은 더 적으므로 보수적으로 글자 수 기준
+    return len(text)
+
+
+def _estimate_content_tokens(content: Any) -> int:
+    if isinstance(content, str):
+        return _estimate_text_tokens(content)
+    if isinstance(content, list):
+        total = 0
+        for part in content:
+            if isinstance(part, dict) and part.get("type") in ("image_url", "input_image"):
+                total += IMAGE_TOKEN_ESTIMATE
+            elif isinstance(part, dict):
+                total += _estimate_text_tokens(str(part.get("text", "")))
+            else:
+                total += _estimate_content_tokens(part)
+        return total
+    return 0
+
+
+def estimate_tokens(kwargs: Dict[str, Any]) -> int:
+    """요청 인자로 입력+최대 출력 토큰 추정 (TPM bucket 차감용)"""
+    total = 0
+    for msg in kwargs.get("messages") or []:
+        total += _estimate_content_tokens(msg.get("content"))
+
+    inputs = kwargs.get("input")
+    if isinstance(inputs, str):
+        total += _estimate_text_tokens(inputs)
+    elif isinstance(inputs, list):
+        for item in inputs:
+            total += _estimate_content_tokens(item.get("content") if isinstance(item, dict) else item)
+
+    total += kwargs.get("max_tokens") or kwargs.get("max_output_tokens") or 0
+    return total
+
+
+def _usage_tokens(resp: Any) -> int | None:
+    usage = getattr(resp, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
+
+def _usage_in_out(resp: Any) -> tuple[int, int]:
+    """응답 usage → (input, output) 토큰 (chat: prompt/completion, responses: input/output)"""
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return 0, 0
+    input_tokens = getattr(usage, "input_tokens", None) or getattr(usage, "prompt_tokens", None) or 0
+    output_tokens = getattr(usage, "output_tokens", None) or getattr(usage, "completion_tokens", None) or 0
+    return input_tokens, output_tokens
+
+
+def _call_model(kind: str, create: Callable[..., Any], kwargs: Dict[str, Any]) -> Any:
+    """
+    동시 실행 제한 + rate limit 아래에서 호출 + 호출 시간 / 토큰 / 비용 기록
+    - 동시 실행 슬롯(stage_slot)은 실제 요청 1회 동안만 잡음
+      (rate limit 대기 / 재시도 backoff 중에는 놓아서 한 모델이 막혀도 다른 호출이 슬롯을 씀)
+    - MODEL_CALL_MODE=record 이면 응답을 fixture에 저장, replay 이면 fixture에서 응답 재생
+    """
+    model = kwargs["model"]
+    stage_class = STAGE_CLASS[kind]
+
+    def attempt():
+        with stage_slot(stage_class):
+            return create(**kwargs)
+
+    t0 = time.perf_counter()
+    try:
+        if MODEL_CALL_MODE == "replay":
+            with stage_slot(stage_class):
+                resp = replay_call(kind, kwargs)
+        else:
+            resp = call_with_limits(model, attempt, estimate_tokens(kwargs), _usage_tokens)
+            if MODEL_CALL_MODE == "record":
+                record_call(kind, kwargs, resp, time.perf_counter() - t0)
+    except Exception:
+        record_model_call(model, kind, time.perf_counter() - t0, status="error")
+        raise
+
+    input_tokens, output_tokens = _usage_in_out(resp)
+    record_model_call(model, kind, time.perf_counter() - t0, input_tokens, output_tokens)
+    return resp
+
+
+def create_chat_completion(**kwargs) -> Any:
+    """client.chat.completions.create"""
+    return _call_model("chat", lambda **kw: get_openai_client().chat.completions.create(**kw), kwargs)
+
+
+def create_response(**kwargs) -> Any:
+    """client.responses.create"""
+    return _call_model("responses", lambda **kw: get_openai_client().responses.create(**kw), kwargs)
+
+
+def create_embedding(**kwargs) -> Any:
+    """client.embeddings.create"""
+    return _call_model("embeddings", lambda **kw: get_openai_client().embeddings.create(**kw), kwargs)
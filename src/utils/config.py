@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 # config.py
@@ -10,9 +11,19 @@ WORK_DIR = "./output/"
 # BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # WORK_DIR = os.path.join(BASE_DIR, "output")
 
+# 영구 저장소 폴더 (rag_db.sqlite, jobs.sqlite 등)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STORAGE_DIR = os.path.join(BASE_DIR, "storage")
+
 load_dotenv()
 
+# RAG 색인 DB (embeddings / FTS5 / ann_log) - 테스트 / 벤치마크는 임시 경로 지정
+RAG_DB_PATH = os.getenv("RAG_DB_PATH", os.path.join(STORAGE_DIR, "rag_db.sqlite"))
+
 def load_api_keys():
+    if os.getenv("MODEL_CALL_MODE") == "replay":
+        # replay 모드는 API를 호출하지 않으므로 키가 없어도 됨
+        return os.getenv("OPENAI_API_KEY", "replay")
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("OPENAI_API_KEY가 .env 파일에 없습니다.")
@@ -23,6 +34,102 @@ def load_api_keys():
 # # LLM 모델 이름
 LLM_MODEL = "gpt-4o-mini"
 
+# Embedding Settings (rag_builder.py)
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIM = 1536
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))              # 요청 1회당 입력 수 (API 상한 2048)
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "200000"))  # 요청 1회당 추정 토큰 합 (API 상한 300,000)
+
+# RAG 청크 분할 (text_utils.chunk_text, 페이지를 검색 단위로 나눔)
+RAG_CHUNK_TOKENS = int(os.getenv("RAG_CHUNK_TOKENS", "400"))     # 청크 목표 크기(추정 토큰, 1글자 ≈ 1토큰)
+RAG_CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "80"))    # 크기 때문에 나눌 때 앞 청크와 겹치는 크기
+
+# RAG 검색 방식 (rag_builder.search_rag)
+#   hybrid  : 벡터 유사도 + FTS5 trigram 검색의 BM25 순위를 RRF로 결합 (기본)
+#   vector  : 벡터 유사도만
+#   lexical : BM25만 (임베딩 호출 없음 - 임베딩 API 장애/한도 초과 시 챗봇이 자동으로 사용)
+RAG_SEARCH_MODE = os.getenv("RAG_SEARCH_MODE", "hybrid")
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))   # RRF 점수 = Σ 1 / (RAG_RRF_K + 순위)
+
+# 전체 문서 대상 근사 검색 (ann_index.py, IVF / numpy, /search 엔드포인트)
+# - rag_db.sqlite 옆 rag_ann/ 폴더에 스냅샷 저장
+# - 새 청크 반영 / 군집 학습 / 병합 / 저장은 백그라운드 스레드에서 (insert_info 직후 + ANN_SYNC_INTERVAL 마다)
+ANN_NLIST = int(os.getenv("ANN_NLIST", "1024"))            # 군집(list) 수 - 대략 sqrt(전체 청크 수)
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))            # 검색 시 살펴볼 군집 수 (클수록 정확, 느림)
+ANN_TAIL_MAX = int(os.getenv("ANN_TAIL_MAX", "20000"))     # 군집 배정 전 전수 비교하는 신규 벡터 최대 수 (float32로 보관)
+ANN_SAVE_EVERY = int(os.getenv("ANN_SAVE_EVERY", "20000")) # 이만큼 추가될 때마다 스냅샷 저장
+ANN_COMPACT_RATIO = float(os.getenv("ANN_COMPACT_RATIO", "0.2"))   # 삭제된 항목 비율이 넘으면 색인에서 제거
+ANN_SYNC_INTERVAL = float(os.getenv("ANN_SYNC_INTERVAL", "5"))    # 다른 프로세스가 추가한 청크 확인 주기(초)
+
+# 임베딩 결과 캐시 (embedding_cache.py, 정규화 텍스트 + 모델 이름 기준)
+# - 1단계: 프로세스 내 LRU / 2단계: SQLite (워커 프로세스 간 공유, 재시작 후에도 유지)
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "1") == "1"
+EMBED_CACHE_MEMORY_ITEMS = int(os.getenv("EMBED_CACHE_MEMORY_ITEMS", "20000"))     # LRU 항목 수 (1536차원 기준 약 120MB)
+EMBED_CACHE_DB_PATH = os.getenv("EMBED_CACHE_DB_PATH", os.path.join(STORAGE_DIR, "embed_cache.sqlite"))
+EMBED_CACHE_DB_MAX_ROWS = int(os.getenv("EMBED_CACHE_DB_MAX_ROWS", "500000"))      # 넘으면 가장 오래 안 쓴 행부터 삭제
+
+# 문서 임베딩 행렬 캐시 (rag_builder.load_doc_matrix, 프로세스별 LRU)
+DOC_MATRIX_CACHE_BYTES = int(os.getenv("DOC_MATRIX_CACHE_BYTES", str(256 * 1024 * 1024)))  # 캐시 총 크기 상한
+DOC_MATRIX_CACHE_TTL = float(os.getenv("DOC_MATRIX_CACHE_TTL", "300"))   # 항목 유효 시간(초) - 다른 워커 프로세스의 재색인 반영용
+
+# OpenAI HTTP Client Settings (프로세스 전체가 하나의 client / connection pool 공유)
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "64"))        # 동시 연결 최대 수
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "32"))            # 유지할 idle 연결 수
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))    # idle 연결 유지 시간(초)
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))      # 연결 timeout(초)
+OPENAI_READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", "120"))           # 응답 대기 timeout(초) - Vision OCR 고려
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "0"))                 # SDK 자체 재시도 (재시도는 rate_limiter에서 처리)
+
+# Model Rate Limit Settings (rate_limiter.py)
+# 모델별 분당 요청 수(rpm) / 분당 토큰 수(tpm). MODEL_RATE_LIMITS 환경변수(JSON)로 덮어쓰기 가능
+#   예) MODEL_RATE_LIMITS='{"gpt-4o-mini": {"rpm": 5000, "tpm": 2000000}}'
+
+MODEL_RATE_LIMITS = {
+    "gpt-4o-mini": {"rpm": 500, "tpm": 200000},
+    "gpt-4.1-mini": {"rpm": 500, "tpm": 200000},
+    "gpt-5.1-chat-latest": {"rpm": 500, "tpm": 200000},
+    "text-embedding-3-small": {"rpm": 3000, "tpm": 1000000},
+}
+MODEL_RATE_LIMITS.update(json.loads(os.getenv("MODEL_RATE_LIMITS", "{}")))
+DEFAULT_RATE_LIMIT = {"rpm": 500, "tpm": 200000}
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "6"))            # 429/5xx 재시도 포함 총 시도 횟수
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1.0"))            # 지수 backoff 기본 대기(초)
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "30.0"))             # backoff 최대 대기(초)
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "8"))  # 연속 실패 시 circuit open
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))       # open 유지 시간(초)
+
+# Model Call Record / Replay Settings (model_recorder.py)
+#   live   : 실제 API 호출 (기본)
+#   record : 실제 API 호출 + fixture 저장
+#   replay : fixture 응답 재생 (API 키/네트워크 불필요)
+
+MODEL_CALL_MODE = os.getenv("MODEL_CALL_MODE", "live")
+MODEL_FIXTURE_DIR = os.getenv("MODEL_FIXTURE_DIR", os.path.join(STORAGE_DIR, "fixtures"))
+MODEL_REPLAY_LATENCY = os.getenv("MODEL_REPLAY_LATENCY", "0") == "1"   # 녹화 당시 지연시간 재현 여부
+
+# Model Price Settings (metrics.py 비용 추정용, USD / 1M tokens)
+
+MODEL_PRICES = {
+    "gpt-4o-mini": {"input": 0.15, "output": 0.60},
+    "gpt-4.1-mini": {"input": 0.40, "output": 1.60},
+    "gpt-5.1-chat-latest": {"input": 1.25, "output": 10.00},
+    "text-embedding-3-small": {"input": 0.02, "output": 0.0},
+}
+
+# Chat Settings
+
+CHAT_WORKERS = int(os.getenv("CHAT_WORKERS", "16"))   # /chat 전용 스레드 수 (임베딩/DB/LLM 대기를 event loop 밖에서 처리)
+CHAT_INDEX_WAIT = float(os.getenv("CHAT_INDEX_WAIT", "5"))   # 색인 중인 문서에 질문 시 기다리는 최대 시간(초), 넘으면 "indexing" 응답
+
+# 대화 세션 (session_id, doc_id 단위, state_store "chat" 네임스페이스에 저장)
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "3"))                  # 프롬프트에 그대로 넣는 최근 Q&A 수
+CHAT_HISTORY_TOKEN_CAP = int(os.getenv("CHAT_HISTORY_TOKEN_CAP", "2000"))       # 최근 기록 추정 토큰 상한 (넘으면 오래된 것부터 요약)
+CHAT_SUMMARY_TOKEN_CAP = int(os.getenv("CHAT_SUMMARY_TOKEN_CAP", "500"))        # 요약 추정 토큰 상한
+CHAT_SESSION_IDLE_SECONDS = int(os.getenv("CHAT_SESSION_IDLE_SECONDS", str(24 * 3600)))  # 이 시간 동안 안 쓴 세션 삭제
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "10000"))                # 넘으면 가장 오래 안 쓴 세션부터 삭제
+
 #  User Prompt Default
 
 # DEFAULT_USER_PROMPT = {
@@ -41,4 +148,40 @@ LLM_MODEL = "gpt-4o-mini"
 
 # App Settings
 
-RECURSION_LIMIT = 200
\ No newline at end of file
+RECURSION_LIMIT = 200
+
+# Job Queue Settings (문서 처리 작업 큐)
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(STORAGE_DIR, "jobs.sqlite"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))               # 프로세스당 작업 워커 스레드 수
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))  # 워커가 작업을 점유하는 시간(heartbeat로 연장)
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))      # 재시작/실패 후 재시도 최대 횟수
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "60"))     # 모델 API 장애로 실패한 작업의 재시도 대기(초)
+PROCESS_WAIT_SECONDS = float(os.getenv("PROCESS_WAIT_SECONDS", "300"))   # /process-document 결과 대기 상한(초), 넘으면 202 + job_id
+
+# Shared State Store Settings (state_store.py)
+# - 진행상황 이벤트 / 챗봇 대화 상태 / 사용자 안내 로그를 프로세스 밖에 저장
+#   → uvicorn --workers N 또는 여러 서버(로드밸런서 뒤)에서도 같은 상태를 봄
+# - sqlite : storage/state.sqlite (기본, 같은 호스트의 여러 워커가 공유)
+#   memory : 프로세스 내 dict (테스트 / 단일 워커용)
+#   여러 호스트에서 쓰려면 STATE_DB_PATH 를 공유 볼륨 경로로 지정
+STATE_STORE = os.getenv("STATE_STORE", "sqlite")
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", os.path.join(STORAGE_DIR, "state.sqlite"))
+STATE_LOG_RETENTION = int(os.getenv("STATE_LOG_RETENTION", str(24 * 3600)))   # 진행/안내 로그 보관 시간(초)
+USER_LOG_MAX_ITEMS = int(os.getenv("USER_LOG_MAX_ITEMS", "1000"))   # 사용자 안내 로그 최대 보관 수 (넘으면 오래된 것부터 삭제)
+
+# Admission Control Settings
+# - JOB_QUEUE_MAX: 대기(queued) + 실행 중(running) 작업 상한. 넘으면 /process-document 는 즉시 503 + Retry-After
+# - STAGE_CONCURRENCY: 단계 유형별 프로세스 내 동시 실행 수
+#   cpu(PDF 래스터화) / llm(chat, responses, vision) / embedding
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "20"))          # 단건 업로드 기준 (일괄 처리는 BATCH_QUEUE_MAX)
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "30"))   # 거절 응답의 Retry-After(초)
+BATCH_QUEUE_MAX = int(os.getenv("BATCH_QUEUE_MAX", "500"))   # 일괄 처리(/process-batch) 대기 + 실행 중 작업 상한 (단건과 별도)
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "200"))   # 일괄 처리 요청 1회당 최대 파일 수
+
+STAGE_CONCURRENCY = {
+    "cpu": 2,
+    "llm": 8,
+    "embedding": 8,
+}
+STAGE_CONCURRENCY.update({k: int(v) for k, v in json.loads(os.getenv("STAGE_CONCURRENCY", "{}")).items()})
\ No newline at end of file
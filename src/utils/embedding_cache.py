@@ -0,0 +1,255 @@
+# embedding_cache.py
+# 임베딩 결과 캐시 (rag_builder.embed_texts 에서 사용 → 질문 / 색인 텍스트 모두 적용)
+# - key: 모델 이름 + 정규화 텍스트(NFKC, 앞뒤 공백 제거, 연속 공백 1칸)의 sha256
+#   → "납부 기한이 언제인가요?" 처럼 여러 사용자가 반복하는 질문은 API 호출 없이 재사용
+# - 1단계: 프로세스 내 LRU (EMBED_CACHE_MEMORY_ITEMS)
+#   2단계: SQLite (EMBED_CACHE_DB_PATH, 워커 프로세스 간 공유 + 재시작 후 유지, EMBED_CACHE_DB_MAX_ROWS 초과 시 LRU 정리)
+# - 단계별 hit / miss 집계 → stats(), /metrics
+# - MODEL_CALL_MODE=record / replay 에서는 사용하지 않음 (get_embedding_cache)
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.utils.config import (
+    EMBED_CACHE_ENABLED, EMBED_CACHE_MEMORY_ITEMS, EMBED_CACHE_DB_PATH, EMBED_CACHE_DB_MAX_ROWS,
+    MODEL_CALL_MODE,
+)
+from src.utils.metrics import metric_family, register_collector
+
+VECTOR_DTYPE = np.dtype("<f4")
+
+# SQLite last_used 갱신 최소 간격(초) - 조회마다 쓰기가 생기지 않도록
+TOUCH_INTERVAL = 3600
+# SQLite 행 수 정리 주기(초)
+PRUNE_INTERVAL = 600
+
+
+def normalize_text(text: str) -> str:
+    """캐시 key / 임베딩 입력용 정규화 (의미가 바뀌지 않는 범위만)"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    2단계 임베딩 캐시
+    - get_many(model, texts) → {text: vector} (찾은 것만)
+    - put_many(model, {text: vector})
+    - texts는 normalize_text를 거친 값이어야 함 (embed_texts에서 처리)
+    - 반환 벡터는 읽기 전용 (LRU와 공유)
+    """
+
+    def __init__(self, path: str | None, memory_items: int, db_max_rows: int):
+        self.path = path
+        self.memory_items = memory_items
+        self.db_max_rows = db_max_rows
+        self.memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.counts = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+        self._local = threading.local()
+        self._last_prune = time.monotonic()
+
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with self._conn() as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS embed_cache (
+                        key TEXT PRIMARY KEY,
+                        model TEXT NOT NULL,
+                        dim INTEGER NOT NULL,
+                        vector BLOB NOT NULL,      -- little-endian float32 bytes
+                        created_at REAL NOT NULL,
+                        last_used REAL NOT NULL
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_embed_cache_last_used ON embed_cache(last_used)")
+
+    def _conn(self):
+        """스레드별 Connection 재사용 (WAL)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    # 1) 프로세스 내 LRU
+    def _memory_get(self, key: str):
+        with self.lock:
+            vec = self.memory.get(key)
+            if vec is not None:
+                self.memory.move_to_end(key)
+            return vec
+
+    def _memory_put(self, key: str, vec: np.ndarray):
+        with self.lock:
+            self.memory[key] = vec
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_items:
+                self.memory.popitem(last=False)
+
+    # 2) 조회 / 저장
+    def get_many(self, model: str, texts: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        pending: Dict[str, str] = {}   # key → text (LRU에 없는 것)
+
+        for text in dict.fromkeys(t for t in texts if t):
+            key = cache_key(model, text)
+            vec = self._memory_get(key)
+            if vec is not None:
+                found[text] = vec
+            else:
+                pending[key] = text
+        memory_hits = len(found)
+
+        if pending and self.path:
+            keys = list(pending)
+            now = time.time()
+            conn = self._conn()
+            for i in range(0, len(keys), 500):   # SQLite 변수 개수 제한
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, dim, vector, last_used FROM embed_cache WHERE key IN ({marks})", chunk
+                ).fetchall()
+                touch = []
+                for key, dim, blob, last_used in rows:
+                    vec = np.frombuffer(blob, dtype=VECTOR_DTYPE)
+                    if vec.shape[0] != dim:
+                        continue
+                    found[pending[key]] = vec
+                    self._memory_put(key, vec)
+                    if now - last_used > TOUCH_INTERVAL:
+                        touch.append((now, key))
+                if touch:
+                    with conn:
+                        conn.executemany("UPDATE embed_cache SET last_used=? WHERE key=?", touch)
+
+        with self.lock:
+            self.counts["memory_hits"] += memory_hits
+            self.counts["db_hits"] += len(found) - memory_hits
+            self.counts["misses"] += len(pending) - (len(found) - memory_hits)
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray]) -> None:
+        if not vectors:
+            return
+        now = time.time()
+        rows = []
+        for text, vec in vectors.items():
+            key = cache_key(model, text)
+            vec = np.ascontiguousarray(vec, dtype=VECTOR_DTYPE)
+            vec.setflags(write=False)
+            self._memory_put(key, vec)
+            rows.append((key, model, vec.shape[0], vec.tobytes(), now, now))
+
+        if self.path:
+            with self._conn() as conn:
+                conn.executemany(
+                    """
+                    INSERT OR REPLACE INTO embed_cache (key, model, dim, vector, created_at, last_used)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    rows,
+                )
+            self._maybe_prune()
+
+    def _maybe_prune(self) -> None:
+        """EMBED_CACHE_DB_MAX_ROWS 초과분을 last_used 오래된 순으로 삭제"""
+        with self.lock:
+            if time.monotonic() - self._last_prune < PRUNE_INTERVAL:
+                return
+            self._last_prune = time.monotonic()
+        with self._conn() as conn:
+            conn.execute(
+                """
+                DELETE FROM embed_cache WHERE key IN (
+                    SELECT key FROM embed_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.db_max_rows,),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            c = dict(self.counts)
+            memory_items = len(self.memory)
+        total = c["memory_hits"] + c["db_hits"] + c["misses"]
+        return {
+            **c,
+            "lookups": total,
+            "memory_items": memory_items,
+            "memory_hit_rate": round(c["memory_hits"] / total, 4) if total else 0.0,
+            "db_hit_rate": round(c["db_hits"] / total, 4) if total else 0.0,
+            "hit_rate": round((c["memory_hits"] + c["db_hits"]) / total, 4) if total else 0.0,
+        }
+
+
+# 3) 공용 캐시
+_cache: EmbeddingCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache | None:
+    """
+    EMBED_CACHE_ENABLED=0 이면 None (캐시 없이 매번 API 호출)
+    - MODEL_CALL_MODE=record / replay 에서도 None: 캐시 상태에 따라 API로 보내는 입력 묶음이 달라지면
+      fixture key(요청 내용 hash)가 녹화 때와 달라져 재생이 실패하므로
+    """
+    global _cache
+    if not EMBED_CACHE_ENABLED or MODEL_CALL_MODE != "live":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(EMBED_CACHE_DB_PATH, EMBED_CACHE_MEMORY_ITEMS, EMBED_CACHE_DB_MAX_ROWS)
+    return _cache
+
+
+def set_embedding_cache(cache: EmbeddingCache | None) -> None:
+    """캐시 교체 (벤치마크에서 메모리 전용 EmbeddingCache(None, ...) 주입 등)"""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+def get_embedding_cache_metrics() -> Dict[str, Any]:
+    cache = get_embedding_cache()
+    return cache.stats() if cache else {"enabled": False}
+
+
+def _prometheus_lines():
+    """/metrics 에 붙일 임베딩 캐시 지표"""
+    if _cache is None:
+        return []
+    s = _cache.stats()
+    return [
+        *metric_family("embedding_cache_lookups_total", "counter", "Embedding cache lookups by tier and result", [
+            (("memory", "hit"), s["memory_hits"]),
+            (("db", "hit"), s["db_hits"]),
+            (("all", "miss"), s["misses"]),
+        ], ("tier", "result")),
+        *metric_family("embedding_cache_memory_items", "gauge", "Embeddings held in the in-process LRU",
+                       [((), s["memory_items"])]),
+    ]
+
+
+register_collector(_prometheus_lines)
@@ -0,0 +1,42 @@
+# index_status.py
+# 문서(doc_id)별 RAG 색인(임베딩 + rag_db 저장) 준비 상태
+# - 문서 처리 결과(요약/행동)는 actions 단계 직후 반환되고, 색인(index 단계)은 그 뒤에 이어서 실행되므로
+#   /chat 은 이 플래그로 질문 가능 여부를 판단한다.
+# - 공유 상태 저장소(state_store.py)의 "index_status" 네임스페이스에 저장 → 워커 프로세스 간 공유
+#
+# 상태: pending(업로드됨) → indexing(색인 중) → ready | failed
+#       기록이 없는 문서(이 기능 이전에 색인된 문서 등)는 ready로 간주
+import time
+from datetime import datetime
+from typing import Any, Dict
+
+from src.utils.state_store import get_state_store
+
+NAMESPACE = "index_status"
+
+NOT_READY = {"pending", "indexing"}
+
+
+def set_index_status(doc_id: str | None, status: str, error: str | None = None) -> None:
+    if not doc_id:
+        return
+    get_state_store().set(NAMESPACE, doc_id, {
+        "doc_id": doc_id,
+        "status": status,
+        "error": error,
+        "updated_at": datetime.now().isoformat(timespec="seconds"),
+    })
+
+
+def get_index_status(doc_id: str) -> Dict[str, Any]:
+    return get_state_store().get(NAMESPACE, doc_id) or {"doc_id": doc_id, "status": "ready", "error": None}
+
+
+def wait_until_indexed(doc_id: str, timeout: float, poll_interval: float = 0.25) -> Dict[str, Any]:
+    """색인이 끝나거나(ready / failed) timeout이 지날 때까지 대기 후 마지막 상태 반환"""
+    deadline = time.monotonic() + timeout
+    status = get_index_status(doc_id)
+    while status["status"] in NOT_READY and time.monotonic() < deadline:
+        time.sleep(poll_interval)
+        status = get_index_status(doc_id)
+    return status
@@ -0,0 +1,365 @@
+# job_queue.py
+# SQLite 기반 영구 작업 큐 (storage/jobs.sqlite)
+# - 문서 처리 작업을 DB에 저장하고, 노드(stage)가 끝날 때마다 state를 checkpoint
+# - 워커는 lease(점유 만료시각)를 걸고 작업을 가져감
+# - 프로세스가 죽어 lease가 만료되면 다른 워커(또는 재시작한 서버)가
+#   마지막으로 완료된 노드 다음부터 이어서 실행
+# - 일괄 처리(batch) 작업은 batch_id로 묶이고, 단건 업로드보다 낮은 priority로 점유됨
+import json
+import os
+import sqlite3
+import time
+import uuid
+from typing import Any, Dict, List, Tuple
+
+from src.utils.config import JOB_DB_PATH, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS
+from src.utils.index_status import set_index_status
+from src.utils.progress import emit_progress
+
+os.makedirs(os.path.dirname(JOB_DB_PATH), exist_ok=True)
+
+
+class QueueFullError(Exception):
+    """대기 + 실행 중 작업 수가 상한에 도달해 새 작업을 받을 수 없음"""
+
+
+class LeaseLostError(Exception):
+    """lease가 만료돼 작업이 다른 워커에게 넘어감 → 이 워커는 남은 노드를 실행하지 않고 중단"""
+
+
+def get_conn():
+    """jobs.sqlite Connection (autocommit, 트랜잭션은 명시적으로 BEGIN)"""
+    conn = sqlite3.connect(JOB_DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_job_db():
+    """jobs 테이블 생성"""
+    conn = get_conn()
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                status TEXT NOT NULL,          -- queued | running | done | failed
+                stage_done TEXT,               -- 마지막으로 완료된 노드 이름
+                state TEXT,                    -- checkpoint state(JSON)
+                result TEXT,                   -- 최종 결과(JSON)
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker_id TEXT,
+                lease_until REAL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                batch_id TEXT,                 -- 일괄 처리 묶음 id (단건 업로드는 NULL)
+                priority INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        # 이전 버전 DB 마이그레이션
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "batch_id" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN batch_id TEXT")
+        if "priority" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_doc_id ON jobs(doc_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch_id ON jobs(batch_id)")
+    finally:
+        conn.close()
+
+
+# 모듈 로드 시 실행
+init_job_db()
+
+
+def _row_to_job(row) -> Dict[str, Any]:
+    job = dict(row)
+    job["state"] = json.loads(job["state"]) if job["state"] else {}
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+# 단건 업로드가 일괄 처리 작업보다 먼저 점유되도록
+PRIORITY_INTERACTIVE = 1
+PRIORITY_BATCH = 0
+
+
+def _count_active(conn, batch: bool | None = None) -> int:
+    """대기 + 실행 중 작업 수 (batch=True: 일괄 작업만, False: 단건만, None: 전체)"""
+    sql = "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+    if batch is True:
+        sql += " AND batch_id IS NOT NULL"
+    elif batch is False:
+        sql += " AND batch_id IS NULL"
+    return conn.execute(sql).fetchone()[0]
+
+
+def count_jobs() -> Dict[str, int]:
+    """상태별 작업 수 (queued / running / done / failed)"""
+    conn = get_conn()
+    try:
+        rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+    finally:
+        conn.close()
+    counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+    counts.update({row["status"]: row["n"] for row in rows})
+    return counts
+
+
+def count_active_jobs(batch: bool | None = None) -> int:
+    """대기 + 실행 중 작업 수 (batch=True: 일괄 작업만, False: 단건만, None: 전체)"""
+    conn = get_conn()
+    try:
+        return _count_active(conn, batch)
+    finally:
+        conn.close()
+
+
+def _insert_job(conn, doc_id: str, state: Dict[str, Any], now: float,
+                batch_id: str | None = None, priority: int = PRIORITY_INTERACTIVE) -> str:
+    job_id = uuid.uuid4().hex
+    conn.execute(
+        """
+        INSERT INTO jobs (job_id, doc_id, status, stage_done, state, attempts, created_at, updated_at, batch_id, priority)
+        VALUES (?, ?, 'queued', NULL, ?, 0, ?, ?, ?, ?)
+        """,
+        (job_id, doc_id, json.dumps(state, ensure_ascii=False), now, now, batch_id, priority),
+    )
+    return job_id
+
+
+def enqueue_job(doc_id: str, state: Dict[str, Any], max_active: int | None = None) -> str:
+    """
+    새 작업(단건 업로드) 등록 후 job_id 반환
+    - max_active가 있으면 대기 + 실행 중 단건 작업 수를 같은 트랜잭션에서 확인하고
+      상한 이상이면 QueueFullError (여러 요청이 동시에 들어와도 상한을 넘지 않음)
+    """
+    now = time.time()
+    conn = get_conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        if max_active is not None:
+            active = _count_active(conn, batch=False)
+            if active >= max_active:
+                conn.execute("ROLLBACK")
+                raise QueueFullError(f"작업 대기열이 가득 찼습니다 (active={active}, max={max_active})")
+        job_id = _insert_job(conn, doc_id, state, now)
+        conn.execute("COMMIT")
+    except QueueFullError:
+        raise
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return job_id
+
+
+def enqueue_batch(batch_id: str, items: List[Tuple[str, Dict[str, Any]]],
+                  max_active: int | None = None) -> List[str]:
+    """
+    일괄 처리 작업 여러 개를 한 트랜잭션으로 등록 후 job_id 목록 반환 (items: [(doc_id, state), ...])
+    - max_active가 있으면 대기 + 실행 중 일괄 작업 수 + 새 작업 수가 상한을 넘을 때 QueueFullError
+      (일부만 등록되는 일 없음)
+    """
+    now = time.time()
+    conn = get_conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        if max_active is not None:
+            active = _count_active(conn, batch=True)
+            if active + len(items) > max_active:
+                conn.execute("ROLLBACK")
+                raise QueueFullError(
+                    f"일괄 처리 대기열이 가득 찼습니다 (active={active}, 요청={len(items)}, max={max_active})"
+                )
+        job_ids = [
+            _insert_job(conn, doc_id, state, now, batch_id=batch_id, priority=PRIORITY_BATCH)
+            for doc_id, state in items
+        ]
+        conn.execute("COMMIT")
+    except QueueFullError:
+        raise
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return job_ids
+
+
+def claim_job(worker_id: str, lease_seconds: int = JOB_LEASE_SECONDS) -> Dict[str, Any] | None:
+    """
+    대기 중인 작업 또는 lease가 만료된(워커가 죽은) 실행 중 작업 하나를 점유.
+    - BEGIN IMMEDIATE로 쓰기 잠금을 잡아 여러 워커/프로세스가 같은 작업을 가져가지 않게 함
+    - 재시도 횟수를 넘긴 작업은 failed 처리 (+ 문서 색인 상태도 failed → /chat 이 계속 기다리지 않도록)
+    """
+    now = time.time()
+    conn = get_conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            """
+            SELECT * FROM jobs
+            WHERE (status = 'queued' AND (lease_until IS NULL OR lease_until < ?))
+               OR (status = 'running' AND lease_until < ?)
+            ORDER BY priority DESC, created_at
+            LIMIT 1
+            """,
+            (now, now),
+        ).fetchone()
+
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+
+        if row["attempts"] >= JOB_MAX_ATTEMPTS:
+            error = f"재시도 횟수 초과 (attempts={row['attempts']})"
+            conn.execute(
+                "UPDATE jobs SET status='failed', error=?, worker_id=NULL, lease_until=NULL, updated_at=? WHERE job_id=?",
+                (error, now, row["job_id"]),
+            )
+            conn.execute("COMMIT")
+            set_index_status(row["doc_id"], "failed", error)
+            emit_progress(row["doc_id"], "error", f"문서 처리 중 오류가 발생했습니다: {error}")
+            return None
+
+        conn.execute(
+            """
+            UPDATE jobs
+            SET status='running', worker_id=?, lease_until=?, attempts=attempts+1, updated_at=?
+            WHERE job_id=?
+            """,
+            (worker_id, now + lease_seconds, now, row["job_id"]),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    job = _row_to_job(row)
+    job["status"] = "running"
+    job["worker_id"] = worker_id
+    return job
+
+
+def renew_lease(job_id: str, worker_id: str, lease_seconds: int = JOB_LEASE_SECONDS) -> bool:
+    """실행 중인 작업의 lease 연장 (다른 워커에게 넘어갔으면 False)"""
+    now = time.time()
+    conn = get_conn()
+    try:
+        cur = conn.execute(
+            "UPDATE jobs SET lease_until=?, updated_at=? WHERE job_id=? AND worker_id=? AND status='running'",
+            (now + lease_seconds, now, job_id, worker_id),
+        )
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+def checkpoint_job(job_id: str, worker_id: str, stage: str, state: Dict[str, Any]) -> bool:
+    """노드 완료 후 state 저장 + lease 연장 (다른 워커에게 넘어갔으면 False)"""
+    now = time.time()
+    conn = get_conn()
+    try:
+        cur = conn.execute(
+            """
+            UPDATE jobs SET stage_done=?, state=?, lease_until=?, updated_at=?
+            WHERE job_id=? AND worker_id=?
+            """,
+            (stage, json.dumps(state, ensure_ascii=False), now + JOB_LEASE_SECONDS, now, job_id, worker_id),
+        )
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+def publish_result(job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+    """작업이 끝나기 전에 사용자 결과만 먼저 저장 (status는 running 유지, 남은 노드는 계속 실행)
+    - 다른 워커에게 넘어갔으면 False"""
+    conn = get_conn()
+    try:
+        cur = conn.execute(
+            "UPDATE jobs SET result=?, updated_at=? WHERE job_id=? AND worker_id=?",
+            (json.dumps(result, ensure_ascii=False), time.time(), job_id, worker_id),
+        )
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+def complete_job(job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+    """작업 완료 처리 (다른 워커에게 넘어갔으면 False)"""
+    conn = get_conn()
+    try:
+        cur = conn.execute(
+            """
+            UPDATE jobs SET status='done', result=?, error=NULL, worker_id=NULL, lease_until=NULL, updated_at=?
+            WHERE job_id=? AND worker_id=?
+            """,
+            (json.dumps(result, ensure_ascii=False), time.time(), job_id, worker_id),
+        )
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+def fail_job(job_id: str, worker_id: str, error: str, retry: bool = False, retry_delay: float = 0) -> None:
+    """
+    작업 실패 처리
+    - retry=True면 queued로 되돌려 retry_delay초 후 마지막 checkpoint부터 다시 실행
+      (queued 상태의 lease_until은 '이 시각 이후에 점유 가능'의 의미로 사용)
+    """
+    now = time.time()
+    status = "queued" if retry else "failed"
+    not_before = now + retry_delay if retry else None
+    conn = get_conn()
+    try:
+        conn.execute(
+            """
+            UPDATE jobs SET status=?, error=?, worker_id=NULL, lease_until=?, updated_at=?
+            WHERE job_id=? AND worker_id=?
+            """,
+            (status, error, not_before, now, job_id, worker_id),
+        )
+    finally:
+        conn.close()
+
+
+def get_job(job_id: str) -> Dict[str, Any] | None:
+    """작업 조회"""
+    conn = get_conn()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id=?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    return _row_to_job(row) if row else None
+
+
+def get_batch_jobs(batch_id: str) -> List[Dict[str, Any]]:
+    """일괄 처리 묶음의 작업 목록 (등록 순서, 결과 포함 / checkpoint state 제외)"""
+    conn = get_conn()
+    try:
+        rows = conn.execute(
+            """
+            SELECT job_id, doc_id, status, stage_done, result, error, attempts, created_at, updated_at
+            FROM jobs WHERE batch_id=? ORDER BY created_at, rowid
+            """,
+            (batch_id,),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    jobs = []
+    for row in rows:
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        jobs.append(job)
+    return jobs
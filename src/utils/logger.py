@@ -6,11 +6,16 @@ import os
 from datetime import datetime
 from typing import List, Dict
 
+from src.utils.config import USER_LOG_MAX_ITEMS
+from src.utils.state_store import get_state_store
+
 # 기본 로그 디렉토리 (프로젝트 루트 기준에서 조정 가능)
 BASE_LOG_DIR = "../logs"
 
-# 메모리에 사용자 안내 메시지 저장용 버퍼
-_USER_LOG_BUFFER: List[Dict] = []
+# 사용자 안내 메시지 버퍼 (공유 상태 저장소의 로그 → 여러 워커 프로세스가 같은 버퍼 사용)
+# - 최근 USER_LOG_MAX_ITEMS개만 보관 (추가할 때 오래된 것부터 삭제)
+USER_LOG_NAMESPACE = "user_log"
+USER_LOG_KEY = "global"
 
  
 def init_logger(work_dir: str | None = None) -> logging.Logger:
@@ -81,7 +86,7 @@ def user_log(message: str, step: str | None = None):
     """
     사용자에게 보여줄 '대기 안내 메시지' 기록용 함수.
     - 콘솔/파일에도 찍고
-    - _USER_LOG_BUFFER 에도 저장 (나중에 웹에서 사용 가능)
+    - 사용자 안내 버퍼(state_store)에도 저장 (나중에 웹에서 사용 가능)
     """
     logger = logging.getLogger("FinAI")
     if not logger.handlers:
@@ -91,22 +96,24 @@ def user_log(message: str, step: str | None = None):
     full_msg = prefix + message
     logger.info(full_msg)
 
-    _USER_LOG_BUFFER.append(
+    get_state_store().append(
+        USER_LOG_NAMESPACE,
+        USER_LOG_KEY,
         {
             "timestamp": datetime.now().isoformat(timespec="seconds"),
             "step": step or "",
             "message": message,
-        }
+        },
+        max_items=USER_LOG_MAX_ITEMS,
     )
 
 
 def get_user_logs(clear: bool = False) -> List[Dict]:
     """
     (옵션) 웹이나 다른 모듈에서 최근 사용자 안내 로그를 가져갈 수 있도록 제공.
-    - clear=True면 반환 후 버퍼 비움
+    - clear=True면 반환 후 버퍼 비움 (읽기 + 비우기를 한 번에 → 그 사이에 추가된 메시지가 사라지지 않음)
     """
-    global _USER_LOG_BUFFER
-    logs_copy = list(_USER_LOG_BUFFER)
+    store = get_state_store()
     if clear:
-        _USER_LOG_BUFFER = []
-    return logs_copy
+        return store.pop_log(USER_LOG_NAMESPACE, USER_LOG_KEY)
+    return store.read_log(USER_LOG_NAMESPACE, USER_LOG_KEY)
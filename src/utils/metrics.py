@@ -0,0 +1,215 @@
+# metrics.py
+# 파이프라인 / 모델 호출 계측 모듈
+# - 프로세스 전체 지표: Counter / Histogram → /metrics (Prometheus text format)
+# - 문서별 지표: doc_metrics_scope() 안에서 기록된 값을 dict로 모아 작업 결과에 첨부
+#
+# 기록하는 값
+#   pipeline_stage_seconds{stage}                      노드별 실행 시간
+#   job_queue_wait_seconds                             작업 등록 → 워커 점유까지 대기
+#   model_call_seconds{model,kind}                     모델 호출 시간 (재시도 포함)
+#   model_throttle_wait_seconds{model}                 rate limiter 대기 시간
+#   model_calls_total{model,kind,status}
+#   model_tokens_total{model,kind,direction}           input / output 토큰
+#   model_cost_usd_total{model}                        추정 비용(USD)
+#   stage_slot_wait_seconds{stage_class}               단계별 동시 실행 슬롯 대기 (admission.py)
+#   admission_rejections_total{reason}                 용량 초과로 거절한 요청 수
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Tuple
+
+from src.utils.config import MODEL_PRICES
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+# 1) 지표 타입
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, value: float = 1.0, **labels: str):
+        key = tuple(str(labels.get(l, "")) for l in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_label_str(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.values: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(l, "")) for l in self.labels)
+        with self.lock:
+            entry = self.values.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["counts"][i] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, entry in sorted(self.values.items()):
+                for bound, count in zip(self.buckets, entry["counts"]):
+                    le = _label_str(self.labels + ("le",), key + (str(bound),))
+                    lines.append(f"{self.name}_bucket{le} {count}")
+                le = _label_str(self.labels + ("le",), key + ("+Inf",))
+                lines.append(f"{self.name}_bucket{le} {entry['count']}")
+                lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {entry['sum']}")
+                lines.append(f"{self.name}_count{_label_str(self.labels, key)} {entry['count']}")
+        return lines
+
+
+def _escape_label(value) -> str:
+    """Prometheus text format 라벨 값 escape (\\ → \\\\, " → \\", 줄바꿈 → \\n)"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_str(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape_label(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+# 2) 지표 등록
+STAGE_SECONDS = Histogram("pipeline_stage_seconds", "Pipeline node wall time", ("stage",))
+QUEUE_WAIT_SECONDS = Histogram("job_queue_wait_seconds", "Time from enqueue to worker claim")
+MODEL_CALL_SECONDS = Histogram("model_call_seconds", "Model API call wall time incl. retries", ("model", "kind"))
+MODEL_THROTTLE_SECONDS = Histogram("model_throttle_wait_seconds", "Time spent waiting on rate limiter", ("model",))
+MODEL_CALLS = Counter("model_calls_total", "Model API calls", ("model", "kind", "status"))
+MODEL_TOKENS = Counter("model_tokens_total", "Model API tokens", ("model", "kind", "direction"))
+MODEL_COST = Counter("model_cost_usd_total", "Estimated model API cost in USD", ("model",))
+STAGE_SLOT_WAIT_SECONDS = Histogram("stage_slot_wait_seconds", "Time spent waiting for a stage concurrency slot",
+                                    ("stage_class",))
+ADMISSION_REJECTIONS = Counter("admission_rejections_total", "Requests rejected for lack of capacity", ("reason",))
+
+_METRICS = [STAGE_SECONDS, QUEUE_WAIT_SECONDS, MODEL_CALL_SECONDS, MODEL_THROTTLE_SECONDS,
+            MODEL_CALLS, MODEL_TOKENS, MODEL_COST, STAGE_SLOT_WAIT_SECONDS, ADMISSION_REJECTIONS]
+
+# 다른 모듈의 gauge 등을 /metrics에 덧붙이기 위한 collector (Prometheus 텍스트 줄 목록 반환)
+# - 지표마다 metric_family로 HELP / TYPE 를 붙여 반환 (없으면 scraper가 untyped로 처리)
+_COLLECTORS: List[Callable[[], List[str]]] = []
+
+
+def metric_family(name: str, kind: str, help_text: str, samples, labels: Tuple[str, ...] = ()) -> List[str]:
+    """collector용 지표 1개 → HELP / TYPE + 값 줄 (samples: [(라벨 값 tuple, 값)], kind: counter | gauge)"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for key, value in samples:
+        lines.append(f"{name}{_label_str(labels, key)} {value}")
+    return lines
+
+
+def register_collector(fn: Callable[[], List[str]]) -> None:
+    _COLLECTORS.append(fn)
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for collector in _COLLECTORS:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+# 3) 문서별 지표 (contextvar: 작업을 실행하는 스레드에서 scope 지정)
+_doc_metrics: contextvars.ContextVar[Dict[str, Any] | None] = contextvars.ContextVar("doc_metrics", default=None)
+
+
+def new_doc_metrics() -> Dict[str, Any]:
+    return {"stages": {}, "queue_wait_seconds": 0.0, "models": {}, "total_cost_usd": 0.0}
+
+
+@contextmanager
+def doc_metrics_scope(doc_metrics: Dict[str, Any]):
+    """이 블록 안에서 기록되는 stage/모델 호출 지표를 doc_metrics에도 누적"""
+    token = _doc_metrics.set(doc_metrics)
+    try:
+        yield doc_metrics
+    finally:
+        _doc_metrics.reset(token)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """노드 실행 시간 기록"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        doc = _doc_metrics.get()
+        if doc is not None:
+            doc["stages"][stage] = round(doc["stages"].get(stage, 0.0) + elapsed, 3)
+
+
+def record_queue_wait(seconds: float) -> None:
+    QUEUE_WAIT_SECONDS.observe(seconds)
+    doc = _doc_metrics.get()
+    if doc is not None:
+        doc["queue_wait_seconds"] = round(doc["queue_wait_seconds"] + seconds, 3)
+
+
+def record_throttle_wait(model: str, seconds: float) -> None:
+    MODEL_THROTTLE_SECONDS.observe(seconds, model=model)
+    doc = _doc_metrics.get()
+    if doc is not None:
+        entry = _doc_model_entry(doc, model)
+        entry["throttle_wait_seconds"] = round(entry["throttle_wait_seconds"] + seconds, 3)
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    price = MODEL_PRICES.get(model)
+    if not price:
+        return 0.0
+    return (input_tokens * price["input"] + output_tokens * price["output"]) / 1_000_000
+
+
+def record_model_call(model: str, kind: str, seconds: float, input_tokens: int = 0,
+                      output_tokens: int = 0, status: str = "ok") -> None:
+    """모델 호출 1회 기록 (시간 / 토큰 / 비용)"""
+    cost = estimate_cost(model, input_tokens, output_tokens)
+
+    MODEL_CALL_SECONDS.observe(seconds, model=model, kind=kind)
+    MODEL_CALLS.inc(model=model, kind=kind, status=status)
+    MODEL_TOKENS.inc(input_tokens, model=model, kind=kind, direction="input")
+    MODEL_TOKENS.inc(output_tokens, model=model, kind=kind, direction="output")
+    MODEL_COST.inc(cost, model=model)
+
+    doc = _doc_metrics.get()
+    if doc is not None:
+        entry = _doc_model_entry(doc, model)
+        entry["calls"] += 1
+        entry["seconds"] = round(entry["seconds"] + seconds, 3)
+        entry["input_tokens"] += input_tokens
+        entry["output_tokens"] += output_tokens
+        entry["cost_usd"] = round(entry["cost_usd"] + cost, 6)
+        doc["total_cost_usd"] = round(doc["total_cost_usd"] + cost, 6)
+
+
+def _doc_model_entry(doc: Dict[str, Any], model: str) -> Dict[str, Any]:
+    return doc["models"].setdefault(model, {
+        "calls": 0, "seconds": 0.0, "throttle_wait_seconds": 0.0,
+        "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0,
+    })
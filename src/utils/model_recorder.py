@@ -0,0 +1,134 @@
+# model_recorder.py
+# 모델 호출 녹화/재생 (오프라인, 결정적 성능 테스트용)
+# - MODEL_CALL_MODE=record : 실제 API 호출 + 요청/응답/지연시간을 fixture 파일(JSONL)에 저장
+# - MODEL_CALL_MODE=replay : API 호출 없이 fixture에서 응답을 찾아 반환
+#                            (MODEL_REPLAY_LATENCY=1 이면 녹화 당시 지연시간만큼 대기)
+# - fixture 파일은 문서(doc_id) 단위: {MODEL_FIXTURE_DIR}/{doc_id}.jsonl
+#   (fixture_scope 밖의 호출은 default.jsonl)
+# - chat / responses / embeddings / vision(chat + image) 호출 모두 api_client._call_model 에서 처리
+import contextvars
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+from openai.types import CreateEmbeddingResponse
+from openai.types.chat import ChatCompletion
+from openai.types.responses import Response
+
+from src.utils.config import MODEL_FIXTURE_DIR, MODEL_REPLAY_LATENCY
+
+RESPONSE_TYPES = {
+    "chat": ChatCompletion,
+    "responses": Response,
+    "embeddings": CreateEmbeddingResponse,
+}
+
+
+class FixtureMissingError(KeyError):
+    """replay 모드에서 요청에 해당하는 녹화 응답이 없음"""
+
+
+_fixture_name: contextvars.ContextVar[str] = contextvars.ContextVar("fixture_name", default="default")
+_write_lock = threading.Lock()
+
+
+@contextmanager
+def fixture_scope(name: str | None):
+    """이 블록 안의 모델 호출을 {name}.jsonl 에 녹화 / 재생"""
+    token = _fixture_name.set(_safe_name(name or "default"))
+    try:
+        yield
+    finally:
+        _fixture_name.reset(token)
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^0-9A-Za-z가-힣_.-]", "_", name)[:120]
+
+
+# 1) 요청 키
+def request_key(kind: str, kwargs: Dict[str, Any]) -> str:
+    payload = json.dumps({"kind": kind, "kwargs": kwargs}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+_DATA_URL = re.compile(r"data:image/[a-z]+;base64,[A-Za-z0-9+/=]+")
+
+
+def _shrink_request(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """fixture 용량을 줄이기 위해 base64 이미지는 해시로 대체 (키 계산은 원본 기준)"""
+    text = json.dumps(kwargs, ensure_ascii=False, default=str)
+    text = _DATA_URL.sub(lambda m: f"<image sha256={hashlib.sha256(m.group(0).encode()).hexdigest()[:16]}>", text)
+    return json.loads(text)
+
+
+# 2) 녹화
+def record_call(kind: str, kwargs: Dict[str, Any], resp: Any, latency: float) -> None:
+    entry = {
+        "key": request_key(kind, kwargs),
+        "kind": kind,
+        "model": kwargs.get("model"),
+        "latency": round(latency, 4),
+        "request": _shrink_request(kwargs),
+        "response": resp.model_dump(mode="json"),
+    }
+    os.makedirs(MODEL_FIXTURE_DIR, exist_ok=True)
+    path = os.path.join(MODEL_FIXTURE_DIR, f"{_fixture_name.get()}.jsonl")
+    with _write_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+# 3) 재생
+_index: Dict[str, List[Dict[str, Any]]] | None = None
+_cursor: Dict[str, int] = defaultdict(int)
+_index_lock = threading.Lock()
+
+
+def _load_index() -> Dict[str, List[Dict[str, Any]]]:
+    """fixture 폴더의 모든 JSONL을 key → 응답 목록으로 적재 (같은 요청이 여러 번이면 녹화 순서대로)"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            index: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+            if os.path.isdir(MODEL_FIXTURE_DIR):
+                for filename in sorted(os.listdir(MODEL_FIXTURE_DIR)):
+                    if not filename.endswith(".jsonl"):
+                        continue
+                    with open(os.path.join(MODEL_FIXTURE_DIR, filename), encoding="utf-8") as f:
+                        for line in f:
+                            if line.strip():
+                                entry = json.loads(line)
+                                index[entry["key"]].append(entry)
+            _index = index
+        return _index
+
+
+def reset_replay() -> None:
+    """fixture 다시 읽기 + 재생 위치 초기화 (벤치마크 반복 실행용)"""
+    global _index
+    with _index_lock:
+        _index = None
+        _cursor.clear()
+
+
+def replay_call(kind: str, kwargs: Dict[str, Any]) -> Any:
+    key = request_key(kind, kwargs)
+    entries = _load_index().get(key)
+    if not entries:
+        raise FixtureMissingError(f"녹화된 응답 없음: kind={kind}, model={kwargs.get('model')}, key={key[:12]}")
+
+    with _index_lock:
+        entry = entries[_cursor[key] % len(entries)]
+        _cursor[key] += 1
+
+    if MODEL_REPLAY_LATENCY:
+        time.sleep(entry["latency"])
+
+    return RESPONSE_TYPES[kind].model_validate(entry["response"])
@@ -0,0 +1,76 @@
+# progress.py
+# 문서(doc_id)별 처리 단계 진행상황 + 중간 결과 이벤트 기록 모듈
+# - 파이프라인 노드(작업 워커)에서 emit_progress 로 이벤트를 남기고
+# - main.py 의 /progress/{doc_id}/stream (SSE) 에서 seq 순서대로 읽어간다.
+# - 이벤트는 공유 상태 저장소(state_store.py)의 "progress" 로그에 저장되므로
+#   작업을 실행한 워커와 SSE 연결을 받은 워커가 달라도 같은 이벤트를 본다.
+#
+# 단계(stage) 예시:
+#   parse → ocr(i/N) → clean → classify → ner → summary → actions → indexed → done
+#   (실패 시 error)
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+from src.utils.config import STATE_LOG_RETENTION
+from src.utils.state_store import get_state_store
+
+NAMESPACE = "progress"
+
+# 스트림을 종료시키는 단계
+TERMINAL_STAGES = {"done", "error"}
+
+# 오래된 문서 이벤트 정리 주기(초)
+PRUNE_INTERVAL = 600
+
+_last_prune = 0.0
+_prune_lock = threading.Lock()
+
+
+def _maybe_prune() -> None:
+    """STATE_LOG_RETENTION보다 오래된 문서 이벤트를 주기적으로 삭제"""
+    global _last_prune
+    now = time.monotonic()
+    with _prune_lock:
+        if now - _last_prune < PRUNE_INTERVAL:
+            return
+        _last_prune = now
+    get_state_store().prune_logs(NAMESPACE, STATE_LOG_RETENTION)
+
+
+def emit_progress(doc_id: str | None, stage: str, message: str = "", **data: Any) -> None:
+    """
+    doc_id 문서의 단계 전환/중간 결과 이벤트 기록.
+    - doc_id가 없으면(단독 실행, 테스트 등) 아무것도 하지 않음
+    - data에는 summary, action 등 JSON 직렬화 가능한 중간 결과를 담는다.
+    """
+    if not doc_id:
+        return
+
+    event = {
+        "doc_id": doc_id,
+        "stage": stage,
+        "message": message,
+        "data": data,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+    }
+
+    get_state_store().append(NAMESPACE, doc_id, event)
+    _maybe_prune()
+
+
+def get_events(doc_id: str, since: int = 0) -> List[Dict[str, Any]]:
+    """seq >= since 인 이벤트 목록 반환"""
+    return get_state_store().read_log(NAMESPACE, doc_id, since)
+
+
+def get_progress(doc_id: str) -> str:
+    """가장 최근 단계 이름 반환 (기록이 없으면 "pending")"""
+    event = get_state_store().last_log(NAMESPACE, doc_id)
+    return event["stage"] if event else "pending"
+
+
+def clear_progress(doc_id: str) -> None:
+    """같은 doc_id로 재처리할 때 이전 이벤트 삭제 (seq는 이어서 증가 → 재연결한 SSE 클라이언트도 순서 유지)"""
+    get_state_store().clear_log(NAMESPACE, doc_id)
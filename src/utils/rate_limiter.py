@@ -0,0 +1,280 @@
+# rate_limiter.py
+# 모든 모델(OpenAI) 호출이 공유하는 호출 제어 계층
+# - 모델별 token bucket 2개 (분당 요청 수 RPM / 분당 토큰 수 TPM) 로 호출 전 대기
+# - 429 / 5xx / 연결 오류는 jitter가 들어간 지수 backoff로 재시도 (Retry-After 헤더 우선)
+# - 연속 실패가 쌓이면 circuit breaker가 열려 일정 시간 즉시 실패 (API 장애 시 대기열 폭주 방지)
+# - get_limiter_metrics()로 호출/재시도/대기시간/차단 횟수 조회
+import random
+import threading
+import time
+from typing import Any, Callable, Dict
+
+import openai
+
+from src.utils.config import (
+    MODEL_RATE_LIMITS, DEFAULT_RATE_LIMIT,
+    RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY,
+    BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS,
+)
+from src.utils.logger import log
+from src.utils.metrics import metric_family, record_throttle_wait, register_collector
+
+
+class ModelUnavailableError(Exception):
+    """재시도를 모두 소진했거나 circuit breaker가 열려 모델을 호출할 수 없음"""
+
+
+# 1) Token bucket
+class TokenBucket:
+    """capacity만큼 쌓이고 분당 capacity 속도로 채워지는 bucket"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """
+        amount만큼 차감될 때까지 대기 후 대기한 시간(초) 반환
+        - 한 번에 capacity보다 큰 요청은 capacity까지만 기다림 (무한 대기 방지)
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                sleep_for = (amount - self.tokens) / self.rate
+            time.sleep(sleep_for)
+            waited += sleep_for
+
+    def adjust(self, delta: float):
+        """실제 사용량이 추정치와 다를 때 보정 (음수 잔량 허용 = 다음 호출이 더 기다림)"""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+# 2) Circuit breaker
+class CircuitBreaker:
+    """closed → (연속 실패 threshold회) → open → (reset_seconds 후) half-open → 성공 시 closed"""
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.half_open_trial = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.half_open_trial:
+                self.half_open_trial = True   # 시험 호출은 1개만 허용
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.half_open_trial = False
+
+    def release_trial(self):
+        """half-open 시험 호출 표시만 해제 (연속 실패 수 / open 상태는 그대로)"""
+        with self.lock:
+            self.half_open_trial = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.half_open_trial = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+# 3) 모델별 limiter
+class ModelLimiter:
+    def __init__(self, model: str):
+        limits = MODEL_RATE_LIMITS.get(model, DEFAULT_RATE_LIMIT)
+        self.model = model
+        self.requests = TokenBucket(limits["rpm"])
+        self.tokens = TokenBucket(limits["tpm"])
+        self.breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS)
+        self.metrics = {
+            "calls": 0,
+            "success": 0,
+            "retries": 0,
+            "rate_limited": 0,     # 429 응답 수
+            "server_errors": 0,    # 5xx / 연결 오류 수
+            "failures": 0,         # 재시도 소진 또는 재시도 불가 오류
+            "breaker_rejected": 0,
+            "throttle_wait_seconds": 0.0,
+        }
+        self.metrics_lock = threading.Lock()
+
+    def count(self, key: str, value: float = 1):
+        with self.metrics_lock:
+            self.metrics[key] += value
+
+
+_limiters: Dict[str, ModelLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model: str) -> ModelLimiter:
+    with _limiters_lock:
+        if model not in _limiters:
+            _limiters[model] = ModelLimiter(model)
+        return _limiters[model]
+
+
+# 4) 재시도 판단
+def _is_retryable(e: Exception) -> bool:
+    if isinstance(e, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(e, openai.APIStatusError):
+        return e.status_code == 429 or e.status_code >= 500
+    return False
+
+
+def _retry_after(e: Exception) -> float | None:
+    response = getattr(e, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def _backoff(attempt: int) -> float:
+    """full jitter 지수 backoff"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+# 5) 모든 모델 호출의 진입점
+def call_with_limits(model: str, fn: Callable[[], Any], est_tokens: int = 0,
+                     usage_tokens: Callable[[Any], int | None] | None = None) -> Any:
+    """
+    fn()을 rate limit / retry / circuit breaker 아래에서 실행
+    - est_tokens: 호출 전 추정 토큰 수 (TPM bucket 차감용)
+    - usage_tokens: 응답에서 실제 토큰 수를 꺼내는 함수 (추정치 보정용)
+    """
+    limiter = get_limiter(model)
+    limiter.count("calls")
+
+    for attempt in range(RETRY_MAX_ATTEMPTS):
+        if not limiter.breaker.allow():
+            limiter.count("breaker_rejected")
+            raise ModelUnavailableError(f"{model}: circuit breaker open")
+
+        waited = limiter.requests.acquire(1)
+        waited += limiter.tokens.acquire(est_tokens)
+        if waited:
+            limiter.count("throttle_wait_seconds", waited)
+            record_throttle_wait(model, waited)
+
+        try:
+            result = fn()
+        except Exception as e:
+            if not _is_retryable(e):
+                # 400 등 재시도 불가 오류 = 요청 문제 → breaker 상태는 그대로 두고 half-open 시험 호출 표시만 해제
+                # (성공으로 세면 400/5xx가 번갈아 올 때 breaker가 열리지 않고, 표시가 남으면 allow()가 계속 False)
+                limiter.breaker.release_trial()
+                limiter.count("failures")
+                raise
+
+            limiter.breaker.record_failure()
+            if isinstance(e, openai.RateLimitError) or getattr(e, "status_code", None) == 429:
+                limiter.count("rate_limited")
+            else:
+                limiter.count("server_errors")
+
+            if attempt == RETRY_MAX_ATTEMPTS - 1:
+                limiter.count("failures")
+                raise ModelUnavailableError(f"{model}: 재시도 {RETRY_MAX_ATTEMPTS}회 실패 - {e!r}") from e
+
+            delay = _retry_after(e) or _backoff(attempt)
+            limiter.count("retries")
+            log(f"[RateLimit] {model} 호출 실패({e.__class__.__name__}) → {delay:.1f}초 후 재시도 ({attempt+1}/{RETRY_MAX_ATTEMPTS})", level="warning")
+            time.sleep(delay)
+            continue
+
+        limiter.breaker.record_success()
+        limiter.count("success")
+
+        if usage_tokens is not None:
+            actual = usage_tokens(result)
+            if actual is not None:
+                limiter.tokens.adjust(actual - est_tokens)
+
+        return result
+
+
+def get_limiter_metrics() -> Dict[str, Dict[str, Any]]:
+    """모델별 호출 지표 + bucket 잔량 + breaker 상태"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+
+    result = {}
+    for limiter in limiters:
+        with limiter.metrics_lock:
+            metrics = dict(limiter.metrics)
+        metrics["breaker_state"] = limiter.breaker.state
+        metrics["requests_available"] = round(limiter.requests.tokens, 1)
+        metrics["tokens_available"] = round(limiter.tokens.tokens, 1)
+        result[limiter.model] = metrics
+    return result
+
+
+_BREAKER_STATE_VALUE = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def _prometheus_lines():
+    """/metrics 에 붙일 limiter 지표"""
+    metrics = get_limiter_metrics()
+
+    def family(name, kind, help_text, value):
+        return metric_family(name, kind, help_text, [((model,), value(m)) for model, m in metrics.items()], ("model",))
+
+    return [
+        *family("model_limiter_retries_total", "counter", "Model calls retried after 429/5xx",
+                lambda m: m["retries"]),
+        *family("model_limiter_rate_limited_total", "counter", "429 responses from the model API",
+                lambda m: m["rate_limited"]),
+        *family("model_limiter_server_errors_total", "counter", "5xx / connection errors from the model API",
+                lambda m: m["server_errors"]),
+        *family("model_limiter_failures_total", "counter", "Model calls failed after retries or with non-retryable errors",
+                lambda m: m["failures"]),
+        *family("model_limiter_breaker_rejected_total", "counter", "Model calls rejected by an open circuit breaker",
+                lambda m: m["breaker_rejected"]),
+        *family("model_limiter_breaker_state", "gauge", "Circuit breaker state (0=closed, 1=half_open, 2=open)",
+                lambda m: _BREAKER_STATE_VALUE[m["breaker_state"]]),
+        *family("model_limiter_tokens_available", "gauge", "Tokens left in the TPM bucket",
+                lambda m: m["tokens_available"]),
+    ]
+
+
+register_collector(_prometheus_lines)
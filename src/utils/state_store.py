@@ -0,0 +1,435 @@
+# state_store.py
+# 워커 프로세스 간 공유 상태 저장소
+# - 진행상황 이벤트(progress.py), 챗봇 대화 상태(rag_chat_engine.py), 사용자 안내 로그(logger.py)가
+#   프로세스 전역 dict/list 대신 이 저장소를 사용 → uvicorn 워커 여러 개 / 여러 호스트에서도 일관된 상태
+# - 두 가지 자료형
+#     key-value : get / set / update(원자적 read-modify-write) / delete / prune_keys(유휴·LRU 정리)
+#     log       : append(seq 자동 증가, max_items 초과분 삭제) / read_log(since) / last_log / pop_log(읽고 비우기)
+#                 / clear_log / prune_logs
+#                 seq는 key별로 clear_log / pop_log 후에도 이어서 증가 (SSE Last-Event-ID 재연결 순서 보장),
+#                 prune_logs로 오래된 key가 정리될 때만 0부터 다시 시작
+# - 구현체
+#     SqliteStateStore : 기본값, STATE_DB_PATH (WAL, 쓰기는 BEGIN IMMEDIATE)
+#     MemoryStateStore : 테스트 / 단일 프로세스용
+#   STATE_STORE 환경변수로 선택, set_state_store()로 교체 가능
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Callable, Dict, List
+
+from src.utils.config import STATE_STORE, STATE_DB_PATH
+
+
+class StateStore(ABC):
+    """상태 저장소 인터페이스 (값은 JSON 직렬화 가능한 객체, 메서드를 다 구현하지 않은 구현체는 생성 시 TypeError)"""
+
+    # key-value
+    @abstractmethod
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        ...
+
+    @abstractmethod
+    def update(self, namespace: str, key: str, fn: Callable[[Any], Any], default: Any = None) -> Any:
+        """현재 값(없으면 default)에 fn을 적용해 저장하고 새 값 반환 (다른 워커와 원자적으로)
+        - fn은 잠금 안에서 실행되므로 모델 호출 등 오래 걸리는 작업을 넣지 말 것"""
+        ...
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def prune_keys(self, namespace: str, max_idle_seconds: float, max_keys: int | None = None) -> int:
+        """max_idle_seconds 동안 쓰지 않은 key 삭제 + max_keys를 넘으면 가장 오래 안 쓴 key부터 삭제,
+        삭제한 key 수 반환"""
+        ...
+
+    # log
+    @abstractmethod
+    def append(self, namespace: str, key: str, item: Dict[str, Any], max_items: int | None = None) -> int:
+        """item에 seq(0부터, 비운 뒤에도 이어서 증가)를 붙여 추가하고 seq 반환
+        - max_items를 주면 같은 key의 로그가 그 수를 넘지 않도록 오래된 항목부터 삭제 (같은 트랜잭션)"""
+        ...
+
+    @abstractmethod
+    def read_log(self, namespace: str, key: str, since: int = 0) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def last_log(self, namespace: str, key: str) -> Dict[str, Any] | None:
+        ...
+
+    @abstractmethod
+    def pop_log(self, namespace: str, key: str) -> List[Dict[str, Any]]:
+        """로그 전체를 반환하고 비움 (읽기와 삭제 사이에 추가된 항목이 사라지지 않도록 원자적으로)"""
+        ...
+
+    @abstractmethod
+    def clear_log(self, namespace: str, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def prune_logs(self, namespace: str, max_age_seconds: float) -> int:
+        """마지막 기록이 max_age_seconds보다 오래된 key의 로그 삭제, 삭제한 항목 수 반환"""
+        ...
+
+
+# 1) 메모리 구현 (테스트 / 단일 워커)
+class MemoryStateStore(StateStore):
+    def __init__(self):
+        self._kv: Dict[tuple, Any] = {}
+        self._kv_updated: Dict[tuple, float] = {}
+        self._logs: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+        self._log_updated: Dict[tuple, float] = {}
+        self._next_seq: Dict[tuple, tuple] = {}   # key → (다음 seq, 마지막 append 시각)
+        self._lock = threading.RLock()
+
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            return copy.deepcopy(self._kv.get((namespace, key), default))
+
+    def set(self, namespace, key, value):
+        with self._lock:
+            self._kv[(namespace, key)] = copy.deepcopy(value)
+            self._kv_updated[(namespace, key)] = time.time()
+
+    def update(self, namespace, key, fn, default=None):
+        with self._lock:
+            value = fn(copy.deepcopy(self._kv.get((namespace, key), default)))
+            self._kv[(namespace, key)] = copy.deepcopy(value)
+            self._kv_updated[(namespace, key)] = time.time()
+            return value
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._kv.pop((namespace, key), None)
+            self._kv_updated.pop((namespace, key), None)
+
+    def prune_keys(self, namespace, max_idle_seconds, max_keys=None):
+        cutoff = time.time() - max_idle_seconds
+        with self._lock:
+            keys = sorted((t, k) for k, t in self._kv_updated.items() if k[0] == namespace)
+            stale = [k for t, k in keys if t < cutoff]
+            if max_keys is not None:
+                live = [k for t, k in keys if t >= cutoff]
+                stale += live[:max(0, len(live) - max_keys)]
+            for k in stale:
+                self._kv.pop(k, None)
+                self._kv_updated.pop(k, None)
+            return len(stale)
+
+    def append(self, namespace, key, item, max_items=None):
+        with self._lock:
+            log = self._logs[(namespace, key)]
+            item = {**copy.deepcopy(item), "seq": self._next_seq.get((namespace, key), (0, 0))[0]}
+            now = time.time()
+            self._next_seq[(namespace, key)] = (item["seq"] + 1, now)
+            log.append(item)
+            if max_items is not None and len(log) > max_items:
+                del log[:len(log) - max_items]
+            self._log_updated[(namespace, key)] = now
+            return item["seq"]
+
+    def read_log(self, namespace, key, since=0):
+        with self._lock:
+            return copy.deepcopy([item for item in self._logs.get((namespace, key), []) if item["seq"] >= since])
+
+    def last_log(self, namespace, key):
+        with self._lock:
+            log = self._logs.get((namespace, key))
+            return copy.deepcopy(log[-1]) if log else None
+
+    def pop_log(self, namespace, key):
+        with self._lock:
+            self._log_updated.pop((namespace, key), None)
+            return self._logs.pop((namespace, key), [])
+
+    def clear_log(self, namespace, key):
+        with self._lock:
+            self._logs.pop((namespace, key), None)
+            self._log_updated.pop((namespace, key), None)
+
+    def prune_logs(self, namespace, max_age_seconds):
+        cutoff = time.time() - max_age_seconds
+        with self._lock:
+            stale = [k for k, t in self._log_updated.items() if k[0] == namespace and t < cutoff]
+            removed = 0
+            for k in stale:
+                removed += len(self._logs.pop(k, []))
+                self._log_updated.pop(k, None)
+            # 비운 key 포함, 마지막 append가 오래된 key의 seq 정리
+            for k in [k for k, (_, t) in self._next_seq.items() if k[0] == namespace and t < cutoff]:
+                self._next_seq.pop(k, None)
+            return removed
+
+
+# 2) SQLite 구현 (기본값)
+class SqliteStateStore(StateStore):
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS state_kv (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS state_log (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    item TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key, seq)
+                )
+                """
+            )
+            # key별 다음 seq (로그를 비워도 유지 → seq가 되돌아가지 않음)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS state_log_seq (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    next_seq INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_state_kv_updated ON state_kv(namespace, updated_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_state_log_created ON state_log(namespace, created_at)")
+        finally:
+            conn.close()
+
+    def _conn(self):
+        """autocommit Connection (쓰기 트랜잭션은 BEGIN IMMEDIATE로 명시)"""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, namespace, key, default=None):
+        conn = self._conn()
+        try:
+            row = conn.execute(
+                "SELECT value FROM state_kv WHERE namespace=? AND key=?", (namespace, key)
+            ).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else default
+
+    def set(self, namespace, key, value):
+        conn = self._conn()
+        try:
+            conn.execute(
+                """
+                INSERT INTO state_kv (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(namespace, key) DO UPDATE SET value=excluded.value, updated_at=excluded.updated_at
+                """,
+                (namespace, key, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+        finally:
+            conn.close()
+
+    def update(self, namespace, key, fn, default=None):
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT value FROM state_kv WHERE namespace=? AND key=?", (namespace, key)
+            ).fetchone()
+            value = fn(json.loads(row[0]) if row else copy.deepcopy(default))
+            conn.execute(
+                """
+                INSERT INTO state_kv (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(namespace, key) DO UPDATE SET value=excluded.value, updated_at=excluded.updated_at
+                """,
+                (namespace, key, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return value
+
+    def delete(self, namespace, key):
+        conn = self._conn()
+        try:
+            conn.execute("DELETE FROM state_kv WHERE namespace=? AND key=?", (namespace, key))
+        finally:
+            conn.close()
+
+    def prune_keys(self, namespace, max_idle_seconds, max_keys=None):
+        cutoff = time.time() - max_idle_seconds
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            removed = conn.execute(
+                "DELETE FROM state_kv WHERE namespace=? AND updated_at<?", (namespace, cutoff)
+            ).rowcount
+            if max_keys is not None:
+                removed += conn.execute(
+                    """
+                    DELETE FROM state_kv WHERE namespace=? AND key IN (
+                        SELECT key FROM state_kv WHERE namespace=? ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (namespace, namespace, max_keys),
+                ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return removed
+
+    def append(self, namespace, key, item, max_items=None):
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # state_log_seq가 없던 기존 DB는 남아 있는 로그의 MAX(seq)부터 이어감
+            seq = conn.execute(
+                """
+                SELECT COALESCE(
+                    (SELECT next_seq FROM state_log_seq WHERE namespace=? AND key=?),
+                    (SELECT MAX(seq) + 1 FROM state_log WHERE namespace=? AND key=?),
+                    0
+                )
+                """,
+                (namespace, key, namespace, key),
+            ).fetchone()[0]
+            now = time.time()
+            conn.execute(
+                "INSERT INTO state_log (namespace, key, seq, item, created_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, seq, json.dumps({**item, "seq": seq}, ensure_ascii=False), now),
+            )
+            conn.execute(
+                """
+                INSERT INTO state_log_seq (namespace, key, next_seq, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(namespace, key) DO UPDATE SET next_seq=excluded.next_seq, updated_at=excluded.updated_at
+                """,
+                (namespace, key, seq + 1, now),
+            )
+            if max_items is not None:
+                conn.execute(
+                    "DELETE FROM state_log WHERE namespace=? AND key=? AND seq<=?", (namespace, key, seq - max_items)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return seq
+
+    def read_log(self, namespace, key, since=0):
+        conn = self._conn()
+        try:
+            rows = conn.execute(
+                "SELECT item FROM state_log WHERE namespace=? AND key=? AND seq>=? ORDER BY seq",
+                (namespace, key, since),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [json.loads(r[0]) for r in rows]
+
+    def last_log(self, namespace, key):
+        conn = self._conn()
+        try:
+            row = conn.execute(
+                "SELECT item FROM state_log WHERE namespace=? AND key=? ORDER BY seq DESC LIMIT 1",
+                (namespace, key),
+            ).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else None
+
+    def pop_log(self, namespace, key):
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT item FROM state_log WHERE namespace=? AND key=? ORDER BY seq", (namespace, key)
+            ).fetchall()
+            conn.execute("DELETE FROM state_log WHERE namespace=? AND key=?", (namespace, key))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return [json.loads(r[0]) for r in rows]
+
+    def clear_log(self, namespace, key):
+        conn = self._conn()
+        try:
+            conn.execute("DELETE FROM state_log WHERE namespace=? AND key=?", (namespace, key))
+        finally:
+            conn.close()
+
+    def prune_logs(self, namespace, max_age_seconds):
+        cutoff = time.time() - max_age_seconds
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            removed = conn.execute(
+                """
+                DELETE FROM state_log
+                WHERE namespace=? AND key IN (
+                    SELECT key FROM state_log WHERE namespace=? GROUP BY key HAVING MAX(created_at) < ?
+                )
+                """,
+                (namespace, namespace, cutoff),
+            ).rowcount
+            # 비운 key 포함, 마지막 append가 오래된 key의 seq 정리
+            conn.execute("DELETE FROM state_log_seq WHERE namespace=? AND updated_at<?", (namespace, cutoff))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return removed
+
+
+# 3) 공용 저장소
+_store: StateStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_state_store() -> StateStore:
+    """STATE_STORE 설정에 맞는 프로세스 공용 저장소 (최초 호출 시 생성)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MemoryStateStore() if STATE_STORE == "memory" else SqliteStateStore(STATE_DB_PATH)
+    return _store
+
+
+def set_state_store(store: StateStore) -> None:
+    """저장소 교체 (테스트에서 MemoryStateStore 주입 등)"""
+    global _store
+    with _store_lock:
+        _store = store
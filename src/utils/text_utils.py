@@ -1,7 +1,7 @@
 # text_utils.py (강화 버전)
 # OCR / PDF 파서 / HWP / Word 등의 텍스트를 공격적으로 전처리하는 모듈.
 import re
-from typing import List, Union
+from typing import List, Tuple, Union
 from src.utils.config import load_api_keys
 from src.utils.config import LLM_MODEL
 
@@ -100,3 +100,130 @@ def preprocess_text(text: Union[str, List[str]]) -> Union[str, List[str]]:
 #  7) 페이지 리스트 전용 함수 (alias)
 def preprocess_pages(text_list: List[str]) -> List[str]:
     return [preprocess_single(t) for t in text_list]
+
+
+# 8) 문장 분리 (RAG 출처 문장용, rag_builder.insert_info 색인 시 사용)
+# - 마침표/느낌표/물음표/말줄임표/줄바꿈 뒤 공백 기준으로 자름
+# - 날짜(2025. 1. 5 / 2025.01.05)의 마침표에서는 자르지 않음
+# - 5글자 이하 조각은 버림
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…\n])\s+")
+_DATE_PATTERN = re.compile(r"(\d{4})\.\s*(\d{1,2})\.\s*(\d{1,2})")
+MIN_SENTENCE_LEN = 5
+
+
+def split_sentences_with_offsets(text: str) -> List[Tuple[str, int, int]]:
+    """
+    문장 분리 + 원문 위치 반환 → [(문장, 시작, 끝)], text[시작:끝] == 문장
+    """
+    if not text:
+        return []
+
+    dates = [m.span() for m in _DATE_PATTERN.finditer(text)]
+    sentences = []
+    start = 0
+
+    def add(s: int, e: int):
+        raw = text[s:e]
+        stripped = raw.strip()
+        if len(stripped) > MIN_SENTENCE_LEN:
+            s += len(raw) - len(raw.lstrip())
+            sentences.append((stripped, s, s + len(stripped)))
+
+    for m in _SENTENCE_BOUNDARY.finditer(text):
+        if any(ds < m.start() < de for ds, de in dates):
+            continue
+        add(start, m.start())
+        start = m.end()
+    add(start, len(text))
+
+    return sentences
+
+
+def split_sentences(text: str) -> List[str]:
+    """문장 목록만 반환 (날짜는 2025.1.5 형태로 붙여서 표기)"""
+    return [_DATE_PATTERN.sub(r"\1.\2.\3", s) for s, _, _ in split_sentences_with_offsets(text)]
+
+
+# 9) 토큰 창 청크 분할 (RAG 검색 단위, rag_builder.insert_info 색인 시 사용)
+# - 줄 단위(restore_linebreak가 문장부호 / 콜론 / 불릿 앞뒤에 넣은 개행)로 모아서 target_tokens 근처까지 채움
+# - 제목 줄(번호 / 괄호 머리말 / 콜론으로 끝나는 짧은 줄)에서는 새 청크 시작 (제목과 본문이 같은 청크)
+# - 불릿 줄은 중간에서 자르지 않음, 한 줄이 target_tokens보다 길 때만 글자 수로 자름
+# - 크기 때문에 나눌 때는 직전 청크 끝 overlap_tokens 만큼의 줄을 다음 청크 앞에 다시 포함
+# - 토큰 수는 api_client.estimate_tokens와 같은 기준 (1글자 ≈ 1토큰)
+_HEADING_PATTERN = re.compile(r"^(\d+[.)]\s|[가-하][.)]\s|\[[^\]]+\]|제\s*\d+\s*[장절조]|[IVX]+\.\s)")
+_BULLET_PATTERN = re.compile(r"^[•○●\-①-⑳]")
+HEADING_MAX_LEN = 40
+
+
+def is_heading(line: str) -> bool:
+    line = line.strip()
+    if not line or len(line) > HEADING_MAX_LEN or _BULLET_PATTERN.match(line):
+        return False
+    return bool(_HEADING_PATTERN.match(line)) or line.endswith(":")
+
+
+def _line_spans(text: str, max_len: int, piece_len: int | None = None) -> List[Tuple[int, int]]:
+    """빈 줄을 뺀 줄 위치 목록, max_len보다 긴 줄은 piece_len(기본 max_len) 글자씩 나눔"""
+    piece_len = piece_len or max_len
+    spans = []
+    for m in re.finditer(r"[^\n]+", text):
+        s, e = m.span()
+        s += len(m.group()) - len(m.group().lstrip())
+        e -= len(m.group()) - len(m.group().rstrip())
+        while e - s > max_len:
+            spans.append((s, s + piece_len))
+            s += piece_len
+        if e > s:
+            spans.append((s, e))
+    return spans
+
+
+def _overlap_start(text: str, chunk_start: int, chunk_end: int, overlap: int, limit: int) -> int:
+    """
+    다음 청크가 시작할 위치 = 앞 청크 끝에서 overlap 글자 앞 (limit 이전으로는 가지 않음)
+    - 어절 중간이면 다음 공백 뒤로 (공백 없는 긴 줄은 그대로)
+    """
+    start = max(chunk_end - overlap, chunk_start, limit)
+    if 0 < start < chunk_end and not text[start - 1].isspace():
+        space = re.search(r"\s", text[start:chunk_end])
+        if space:
+            start += space.end()
+    return start
+
+
+def chunk_text(text: str, target_tokens: int, overlap_tokens: int = 0) -> List[Tuple[str, int, int]]:
+    """
+    청크 분할 → [(청크, 시작, 끝)], text[시작:끝] == 청크
+    - 크기 때문에 나눌 때 다음 청크는 앞 청크 끝 overlap_tokens 글자부터 시작 (제목으로 나눌 때는 겹치지 않음)
+    - target_tokens보다 긴 줄은 target_tokens - overlap_tokens 글자씩 잘라 겹침을 넣어도 청크가 target_tokens 이하
+    """
+    if not text or not text.strip():
+        return []
+
+    overlap_tokens = min(overlap_tokens, target_tokens // 2)
+    spans = _line_spans(text, target_tokens, target_tokens - overlap_tokens)
+    chunks = []
+    current: List[Tuple[int, int]] = []
+
+    def flush():
+        if current:
+            s, e = current[0][0], current[-1][1]
+            chunks.append((text[s:e], s, e))
+
+    for span in spans:
+        heading = is_heading(text[span[0]:span[1]])
+        size = span[1] - current[0][0] if current else 0
+
+        if current and heading and not all(is_heading(text[s:e]) for s, e in current):
+            flush()
+            current = []
+        elif current and size > target_tokens:
+            flush()
+            # 겹침: 앞 청크의 마지막 overlap_tokens 글자 (첫 줄 포함, 이번 줄을 더해도 target_tokens 이하)
+            start = _overlap_start(text, current[0][0], current[-1][1], overlap_tokens, span[1] - target_tokens)
+            current = [(max(s, start), e) for s, e in current if e > start]
+
+        current.append(span)
+
+    flush()
+    return chunks
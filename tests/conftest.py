@@ -0,0 +1,78 @@
+# conftest.py
+# 테스트 공통 설정
+# - src 모듈 import 전에 환경변수 지정 → storage/ 대신 임시 폴더, 상태 저장소는 메모리, 모델 API 키는 더미
+#   (파일 로그도 임시 폴더에)
+# - rag_db / job_db: 테스트마다 새 SQLite 파일
+# - fake_embeddings: 임베딩 API 대신 텍스트 hash 기반 결정적 벡터
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="docuguide-test-")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["STATE_STORE"] = "memory"
+os.environ["EMBED_CACHE_ENABLED"] = "0"
+os.environ["MODEL_CALL_MODE"] = "live"
+os.environ["RAG_DB_PATH"] = os.path.join(_TMP, "rag_db.sqlite")
+os.environ["JOB_DB_PATH"] = os.path.join(_TMP, "jobs.sqlite")
+os.environ["MODEL_FIXTURE_DIR"] = os.path.join(_TMP, "fixtures")
+
+from src.utils import logger  # noqa: E402  (환경변수 지정 후 import)
+
+logger.BASE_LOG_DIR = os.path.join(_TMP, "logs")
+
+
+@pytest.fixture
+def rag_db(tmp_path, monkeypatch):
+    from src.chatbot import rag_builder
+
+    rag_builder.close_conn()
+    monkeypatch.setattr(rag_builder, "DB_PATH", str(tmp_path / "rag_db.sqlite"))
+    rag_builder.init_db()
+    rag_builder.doc_matrix_cache.entries.clear()
+    rag_builder.doc_matrix_cache.bytes = 0
+    yield rag_builder
+    rag_builder.close_conn()
+
+
+@pytest.fixture
+def job_db(tmp_path, monkeypatch):
+    from src.utils import job_queue
+
+    monkeypatch.setattr(job_queue, "JOB_DB_PATH", str(tmp_path / "jobs.sqlite"))
+    job_queue.init_job_db()
+    return job_queue
+
+
+def fake_vector(text: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+class _Item:
+    def __init__(self, index, embedding):
+        self.index = index
+        self.embedding = embedding
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    """rag_builder.create_embedding 대체 → 호출된 입력 목록(batch)을 기록"""
+    from src.chatbot import rag_builder
+
+    calls = []
+
+    def create_embedding(model, input):
+        calls.append(list(input))
+        return _Response([_Item(i, fake_vector(t, rag_builder.EMBEDDING_DIM)) for i, t in enumerate(input)])
+
+    monkeypatch.setattr(rag_builder, "create_embedding", create_embedding)
+    return calls
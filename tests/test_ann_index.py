@@ -0,0 +1,79 @@
+# test_ann_index.py
+# 전체 문서 IVF 색인 / writer 스레드
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.chatbot import ann_index
+from src.chatbot.ann_index import CorpusAnnIndex, IvfIndex, _normalize
+
+
+def _clustered(n, dim, rng, topics=16):
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    return _normalize(centers[rng.integers(topics, size=n)] + 0.3 * rng.standard_normal((n, dim)).astype(np.float32))
+
+
+def test_ivf_add_does_not_train_until_maintain():
+    rng = np.random.default_rng(0)
+    data = _clustered(4 * ann_index.TRAIN_POINTS_PER_LIST, 16, rng)
+    index = IvfIndex(16, nlist=4, nprobe=4)
+
+    index.add(np.arange(len(data)), data)
+    assert index.state.centroids is None and index.tail_size() == len(data)
+
+    index.maintain()
+    assert index.state.centroids is not None and index.tail_size() == 0
+
+    # nprobe = nlist 이면 전수 비교와 같은 결과
+    keys, _ = index.search(data[7], 5)
+    assert keys[0] == 7
+
+
+def test_search_reads_snapshot_while_writer_holds_lock(rag_db, fake_embeddings, tmp_path):
+    rag_db.insert_info("doc-a", [], ["재산세 환급 안내문입니다."])
+    index = CorpusAnnIndex(str(tmp_path / "rag_ann"))
+    index.sync()
+    query = rag_db.load_doc_matrix("doc-a")[1][0]
+
+    # writer가 잠금을 잡고 있어도(학습 / 저장 중) 검색은 기다리지 않음
+    with index.lock:
+        result = []
+        t = threading.Thread(target=lambda: result.append(index.search(query, 1)))
+        t.start()
+        t.join(2)
+        assert not t.is_alive()
+    assert result[0][0]["doc_id"] == "doc-a"
+
+
+def test_notify_insert_signals_writer_thread(rag_db, fake_embeddings, tmp_path, monkeypatch):
+    index = CorpusAnnIndex(str(tmp_path / "rag_ann"))
+    monkeypatch.setattr(ann_index, "_index", index)
+    index.start()
+    try:
+        rag_db.insert_info("doc-a", [], ["취득세 납부 안내", "자동차세 연납 안내"])
+        deadline = time.monotonic() + 5
+        while index.stats()["size"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert index.stats()["size"] == 2
+    finally:
+        index.stop()
+
+
+def test_save_snapshot_on_stop_is_reloaded(rag_db, fake_embeddings, tmp_path):
+    root = str(tmp_path / "rag_ann")
+    rag_db.insert_info("doc-a", [], ["재산세 환급 안내", "주민세 납부 안내"])
+
+    index = CorpusAnnIndex(root)
+    index.start()
+    deadline = time.monotonic() + 5
+    while index.stats()["size"] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # ANN_SAVE_EVERY에 못 미친 추가분도 종료 시 저장
+    index.stop()
+    index.save_snapshot()
+
+    restarted = CorpusAnnIndex(root)
+    assert restarted.stats()["size"] == 2
+    assert restarted.watermark == index.watermark
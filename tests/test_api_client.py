@@ -0,0 +1,25 @@
+# test_api_client.py
+# 모델 호출 래퍼 (_call_model)
+import httpx
+import openai
+
+from src.utils import admission, api_client, rate_limiter
+
+
+def test_stage_slot_released_during_retry_backoff(monkeypatch):
+    gate = admission._GATES["llm"]
+    in_use_while_sleeping = []
+    monkeypatch.setattr(rate_limiter.time, "sleep", lambda s: in_use_while_sleeping.append(gate.in_use))
+
+    attempts = []
+
+    def create(**kwargs):
+        attempts.append(gate.in_use)
+        if len(attempts) == 1:
+            request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+            raise openai.InternalServerError("error", response=httpx.Response(503, request=request), body=None)
+        return "ok"
+
+    assert api_client._call_model("chat", create, {"model": "test-slot-model", "messages": []}) == "ok"
+    assert attempts == [1, 1]               # 요청 중에는 슬롯 사용
+    assert in_use_while_sleeping == [0]     # backoff 대기 중에는 슬롯을 놓음
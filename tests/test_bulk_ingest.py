@@ -0,0 +1,27 @@
+# test_bulk_ingest.py
+# 일괄 적재 CLI - 대상 수집 / 이어하기
+import json
+
+from src.app.bulk_ingest import collect_files, load_done_hashes
+
+
+def test_collect_files_only_ingestible_types(tmp_path):
+    sub = tmp_path / "2023"
+    sub.mkdir()
+    for name in ["a.pdf", "b.PNG", "c.hwp", "d.docx", "e.txt", "f.xlsx"]:
+        (tmp_path / name).write_bytes(b"x")
+    (sub / "g.jpg").write_bytes(b"x")
+
+    names = [p.replace(str(tmp_path), "") for p in collect_files(str(tmp_path))]
+    assert sorted(names) == sorted(["/a.pdf", "/b.PNG", "/2023/g.jpg"])
+
+
+def test_load_done_hashes_skips_failed_and_broken_lines(tmp_path):
+    out = tmp_path / "bulk.jsonl"
+    out.write_text(
+        json.dumps({"sha256": "a", "status": "done"}) + "\n"
+        + json.dumps({"sha256": "b", "status": "failed"}) + "\n"
+        + '{"sha256": "c", "sta',
+        encoding="utf-8",
+    )
+    assert load_done_hashes(str(out)) == {"a"}
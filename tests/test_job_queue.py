@@ -0,0 +1,67 @@
+# test_job_queue.py
+# 작업 큐 lease / 워커 종료 후 재개
+import time
+
+
+def test_expired_lease_is_reclaimed(job_db):
+    job_id = job_db.enqueue_job("doc-1", {"doc_id": "doc-1"})
+
+    job = job_db.claim_job("worker-a", lease_seconds=60)
+    assert job["job_id"] == job_id and job["attempts"] == 0
+    # lease가 살아 있는 동안은 다른 워커가 가져가지 못함
+    assert job_db.claim_job("worker-b") is None
+
+    # worker-a가 죽어 lease 만료 → worker-b가 마지막 checkpoint부터 이어서 실행
+    job_db.checkpoint_job(job_id, "worker-a", "ingestion", {"doc_id": "doc-1", "stage": "ingestion"})
+    conn = job_db.get_conn()
+    conn.execute("UPDATE jobs SET lease_until=? WHERE job_id=?", (time.time() - 1, job_id))
+    conn.close()
+
+    job = job_db.claim_job("worker-b")
+    assert job["job_id"] == job_id
+    assert job["worker_id"] == "worker-b"
+    assert job["stage_done"] == "ingestion"
+    assert job["state"]["stage"] == "ingestion"
+    assert job_db.get_job(job_id)["attempts"] == 2
+
+    # 넘겨준 작업은 이전 워커가 lease 연장 / checkpoint / 완료 처리할 수 없음 (False → 워커가 중단)
+    assert job_db.renew_lease(job_id, "worker-a") is False
+    assert job_db.checkpoint_job(job_id, "worker-a", "ner", {"doc_id": "doc-1"}) is False
+    assert job_db.publish_result(job_id, "worker-a", {"summary": "stale"}) is False
+    assert job_db.complete_job(job_id, "worker-a", {"summary": "stale"}) is False
+    assert job_db.get_job(job_id)["stage_done"] == "ingestion"
+
+    assert job_db.renew_lease(job_id, "worker-b") is True
+    assert job_db.checkpoint_job(job_id, "worker-b", "ner", {"doc_id": "doc-1"}) is True
+    assert job_db.complete_job(job_id, "worker-b", {"summary": "ok"}) is True
+    assert job_db.get_job(job_id)["status"] == "done"
+
+
+def test_retry_delay_postpones_claim(job_db):
+    job_id = job_db.enqueue_job("doc-1", {"doc_id": "doc-1"})
+    job_db.claim_job("worker-a")
+    job_db.fail_job(job_id, "worker-a", "429", retry=True, retry_delay=60)
+
+    assert job_db.get_job(job_id)["status"] == "queued"
+    assert job_db.claim_job("worker-b") is None
+
+
+def test_exhausted_job_marks_index_failed(job_db, monkeypatch):
+    from src.utils.index_status import get_index_status, set_index_status
+
+    monkeypatch.setattr(job_db, "JOB_MAX_ATTEMPTS", 2)
+    job_id = job_db.enqueue_job("doc-exhausted", {"doc_id": "doc-exhausted"})
+    set_index_status("doc-exhausted", "indexing")
+
+    # 작업 중 워커가 계속 죽어 lease만 만료되는 경우
+    conn = job_db.get_conn()
+    for _ in range(2):
+        assert job_db.claim_job("worker-a") is not None
+        conn.execute("UPDATE jobs SET lease_until=? WHERE job_id=?", (time.time() - 1, job_id))
+    conn.close()
+
+    assert job_db.claim_job("worker-b") is None
+    assert job_db.get_job(job_id)["status"] == "failed"
+    status = get_index_status("doc-exhausted")
+    assert status["status"] == "failed"
+    assert "재시도 횟수 초과" in status["error"]
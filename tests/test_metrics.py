@@ -0,0 +1,33 @@
+# test_metrics.py
+# /metrics 텍스트 (Prometheus exposition format)
+import re
+
+from src.chatbot import rag_builder  # noqa: F401  (문서 행렬 캐시 collector 등록)
+from src.utils import admission, embedding_cache, rate_limiter  # noqa: F401  (collector 등록)
+from src.utils.embedding_cache import EmbeddingCache, set_embedding_cache
+from src.utils.metrics import _label_str, render_prometheus
+
+
+def test_every_series_has_help_and_type(job_db):
+    rate_limiter.get_limiter("test-metrics-model")
+    set_embedding_cache(EmbeddingCache(None, memory_items=10, db_max_rows=10))
+    try:
+        text = render_prometheus()
+    finally:
+        set_embedding_cache(None)
+
+    typed = set(re.findall(r"^# TYPE (\S+) \S+$", text, re.M))
+    helped = set(re.findall(r"^# HELP (\S+) ", text, re.M))
+    series = {line.split("{")[0].split(" ")[0] for line in text.splitlines() if line and not line.startswith("#")}
+    families = {re.sub(r"_(bucket|sum|count)$", "", name) if name not in typed else name for name in series}
+
+    assert families <= typed
+    assert typed == helped
+    for name in ("stage_slots_in_use", "job_queue_depth", "embedding_cache_lookups_total",
+                 "model_limiter_breaker_state", "rag_doc_cache_hits_total"):
+        assert name in typed
+
+
+def test_label_values_are_escaped():
+    value = 'C:\\docs\n"a"'
+    assert _label_str(("path",), (value,)) == '{path="C:\\\\docs\\n\\"a\\""}'
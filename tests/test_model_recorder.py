@@ -0,0 +1,78 @@
+# test_model_recorder.py
+# 모델 호출 녹화 / 재생
+import pytest
+from openai.types import CreateEmbeddingResponse
+
+from src.chatbot import rag_builder
+from src.utils import api_client, embedding_cache, model_recorder
+from src.utils.embedding_cache import EmbeddingCache, set_embedding_cache
+from tests.conftest import fake_vector
+
+
+class _FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def create(self, model, input):
+        self.calls.append(list(input))
+        return CreateEmbeddingResponse.model_validate({
+            "object": "list",
+            "model": model,
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_vector(t, rag_builder.EMBEDDING_DIM).tolist()}
+                for i, t in enumerate(input)
+            ],
+            "usage": {"prompt_tokens": len(input), "total_tokens": len(input)},
+        })
+
+
+class _FakeClient:
+    def __init__(self):
+        self.embeddings = _FakeEmbeddings()
+
+
+@pytest.fixture
+def call_mode(tmp_path, monkeypatch):
+    client = _FakeClient()
+    monkeypatch.setattr(api_client, "get_openai_client", lambda: client)
+    monkeypatch.setattr(model_recorder, "MODEL_FIXTURE_DIR", str(tmp_path / "fixtures"))
+    model_recorder.reset_replay()
+
+    def set_mode(mode):
+        monkeypatch.setattr(api_client, "MODEL_CALL_MODE", mode)
+        monkeypatch.setattr(embedding_cache, "MODEL_CALL_MODE", mode)
+
+    yield set_mode, client
+    model_recorder.reset_replay()
+    set_embedding_cache(None)
+
+
+def test_replay_returns_recorded_embeddings(call_mode):
+    set_mode, client = call_mode
+    texts = ["취득세 납부 기한", "재산세 환급 신청"]
+
+    set_mode("record")
+    recorded = rag_builder.embed_texts(texts)
+
+    set_mode("replay")
+    calls = len(client.embeddings.calls)
+    replayed = rag_builder.embed_texts(texts)
+    assert len(client.embeddings.calls) == calls   # API 호출 없음
+    assert (replayed == recorded).all()
+
+
+def test_replay_does_not_depend_on_embedding_cache(call_mode, monkeypatch):
+    set_mode, client = call_mode
+    monkeypatch.setattr(embedding_cache, "EMBED_CACHE_ENABLED", True)
+    cache = EmbeddingCache(None, memory_items=100, db_max_rows=100)
+    set_embedding_cache(cache)
+    texts = ["취득세 납부 기한", "재산세 환급 신청"]
+
+    set_mode("record")
+    rag_builder.embed_texts(texts)
+
+    # 녹화 이후 캐시에 일부만 남아 있어도 같은 입력 묶음으로 요청 → fixture를 찾음
+    cache.put_many(rag_builder.EMBEDDING_MODEL, {texts[0]: fake_vector(texts[0], rag_builder.EMBEDDING_DIM)})
+    set_mode("replay")
+    rag_builder.embed_texts(texts)
+    assert client.embeddings.calls == [texts]
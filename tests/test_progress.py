@@ -0,0 +1,68 @@
+# test_progress.py
+# 문서별 진행상황 이벤트 (SSE /progress/{doc_id}/stream 의 데이터 원천)
+import pytest
+
+from src.utils import progress
+from src.utils.state_store import MemoryStateStore, set_state_store
+
+
+@pytest.fixture(autouse=True)
+def store():
+    store = MemoryStateStore()
+    set_state_store(store)
+    return store
+
+
+def test_events_are_read_in_seq_order():
+    progress.emit_progress("doc", "parse", "파싱 시작")
+    progress.emit_progress("doc", "ocr", "OCR 1/2", page=1, total=2)
+    progress.emit_progress("doc", "summary", summary="요약")
+
+    events = progress.get_events("doc")
+    assert [e["seq"] for e in events] == [0, 1, 2]
+    assert [e["stage"] for e in events] == ["parse", "ocr", "summary"]
+    assert events[1]["data"] == {"page": 1, "total": 2}
+    assert events[2]["data"]["summary"] == "요약"
+
+
+def test_resume_from_last_event_id():
+    for stage in ["parse", "clean", "classify", "done"]:
+        progress.emit_progress("doc", stage)
+
+    # Last-Event-ID: 1 로 재연결 → seq 2부터
+    assert [e["stage"] for e in progress.get_events("doc", since=2)] == ["classify", "done"]
+
+
+def test_seq_continues_after_clear():
+    progress.emit_progress("doc", "parse")
+    progress.emit_progress("doc", "error", "실패")
+
+    # 같은 doc_id로 재처리 → 이전 이벤트는 지워도 seq는 이어서 증가
+    progress.clear_progress("doc")
+    progress.emit_progress("doc", "upload")
+    progress.emit_progress("doc", "parse")
+
+    events = progress.get_events("doc")
+    assert [e["seq"] for e in events] == [2, 3]
+    # 이전 스트림의 Last-Event-ID(1)로 재연결해도 새 이벤트를 순서대로 받음
+    assert [e["stage"] for e in progress.get_events("doc", since=2)] == ["upload", "parse"]
+
+
+def test_get_progress_returns_latest_stage():
+    assert progress.get_progress("doc") == "pending"
+    progress.emit_progress("doc", "parse")
+    progress.emit_progress("doc", "ner")
+    assert progress.get_progress("doc") == "ner"
+
+
+def test_events_are_kept_per_doc():
+    progress.emit_progress("a", "parse")
+    progress.emit_progress("b", "error", "실패")
+
+    assert [e["stage"] for e in progress.get_events("a")] == ["parse"]
+    assert progress.get_progress("b") == "error"
+
+
+def test_emit_without_doc_id_is_noop(store):
+    progress.emit_progress(None, "parse")
+    assert store.read_log(progress.NAMESPACE, "None") == []
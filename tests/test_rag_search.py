@@ -0,0 +1,100 @@
+# test_rag_search.py
+# 문서 단위 검색 (vector / lexical / hybrid)
+import pytest
+
+PAGES_A = [
+    "취득세 납부 기한은 2025년 3월 31일입니다.\n가상계좌 110-234-567890 으로 입금하세요.",
+    "재산세 고지서를 분실한 경우 구청 세무과에 재발급을 요청합니다.",
+]
+PAGES_B = [
+    "자동차세 연납 신청은 1월에 하면 할인됩니다.\n가상계좌 999-888-777666 으로 입금하세요.",
+]
+
+
+@pytest.fixture
+def docs(rag_db, fake_embeddings):
+    rag_db.insert_info("doc-a", [], PAGES_A)
+    rag_db.insert_info("doc-b", [], PAGES_B)
+    return rag_db
+
+
+@pytest.mark.parametrize("mode", ["vector", "lexical", "hybrid"])
+def test_search_stays_within_doc(docs, mode):
+    results = docs.search_rag("doc-a", "가상계좌 999-888-777666 자동차세", top_k=10, mode=mode)
+    assert results
+    assert {r["doc_id"] for r in results} == {"doc-a"}
+
+
+def test_lexical_matches_keyword(docs):
+    results = docs.search_rag("doc-a", "110-234-567890", top_k=1, mode="lexical")
+    assert "110-234-567890" in results[0]["text"]
+    # 다른 문서에만 있는 번호는 찾지 않음
+    assert docs.search_rag("doc-a", "999-888-777666", mode="lexical") == []
+
+
+def test_hybrid_fuses_lexical_rank(docs, monkeypatch):
+    # 질의 벡터가 엉뚱해도 키워드가 일치하는 항목이 RRF로 올라옴
+    items, matrix = docs.load_doc_matrix("doc-a")
+    target = next(i for i, item in enumerate(items) if "재발급" in item["text"])
+    far = -matrix[target]
+    results = docs.search_rag("doc-a", "고지서 재발급", top_k=1, query_vec=far, mode="hybrid")
+    assert results[0]["id"] == items[target]["id"]
+
+
+def test_fts_tracks_inserts_and_deletes(docs):
+    conn = docs.get_conn()
+
+    def indexed(doc_id):
+        return conn.execute(
+            "SELECT COUNT(*) FROM embeddings_fts f JOIN embeddings e ON e.rowid = f.rowid "
+            "WHERE embeddings_fts MATCH '\"가상계좌\"' AND e.doc_id = ?", (doc_id,)
+        ).fetchone()[0]
+
+    # sentence 행은 색인하지 않음 → 가상계좌가 나오는 chunk 1개만
+    assert indexed("doc-a") == 1
+    docs.delete_doc("doc-a")
+    assert indexed("doc-a") == 0
+    assert indexed("doc-b") == 1
+    conn.execute("INSERT INTO embeddings_fts (embeddings_fts) VALUES ('integrity-check')")   # 깨졌으면 오류
+
+
+def test_lexical_checks_doc_id_inside_rowid_range(rag_db, fake_embeddings):
+    # 두 문서 행이 번갈아 들어가 rowid 범위가 겹쳐도 다른 문서 항목은 섞이지 않음
+    conn = rag_db.get_conn()
+    for i in range(4):
+        doc_id = "doc-a" if i % 2 == 0 else "doc-b"
+        conn.execute(
+            "INSERT INTO embeddings (id, doc_id, type, page_num, text, embedding, metadata, dim) "
+            "VALUES (?, ?, 'chunk', 1, ?, ?, '{}', 2)",
+            (f"row-{i}", doc_id, f"고지서 번호 {i}{i}{i}", rag_db.encode_vector([1.0, 0.0])),
+        )
+    conn.commit()
+
+    results = rag_db.search_rag("doc-a", "고지서", top_k=10, mode="lexical")
+    assert [r["id"] for r in results] == ["row-0", "row-2"]
+    assert rag_db.search_rag("doc-a", "111", mode="lexical") == []
+
+
+def test_legacy_fts_table_is_rebuilt(rag_db, fake_embeddings):
+    rag_db.insert_info("doc-a", [], PAGES_A)
+    conn = rag_db.get_conn()
+    conn.execute("DROP TRIGGER embeddings_fts_ai")
+    conn.execute("DROP TRIGGER embeddings_fts_ad")
+    conn.execute("DROP TABLE embeddings_fts")
+    conn.execute(
+        "CREATE VIRTUAL TABLE embeddings_fts USING fts5("
+        "text, id UNINDEXED, doc_id UNINDEXED, type UNINDEXED, tokenize='trigram')"
+    )
+    conn.commit()
+
+    rag_db.init_fts()
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name='embeddings_fts'").fetchone()[0]
+    assert "content='embeddings'" in sql
+    results = rag_db.search_rag("doc-a", "110-234-567890", top_k=1, mode="lexical")
+    assert "110-234-567890" in results[0]["text"]
+
+
+def test_fts_terms():
+    from src.chatbot.rag_builder import fts_terms
+
+    assert fts_terms("ABC-12 세") == ["abc", "bc-", "c-1", "-12"]   # 소문자, 3글자 미만 어절 제외
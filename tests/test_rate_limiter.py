@@ -0,0 +1,82 @@
+# test_rate_limiter.py
+# circuit breaker / 재시도
+import httpx
+import openai
+import pytest
+
+from src.utils import rate_limiter
+from src.utils.rate_limiter import ModelUnavailableError, call_with_limits, get_limiter
+
+
+def _status_error(cls, status):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return cls("error", response=httpx.Response(status, request=request), body=None)
+
+
+@pytest.fixture
+def open_breaker(monkeypatch):
+    """reset_seconds가 이미 지나 half-open 상태인 모델"""
+    monkeypatch.setattr(rate_limiter.time, "sleep", lambda s: None)
+    limiter = get_limiter("test-breaker-model")
+    breaker = limiter.breaker
+    breaker.failures = breaker.threshold
+    breaker.opened_at = rate_limiter.time.monotonic() - breaker.reset_seconds - 1
+    breaker.half_open_trial = False
+    yield limiter
+    breaker.record_success()
+
+
+def test_half_open_allows_single_trial(open_breaker):
+    breaker = open_breaker.breaker
+    assert breaker.state == "half_open"
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+
+
+def test_half_open_trial_non_retryable_error_releases_trial(open_breaker):
+    def bad_request():
+        raise _status_error(openai.BadRequestError, 400)
+
+    with pytest.raises(openai.BadRequestError):
+        call_with_limits("test-breaker-model", bad_request)
+
+    # 400은 성공이 아님 → half-open 유지, 다음 시험 호출은 허용
+    assert open_breaker.breaker.state == "half_open"
+    assert open_breaker.breaker.failures == open_breaker.breaker.threshold
+    assert call_with_limits("test-breaker-model", lambda: "ok") == "ok"
+    assert open_breaker.breaker.state == "closed"
+
+
+def test_half_open_trial_retryable_error_reopens(open_breaker, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "RETRY_MAX_ATTEMPTS", 3)
+
+    def unavailable():
+        raise _status_error(openai.InternalServerError, 503)
+
+    with pytest.raises(ModelUnavailableError):
+        call_with_limits("test-breaker-model", unavailable)
+    assert open_breaker.breaker.state == "open"
+    assert open_breaker.breaker.half_open_trial is False
+
+
+def test_alternating_bad_request_and_server_error_opens(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "RETRY_MAX_ATTEMPTS", 1)
+    limiter = get_limiter("test-alternating-model")
+    errors = [(openai.BadRequestError, 400), (openai.InternalServerError, 503)]
+
+    try:
+        for i in range(limiter.breaker.threshold * 2):
+            cls, status = errors[i % 2]
+
+            def fail():
+                raise _status_error(cls, status)
+
+            with pytest.raises((cls, ModelUnavailableError)):
+                call_with_limits("test-alternating-model", fail)
+
+        # 400은 연속 실패 수를 초기화하지 않음 → 5xx만으로 threshold 도달
+        assert limiter.breaker.state == "open"
+        with pytest.raises(ModelUnavailableError):
+            call_with_limits("test-alternating-model", lambda: "ok")
+    finally:
+        limiter.breaker.record_success()
@@ -0,0 +1,80 @@
+# test_state_store.py
+# 공유 상태 저장소 (메모리 / SQLite 구현 공통)
+import pytest
+
+from src.utils.state_store import MemoryStateStore, SqliteStateStore, StateStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStateStore()
+    return SqliteStateStore(str(tmp_path / "state.sqlite"))
+
+
+def test_incomplete_backend_fails_on_instantiation():
+    class KeyValueOnly(StateStore):
+        def get(self, namespace, key, default=None):
+            return default
+
+    with pytest.raises(TypeError):
+        KeyValueOnly()
+
+
+def test_update_is_read_modify_write(store):
+    assert store.update("ns", "k", lambda v: v + 1, default=0) == 1
+    assert store.update("ns", "k", lambda v: v + 1, default=0) == 2
+    assert store.get("ns", "k") == 2
+
+
+def test_append_max_items_keeps_latest(store):
+    for i in range(5):
+        store.append("log", "k", {"n": i}, max_items=3)
+
+    assert [item["n"] for item in store.read_log("log", "k")] == [2, 3, 4]
+    assert [item["seq"] for item in store.read_log("log", "k", since=3)] == [3, 4]
+    assert store.last_log("log", "k")["seq"] == 4
+
+
+def test_pop_log_returns_and_clears(store):
+    store.append("log", "k", {"n": 0})
+    store.append("log", "k", {"n": 1})
+
+    assert [item["n"] for item in store.pop_log("log", "k")] == [0, 1]
+    assert store.read_log("log", "k") == []
+    assert store.pop_log("log", "k") == []
+
+    store.append("log", "k", {"n": 2})
+    assert [item["n"] for item in store.pop_log("log", "k")] == [2]
+
+
+def test_seq_keeps_increasing_after_clear(store):
+    store.append("log", "k", {"n": 0})
+    store.append("log", "k", {"n": 1})
+    store.clear_log("log", "k")
+    assert store.append("log", "k", {"n": 2}) == 2
+
+    store.pop_log("log", "k")
+    assert store.append("log", "k", {"n": 3}) == 3
+    assert store.append("log", "other", {"n": 0}) == 0
+
+
+def test_prune_logs_resets_stale_seq(store):
+    store.append("log", "k", {"n": 0})
+    store.clear_log("log", "k")
+    store.prune_logs("log", max_age_seconds=-1)
+
+    assert store.append("log", "k", {"n": 1}) == 0
+
+
+def test_user_log_is_capped(monkeypatch):
+    from src.utils import logger
+    from src.utils.state_store import set_state_store
+
+    set_state_store(MemoryStateStore())
+    monkeypatch.setattr(logger, "USER_LOG_MAX_ITEMS", 2)
+    for step in ("ocr", "summary", "actions"):
+        logger.user_log(f"{step} 진행 중", step=step)
+
+    assert [item["step"] for item in logger.get_user_logs(clear=True)] == ["summary", "actions"]
+    assert logger.get_user_logs() == []
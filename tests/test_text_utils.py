@@ -0,0 +1,43 @@
+# test_text_utils.py
+# 청크 분할 (chunk_text)
+from src.utils.text_utils import chunk_text
+
+
+def _spans(chunks):
+    return [(s, e) for _, s, e in chunks]
+
+
+def test_chunks_match_source_positions():
+    text = "1. 납부 안내\n취득세는 60일 이내에 신고 납부합니다.\n\n2. 환급 안내\n과오납 시 환급을 신청할 수 있습니다."
+    for chunk, s, e in chunk_text(text, 30, 10):
+        assert text[s:e] == chunk
+
+
+def test_long_line_split_by_characters_overlaps():
+    chunks = chunk_text("가" * 1000, 400, 80)
+    spans = _spans(chunks)
+    assert spans[0][0] == 0 and spans[-1][1] == 1000
+    assert all(e - s <= 400 for s, e in spans)
+    for (_, prev_end), (start, _) in zip(spans, spans[1:]):
+        assert prev_end - start > 0          # 앞 청크와 겹침
+        assert prev_end - start <= 80
+
+
+def test_single_line_chunk_overlaps_next():
+    first = "재산세 고지서 " * 20
+    second = "납부 기한은 9월 30일입니다 " * 15
+    text = first.strip() + "\n" + second.strip()
+    spans = _spans(chunk_text(text, 300, 40))
+
+    assert len(spans) == 2
+    assert spans[0] == (0, len(first.strip()))   # 앞 청크 = 첫 줄 하나
+    assert spans[1][0] < spans[0][1]             # 첫 줄 끝부분이 다음 청크에 포함
+    assert spans[0][1] - spans[1][0] <= 40
+    assert text[spans[1][0] - 1] == " "          # 어절 경계에서 시작
+
+
+def test_heading_starts_new_chunk_without_overlap():
+    text = "본문 첫 문단입니다.\n2. 환급 안내\n환급 신청 방법"
+    spans = _spans(chunk_text(text, 400, 80))
+    assert [text[s:e].splitlines()[0] for s, e in spans] == ["본문 첫 문단입니다.", "2. 환급 안내"]
+    assert spans[1][0] >= spans[0][1]
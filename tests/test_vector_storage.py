@@ -0,0 +1,44 @@
+# test_vector_storage.py
+# float32 벡터 저장 형식 / 이전 pickle 형식 변환
+import pickle
+
+import numpy as np
+
+
+def _insert_legacy(conn, row_id, blob):
+    conn.execute(
+        "INSERT INTO embeddings (id, doc_id, type, page_num, text, embedding, metadata, dim) "
+        "VALUES (?, 'legacy', 'chunk', 1, ?, ?, '{}', NULL)",
+        (row_id, row_id, blob),
+    )
+
+
+def test_encode_decode_roundtrip(rag_db):
+    vec = np.arange(8, dtype=np.float32)
+    assert np.array_equal(rag_db.decode_vector(rag_db.encode_vector(vec), 8), vec)
+
+
+def test_migration_quarantines_bad_rows(rag_db):
+    with rag_db.get_conn() as conn:
+        _insert_legacy(conn, "good-1", pickle.dumps(np.ones(4)))
+        _insert_legacy(conn, "broken", b"not a pickle")
+        _insert_legacy(conn, "good-2", pickle.dumps([1.0, 2.0, 3.0, 4.0]))
+        _insert_legacy(conn, "text", pickle.dumps("문자열"))
+        conn.commit()
+
+    # 배치마다 commit, 깨진 행이 있어도 같은 배치를 반복하지 않고 끝남
+    assert rag_db.migrate_pickle_embeddings(batch_size=1) == 2
+    assert rag_db.migrate_pickle_embeddings() == 0
+
+    conn = rag_db.get_conn()
+    rows = conn.execute("SELECT id, embedding, dim FROM embeddings ORDER BY id").fetchall()
+    assert [(r["id"], r["dim"]) for r in rows] == [("good-1", 4), ("good-2", 4)]
+    assert np.array_equal(rag_db.decode_vector(rows[1]["embedding"], 4), [1, 2, 3, 4])
+
+    quarantined = conn.execute("SELECT id, embedding, error FROM embeddings_quarantine ORDER BY id").fetchall()
+    assert [r["id"] for r in quarantined] == ["broken", "text"]
+    assert quarantined[0]["embedding"] == b"not a pickle"
+    assert all(r["error"] for r in quarantined)
+
+    items, matrix = rag_db.load_doc_matrix("legacy")
+    assert matrix.shape == (2, 4)
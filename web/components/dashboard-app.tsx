@@ -1,6 +1,6 @@
 "use client";
 
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { Sparkles, ArrowLeft, MoreVertical, MessageSquare } from "lucide-react";
 import { Button } from "@/components/ui/button";
 import { Sheet, SheetContent } from "@/components/ui/sheet";
@@ -58,6 +58,9 @@ export function DashboardApp() {
 
   const [docId, setDocId] = useState("");
 
+  // 문서별 챗봇 세션 id (백엔드가 첫 응답에서 발급, 이후 요청에 그대로 전달)
+  const chatSessionsRef = useRef<Record<string, string>>({});
+
   const startLoading = (fileName: string) => {
     setLoadingFileName(fileName);
     setShowLoading(true);
@@ -100,11 +103,15 @@ export function DashboardApp() {
       body: JSON.stringify({
         doc_id: docId,
         question: message,
+        session_id: chatSessionsRef.current[docId] ?? null,
       }),
     });
 
 
     const data = await res.json();
+    if (data.session_id) {
+      chatSessionsRef.current[docId] = data.session_id;
+    }
     return data;
   }
 